@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Banner Stage
+Second scan stage shared by the O'Azis and MILKO scanners: port discovery
+only confirms that a port accepts connections, and this stage reconnects to
+confirmed open ports to grab banners under its own concurrency and timeout.
+For authorized security testing only.
+"""
+
+import queue
+import socket
+import threading
+import time
+
+DEFAULT_BANNER_WORKERS = 50
+DEFAULT_BANNER_TIMEOUT = 2.0
+
+
+class BannerStage:
+    """Pool of banner-grabbing threads fed by a queue of confirmed open ports.
+
+    `grabber(sock, port)` reads or probes an already connected socket and
+    returns the banner or None. Ports rejected by `wants(port)` skip the extra
+    connection and are reported straight away with no banner. Every submitted
+    port is eventually reported once through `on_result(target, port, banner)`.
+    Reconnects are paced by `governor` (a RateGovernor) when one is given.
+    With `metrics`, the time ports wait for a worker and the grab time are
+    recorded.
+    """
+
+    def __init__(self, grabber, on_result, wants=None, workers=DEFAULT_BANNER_WORKERS,
+                 timeout=DEFAULT_BANNER_TIMEOUT, governor=None, metrics=None):
+        self.grabber = grabber
+        self.metrics = metrics
+        self.on_result = on_result
+        self.wants = wants
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.governor = governor if governor and governor.enabled else None
+        self.open_ports = queue.Queue()
+        self.threads = []
+
+    def start(self):
+        for _ in range(self.workers):
+            t = threading.Thread(target=self._worker)
+            t.daemon = True
+            t.start()
+            self.threads.append(t)
+        return self
+
+    def submit(self, target, port):
+        """Hand a confirmed open port to the stage; never blocks discovery"""
+        if self.wants and not self.wants(port):
+            self.on_result(target, port, None)
+        else:
+            self.open_ports.put((target, port, time.monotonic()))
+
+    def close(self):
+        """Wait until every submitted port has been reported"""
+        for _ in self.threads:
+            self.open_ports.put(None)
+        for t in self.threads:
+            t.join()
+        self.threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def grab(self, target, port):
+        """Reconnect to an open port and run the grabber on it"""
+        if self.governor:
+            self.governor.wait(target)
+        if not self.metrics:
+            return self._grab(target, port)
+        started = time.monotonic()
+        banner = self._grab(target, port)
+        self.metrics.observe('banner_seconds', time.monotonic() - started,
+                             result='identified' if banner else 'none')
+        return banner
+
+    def _grab(self, target, port):
+        try:
+            sock = socket.create_connection((target, port), timeout=self.timeout)
+        except OSError:
+            return None
+        try:
+            sock.settimeout(self.timeout)
+            return self.grabber(sock, port)
+        except OSError:
+            return None
+        finally:
+            sock.close()
+
+    def _worker(self):
+        while True:
+            job = self.open_ports.get()
+            if job is None:
+                break
+            target, port, queued = job
+            if self.metrics:
+                self.metrics.observe('queue_wait_seconds', time.monotonic() - queued, stage='banner')
+            self.on_result(target, port, self.grab(target, port))
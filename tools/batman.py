@@ -10,8 +10,20 @@ import threading
 import time
 import sys
 import os
+import argparse
+import math
 from datetime import datetime
 
+from http_pool import pooled_session, opened_connection, DEFAULT_POOL_SIZE, DEFAULT_MAX_REQUESTS_PER_CONNECTION
+from http_engine import AsyncHTTPEngine, DEFAULT_HTTP_CONCURRENCY, MAX_HTTP_CONCURRENCY, DEFAULT_REQUEST_TIMEOUT
+from load_stats import RequestStats
+from load_profile import LoadProfile, RequestBudget, parse_duration, parse_stages
+
+# threaded: one blocking requests call per OS thread; async: keep-alive connections on one event loop
+ENGINES = ('threaded', 'async')
+# closed: each worker sends its next request when the previous one returns; open: requests arrive at a set rate
+LOAD_MODELS = ('closed', 'open')
+
 class Colors:
     """Terminal colors for Batman theme"""
     HEADER = '\033[95m'
@@ -38,9 +50,26 @@ class Batman:
         self.author = "The Dark Knight"
         self.target_url = ""
         self.request_count = 0
+        self.duration = 0.0  # Seconds; the test stops at whichever of request count and duration comes first
+        self.warmup = 0.0    # Seconds at the start whose results are left out of the statistics
+        self.budget = None
         self.thread_count = 10
+        self.engine = 'threaded'
+        self.concurrency = DEFAULT_HTTP_CONCURRENCY  # Connections held open by the async engine
+        self.target_rate = 0.0  # Open model: requests per second (the starting rate when stages are set)
+        self.stages = []        # Open model: [(seconds, rate)] ramp profile; empty = steady target_rate
+        self.queued_requests = 0
         self.successful_requests = 0
         self.failed_requests = 0
+        self.pool_size = DEFAULT_POOL_SIZE  # Keep-alive connections shared by the threads; 0 = one per thread
+        self.max_requests_per_connection = DEFAULT_MAX_REQUESTS_PER_CONNECTION  # 0 = unlimited
+        self.new_connection_requests = 0
+        self.reused_connection_requests = 0
+        self.session = None
+        self.worker_stats = []  # One RequestStats per worker thread (or for the event loop)
+        self.stats = None       # Merged when a test ends
+        self.test_duration = 0.0
+        self.measured_duration = 0.0  # Test duration after the warm-up
         self.lock = threading.Lock()
 
     def display_banner(self):
@@ -94,6 +123,8 @@ class Batman:
                     value = input(f"{Colors.OKBLUE}{prompt}{Colors.ENDC}").strip()
                 elif input_type == "int":
                     value = int(input(f"{Colors.OKBLUE}{prompt}{Colors.ENDC}").strip())
+                elif input_type == "float":
+                    value = float(input(f"{Colors.OKBLUE}{prompt}{Colors.ENDC}").strip())
 
                 if validation and not validation(value):
                     print(f"{Colors.FAIL}❌ Invalid input. Please try again.{Colors.ENDC}")
@@ -113,39 +144,192 @@ class Batman:
         print(f"\n{Colors.BOLD}{Colors.OKGREEN}⚙️ LOAD TEST CONFIGURATION{Colors.ENDC}")
         print("=" * 60)
 
-        # Request count
-        self.request_count = self.get_user_input(
-            "📦 Enter number of requests (e.g., 1000): ",
+        # Load model
+        model = self.get_user_input(
+            "📐 Enter load model - closed (next request when one returns) or open (fixed arrival rate): ",
+            validation=lambda x: x in LOAD_MODELS
+        )
+        if model == 'open':
+            self.configure_open_model()
+            return
+        self.target_rate = 0.0
+        self.stages = []
+
+        # Request count / duration
+        self.configure_run_length()
+
+        # Engine
+        self.engine = self.get_user_input(
+            "🧠 Enter engine - threaded or async (event loop, thousands of connections): ",
+            validation=lambda x: x in ENGINES
+        )
+
+        if self.engine == 'async':
+            self.concurrency = self.get_user_input(
+                f"🔌 Enter number of concurrent connections (1-{MAX_HTTP_CONCURRENCY}): ",
+                input_type="int",
+                validation=lambda x: 1 <= x <= MAX_HTTP_CONCURRENCY
+            )
+        else:
+            # Threads
+            self.thread_count = self.get_user_input(
+                "⚙️ Enter number of threads (e.g., 10): ",
+                input_type="int",
+                validation=lambda x: 1 <= x <= 500
+            )
+
+            # Keep-alive connection pool
+            self.pool_size = self.get_user_input(
+                "🔌 Enter connection pool size (0 = one per thread): ",
+                input_type="int",
+                validation=lambda x: 0 <= x <= 500
+            )
+        self.max_requests_per_connection = self.get_user_input(
+            "♻️ Enter max requests per connection (0 = unlimited): ",
+            input_type="int",
+            validation=lambda x: x >= 0
+        )
+
+    def configure_open_model(self):
+        """Target rate or ramp stages; open-model tests run on the async engine"""
+        stages = self.get_user_input(
+            "📈 Enter stages DURATION:RATE,... (e.g., 30s:500,2m:500,30s:0) or leave blank for a steady rate: ",
+            validation=lambda x: not x or valid_stages(x)
+        )
+        if stages:
+            self.stages = parse_stages(stages)
+            self.target_rate = 0.0
+            self.request_count = LoadProfile(self.stages).total_requests()
+            self.duration = 0.0
+            print(f"{Colors.OKCYAN}📦 {self.request_count} requests over {LoadProfile(self.stages).duration:g}s{Colors.ENDC}")
+            warmup = self.get_user_input(
+                "🔥 Enter warm-up excluded from results (e.g., 30s, 0 = none): ",
+                validation=valid_duration
+            )
+            self.warmup = parse_duration(warmup)
+        else:
+            self.stages = []
+            self.target_rate = self.get_user_input(
+                "📈 Enter target rate in requests per second (e.g., 500): ",
+                input_type="float",
+                validation=lambda x: x > 0
+            )
+            self.configure_run_length()
+
+        self.engine = 'async'
+        self.concurrency = self.get_user_input(
+            f"🔌 Enter max concurrent connections (1-{MAX_HTTP_CONCURRENCY}): ",
+            input_type="int",
+            validation=lambda x: 1 <= x <= MAX_HTTP_CONCURRENCY
+        )
+        self.max_requests_per_connection = self.get_user_input(
+            "♻️ Enter max requests per connection (0 = unlimited): ",
             input_type="int",
-            validation=lambda x: x > 0
+            validation=lambda x: x >= 0
         )
 
-        # Threads
-        self.thread_count = self.get_user_input(
-            "⚙️ Enter number of threads (e.g., 10): ",
+    def configure_run_length(self):
+        """Request count, duration or both, and the warm-up"""
+        self.request_count = self.get_user_input(
+            "📦 Enter number of requests (e.g., 1000; 0 = run for a set time): ",
             input_type="int",
-            validation=lambda x: 1 <= x <= 500
+            validation=lambda x: x >= 0
         )
+        duration = self.get_user_input(
+            "⏱️ Enter test duration (e.g., 10m; 0 = until the requests are sent): ",
+            validation=lambda x: valid_duration(x) and (self.request_count or parse_duration(x) > 0)
+        )
+        self.duration = parse_duration(duration)
+        warmup = self.get_user_input(
+            "🔥 Enter warm-up excluded from results (e.g., 30s, 0 = none): ",
+            validation=lambda x: valid_duration(x) and (not self.duration or parse_duration(x) < self.duration)
+        )
+        self.warmup = parse_duration(warmup)
+
+    def load_profile(self):
+        """The open-model arrival schedule, or None for a closed-model test"""
+        if self.stages:
+            return LoadProfile(self.stages, start_rate=self.target_rate)
+        if self.target_rate > 0:
+            return LoadProfile.constant(self.target_rate, self.request_count or math.ceil(self.target_rate * self.duration))
+        return None
+
+    def run_length_text(self):
+        """'Requests: 1000 | Duration: 60s | Warm-up: 10s', leaving out the unset ones"""
+        parts = []
+        if self.request_count:
+            parts.append(f"Requests: {self.request_count}")
+        if self.duration:
+            parts.append(f"Duration: {self.duration:g}s")
+        if self.warmup:
+            parts.append(f"Warm-up: {self.warmup:g}s")
+        return " | ".join(parts)
 
     def perform_request(self, thread_id):
         """Execute HTTP requests in a separate thread"""
-        while True:
-            if self.successful_requests + self.failed_requests >= self.request_count:
-                break
-
+        stats = RequestStats()
+        with self.lock:
+            self.worker_stats.append(stats)
+        while self.budget.claim():
+            started = time.perf_counter()
             try:
-                response = requests.get(self.target_url, timeout=5)
-                with self.lock:
-                    if response.status_code == 200:
-                        self.successful_requests += 1
-                        print(f"{Colors.OKGREEN}[Thread {thread_id}] 🚀 Success {self.successful_requests}{Colors.ENDC}")
-                    else:
-                        self.failed_requests += 1
-                        print(f"{Colors.WARNING}[Thread {thread_id}] ⚠️ HTTP {response.status_code} - Failed {self.failed_requests}{Colors.ENDC}")
+                response = self.session.get(self.target_url, timeout=DEFAULT_REQUEST_TIMEOUT)
             except requests.RequestException as e:
-                with self.lock:
-                    self.failed_requests += 1
-                    print(f"{Colors.FAIL}[Thread {thread_id}] ❌ Failed {self.failed_requests} - {str(e)[:50]}{Colors.ENDC}")
+                self.record_failure(f"Thread {thread_id}", e, opened_connection(), stats)
+                continue
+            self.record_response(f"Thread {thread_id}", response.status_code, opened_connection(),
+                                 time.perf_counter() - started, stats)
+
+    def record_response(self, worker, status_code, new_connection, latency, stats):
+        """Count a completed request; anything but HTTP 200 is a failure. Warm-up results are only shown"""
+        if not self.budget.measured():
+            print(f"{Colors.DARK}[{worker}] 🔥 Warm-up - HTTP {status_code}{Colors.ENDC}")
+            return
+        stats.response(status_code, latency)
+        with self.lock:
+            if new_connection:
+                self.new_connection_requests += 1
+            else:
+                self.reused_connection_requests += 1
+            if status_code == 200:
+                self.successful_requests += 1
+                print(f"{Colors.OKGREEN}[{worker}] 🚀 Success {self.successful_requests}{Colors.ENDC}")
+            else:
+                self.failed_requests += 1
+                print(f"{Colors.WARNING}[{worker}] ⚠️ HTTP {status_code} - Failed {self.failed_requests}{Colors.ENDC}")
+
+    def record_failure(self, worker, error, new_connection, stats):
+        """Count a request that got no response. Warm-up failures are only shown"""
+        error_text = (str(error) or type(error).__name__)[:50]
+        if not self.budget.measured():
+            print(f"{Colors.DARK}[{worker}] 🔥 Warm-up - {error_text}{Colors.ENDC}")
+            return
+        stats.failure(error)
+        with self.lock:
+            self.failed_requests += 1
+            print(f"{Colors.FAIL}[{worker}] ❌ Failed {self.failed_requests} - {error_text}{Colors.ENDC}")
+
+    def run_async(self, profile=None):
+        """Drive the test from one event loop with keep-alive connections; open model with a profile"""
+        # Every connection runs on the loop's thread, so they share one RequestStats
+        stats = RequestStats()
+        self.worker_stats.append(stats)
+        engine = AsyncHTTPEngine(
+            self.target_url,
+            self.request_count,
+            on_response=lambda worker, status, new, latency: self.record_response(
+                f"Conn {worker}", status, new, latency, stats),
+            on_failure=lambda worker, error, new: self.record_failure(f"Conn {worker}", error, new, stats),
+            concurrency=self.concurrency,
+            max_requests_per_connection=self.max_requests_per_connection,
+            user_agent=f"Batman/{self.version}",
+            schedule=profile.send_times() if profile else None,
+            budget=self.budget
+        )
+        if engine.concurrency < min(self.concurrency, self.request_count or self.concurrency):
+            print(f"{Colors.WARNING}⚠️ Open-file limit allows only {engine.concurrency} connections{Colors.ENDC}")
+        engine.run()
+        self.queued_requests = engine.queued
 
     def start_load_test(self):
         """Start performing load test on the target URL"""
@@ -153,13 +337,48 @@ class Batman:
             print(f"{Colors.WARNING}❌ No target URL set. Please set the target URL first.{Colors.ENDC}")
             return
 
+        if not self.request_count and not self.duration:
+            print(f"{Colors.WARNING}❌ No request count or duration set. Please configure the load test first.{Colors.ENDC}")
+            return
+
         print(f"\n{Colors.BOLD}{Colors.OKCYAN}🚀 STARTING LOAD TEST{Colors.ENDC}")
-        print(f"{Colors.OKBLUE}Target: {self.target_url} | Requests: {self.request_count} | Threads: {self.thread_count}{Colors.ENDC}")
+        pool_size = self.pool_size or self.thread_count
+        limit_text = self.max_requests_per_connection or "unlimited"
+        profile = self.load_profile()
+        if profile:
+            print(f"{Colors.OKBLUE}Target: {self.target_url} | {self.run_length_text()} | Open model: {profile.describe()}{Colors.ENDC}")
+            print(f"{Colors.OKBLUE}Up to {self.concurrency} connections | Requests per connection: {limit_text}{Colors.ENDC}")
+        elif self.engine == 'async':
+            print(f"{Colors.OKBLUE}Target: {self.target_url} | {self.run_length_text()} | Engine: async, {self.concurrency} connections{Colors.ENDC}")
+            print(f"{Colors.OKBLUE}Requests per connection: {limit_text}{Colors.ENDC}")
+        else:
+            print(f"{Colors.OKBLUE}Target: {self.target_url} | {self.run_length_text()} | Threads: {self.thread_count}{Colors.ENDC}")
+            print(f"{Colors.OKBLUE}Connection pool: {pool_size} keep-alive | Requests per connection: {limit_text}{Colors.ENDC}")
         print("-" * 60)
 
-        threads = []
         self.successful_requests = 0
         self.failed_requests = 0
+        self.new_connection_requests = 0
+        self.reused_connection_requests = 0
+        self.queued_requests = 0
+        self.worker_stats = []
+        self.budget = RequestBudget(self.request_count, self.duration, self.warmup)
+        if profile or self.engine == 'async':
+            self.run_async(profile)
+        else:
+            self.run_threaded(pool_size)
+        finished = time.perf_counter()
+        self.test_duration = finished - self.budget.started
+        self.measured_duration = self.budget.measured_seconds(finished)
+        self.stats = RequestStats.merged(self.worker_stats)
+
+        print(f"\n{Colors.OKGREEN}✅ Load test completed.{Colors.ENDC}")
+        self.print_performance()
+
+    def run_threaded(self, pool_size):
+        """Blocking requests from worker threads sharing one keep-alive pool"""
+        threads = []
+        self.session = pooled_session(pool_size, self.max_requests_per_connection)
 
         # Start threads
         for i in range(self.thread_count):
@@ -170,8 +389,40 @@ class Batman:
         # Wait for completion
         for thread in threads:
             thread.join()
+        self.session.close()
 
-        print(f"\n{Colors.OKGREEN}✅ Load test completed.{Colors.ENDC}")
+    def print_performance(self):
+        """Throughput, latency percentiles, status codes, error classes and connection reuse"""
+        stats = self.stats
+        if stats is None:
+            return
+        total = stats.responses + stats.failures
+        if self.measured_duration:
+            warmup_text = f" after {self.budget.warmup:g}s warm-up" if self.budget.warmup else ""
+            print(f"Throughput: {Colors.OKCYAN}{total / self.measured_duration:,.1f} req/s{Colors.ENDC} "
+                  f"({total:,} requests in {self.measured_duration:.2f}s{warmup_text})")
+        if stats.responses:
+            print(f"Latency: {Colors.OKCYAN}{stats.percentile_text()}{Colors.ENDC}")
+        if stats.statuses:
+            codes = ", ".join(f"{status}: {count:,}" for status, count in sorted(stats.statuses.items()))
+            print(f"Status codes: {codes}")
+        if stats.errors:
+            errors = ", ".join(f"{name}: {count:,}" for name, count in
+                               sorted(stats.errors.items(), key=lambda item: -item[1]))
+            print(f"Errors: {Colors.FAIL}{errors}{Colors.ENDC}")
+        if self.queued_requests:
+            print(f"{Colors.WARNING}⚠️ {self.queued_requests:,} requests waited for a free connection "
+                  f"(latency includes the wait); raise the connection limit to hold the target rate{Colors.ENDC}")
+        self.print_connection_stats()
+
+    def print_connection_stats(self):
+        """New versus reused connections of the completed requests"""
+        completed = self.new_connection_requests + self.reused_connection_requests
+        if not completed:
+            return
+        reused = self.reused_connection_requests / completed * 100
+        print(f"New connections: {Colors.OKCYAN}{self.new_connection_requests}{Colors.ENDC} | "
+              f"Reused connections: {Colors.OKCYAN}{self.reused_connection_requests}{Colors.ENDC} ({reused:.1f}% reused)")
 
     def view_test_results(self):
         """Display test results"""
@@ -179,6 +430,7 @@ class Batman:
         print("=" * 60)
         print(f"Successful requests: {Colors.OKGREEN}{self.successful_requests}{Colors.ENDC}")
         print(f"Failed requests: {Colors.FAIL}{self.failed_requests}{Colors.ENDC}")
+        self.print_performance()
 
     def main_loop(self):
         """Main application loop"""
@@ -204,10 +456,116 @@ class Batman:
                 print(f"{Colors.FAIL}❌ Invalid option. Please try again.{Colors.ENDC}")
 
 
+def valid_stages(text):
+    try:
+        parse_stages(text)
+    except ValueError:
+        return False
+    return True
+
+
+def valid_duration(text):
+    try:
+        parse_duration(text)
+    except ValueError:
+        return False
+    return True
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Batman Load Testing Tool - For Authorized Testing Only",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python3 batman.py --requests 500 --threads 20
+  python3 batman.py --url http://10.0.0.5:8080/ --requests 100000 --engine async --concurrency 5000
+  python3 batman.py --url http://10.0.0.5:8080/ --rate 500 --requests 30000
+  python3 batman.py --url http://10.0.0.5:8080/ --engine async --duration 10m --warmup 30s
+  python3 batman.py --url http://10.0.0.5:8080/ --stages 30s:500,2m:500,30s:0 --concurrency 2000
+
+With --url the test runs at once and Batman exits; otherwise the settings
+are preloaded into the interactive menu.
+        """
+    )
+    parser.add_argument('--url', help='Target URL (http:// or https://); runs the test without the menu')
+    parser.add_argument('--requests', type=int, default=0,
+                        help='Number of requests to send, exactly (with --duration, at most)')
+    parser.add_argument('--duration', default='0', metavar='DURATION',
+                        help='Run for this long, e.g. 90s or 10m (default: until --requests are sent)')
+    parser.add_argument('--warmup', default='0', metavar='DURATION',
+                        help='Leave results of the first DURATION out of the statistics (default: none)')
+    parser.add_argument('--engine', choices=ENGINES,
+                        help='threaded: one blocking request per thread; async: keep-alive connections on one '
+                             'event loop (default: threaded; async with --rate or --stages)')
+    parser.add_argument('--threads', type=int, default=10, help='Threads for the threaded engine (1-500, default: 10)')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_HTTP_CONCURRENCY,
+                        help=f'Connections for the async engine (1-{MAX_HTTP_CONCURRENCY}, '
+                             f'default: {DEFAULT_HTTP_CONCURRENCY})')
+    parser.add_argument('--pool-size', type=int, default=DEFAULT_POOL_SIZE,
+                        help='Keep-alive connections shared by the threads (default: one per thread)')
+    parser.add_argument('--max-requests-per-connection', type=int, default=DEFAULT_MAX_REQUESTS_PER_CONNECTION,
+                        metavar='N', help='Reconnect after N requests on a connection (default: unlimited)')
+    parser.add_argument('--rate', type=float, default=0.0, metavar='RPS',
+                        help='Open model: send requests at this rate whether or not earlier ones returned; '
+                             'with --stages, the starting rate (default: closed model)')
+    parser.add_argument('--stages', metavar='DURATION:RATE,...',
+                        help='Open model ramp, e.g. 30s:500,2m:500,30s:0 (up to 500 req/s, hold, down); '
+                             'sets the request count')
+    args = parser.parse_args()
+    try:
+        args.duration = parse_duration(args.duration)
+        args.warmup = parse_duration(args.warmup)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.duration and args.warmup >= args.duration:
+        parser.error("--warmup must be shorter than --duration")
+    open_model = args.rate > 0 or args.stages
+    if args.rate < 0:
+        parser.error("--rate must be positive")
+    if args.stages:
+        try:
+            args.stages = parse_stages(args.stages)
+        except ValueError as e:
+            parser.error(f"--stages: {e}")
+        args.requests = LoadProfile(args.stages, start_rate=args.rate).total_requests()
+        if not args.requests:
+            parser.error("--stages sends no requests")
+    if open_model and args.engine == 'threaded':
+        parser.error("--rate and --stages run on the async engine")
+    args.engine = args.engine or ('async' if open_model else 'threaded')
+    if args.url and not args.url.startswith('http'):
+        parser.error("--url must start with http:// or https://")
+    if args.url and args.requests <= 0 and not args.duration:
+        parser.error("--url needs --requests or --duration")
+    if not 1 <= args.threads <= 500:
+        parser.error("--threads must be between 1 and 500")
+    if not 1 <= args.concurrency <= MAX_HTTP_CONCURRENCY:
+        parser.error(f"--concurrency must be between 1 and {MAX_HTTP_CONCURRENCY}")
+    return args
+
+
 def main():
     """Main application entry point"""
+    args = parse_args()
     try:
         batman = Batman()
+        batman.request_count = max(0, args.requests)
+        batman.duration = args.duration
+        batman.warmup = args.warmup
+        batman.engine = args.engine
+        batman.thread_count = args.threads
+        batman.concurrency = args.concurrency
+        batman.pool_size = max(0, args.pool_size)
+        batman.max_requests_per_connection = max(0, args.max_requests_per_connection)
+        batman.target_rate = args.rate
+        batman.stages = args.stages or []
+        if args.url:
+            batman.target_url = args.url
+            batman.start_load_test()  # Ends with the performance report
+            print(f"Successful requests: {Colors.OKGREEN}{batman.successful_requests}{Colors.ENDC}")
+            print(f"Failed requests: {Colors.FAIL}{batman.failed_requests}{Colors.ENDC}")
+            return
         batman.main_loop()
     except KeyboardInterrupt:
         print(f"\n{Colors.WARNING}🛑 Test interrupted by user.{Colors.ENDC}")
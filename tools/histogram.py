@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Histogram
+Fixed-memory, log-bucketed latency histogram shared by the scanners' metrics
+and Batman's response-time reporting.
+For authorized security testing only.
+"""
+
+from bisect import bisect_left
+
+# Bucket upper bounds: 15 steps per decade from 1 µs to 900 s, so a value is
+# never more than 25% from its bucket's lower bound and percentiles
+# interpolated inside a bucket stay within about 12%
+MANTISSAS = (1, 1.25, 1.5, 1.75, 2, 2.5, 3, 3.5, 4, 4.5, 5, 6, 7, 8, 9)
+BOUNDS = tuple(float(f"{mantissa}e{exponent}") for exponent in range(-6, 3) for mantissa in MANTISSAS)
+
+# Coarser bounds for exported bucket lists (Prometheus); a subset of BOUNDS
+EXPORT_BOUNDS = tuple(bound for bound in BOUNDS if f"{bound:e}"[:4] in ('1.00', '2.50', '5.00'))
+
+
+def format_seconds(seconds):
+    """0.00035 -> '0.35ms', 0.012 -> '12ms', 2.04 -> '2.04s'"""
+    if seconds is None:
+        return "n/a"
+    if seconds < 0.001:
+        return f"{seconds * 1000:.2f}ms"
+    if seconds < 1:
+        return f"{seconds * 1000:.0f}ms"
+    return f"{seconds:.2f}s"
+
+
+class LatencyHistogram:
+    """Counts of durations (seconds) in BOUNDS buckets, plus sum and max.
+
+    Recording is a bisect and three additions; memory is fixed no matter how
+    many values are recorded. Not locked: give every worker its own
+    histogram and merge() them, or guard a shared one with a lock.
+    Values above the last bound land in an overflow bucket.
+    """
+
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        self.counts[bisect_left(BOUNDS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """Add another histogram, or a snapshot() of one, into this one"""
+        if isinstance(other, dict):
+            other = self.from_snapshot(other)
+        for i, count in enumerate(other.counts):
+            if count:
+                self.counts[i] += count
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+        return self
+
+    def percentile(self, q):
+        """Estimated value at quantile `q` (0-1), interpolated within its bucket; None if empty"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if not count:
+                continue
+            if seen + count >= rank:
+                if i == len(BOUNDS):
+                    return self.max
+                lower = BOUNDS[i - 1] if i else 0.0
+                value = lower + (BOUNDS[i] - lower) * max(0.0, rank - seen) / count
+                return min(value, self.max)
+            seen += count
+        return self.max
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def cumulative(self, bounds=EXPORT_BOUNDS):
+        """[(upper bound, values <= bound), ...] for a subset of BOUNDS, ending with +inf"""
+        result = []
+        running = 0
+        i = 0
+        for bound in bounds:
+            while i < len(BOUNDS) and BOUNDS[i] <= bound:
+                running += self.counts[i]
+                i += 1
+            result.append((bound, running))
+        result.append((float('inf'), self.count))
+        return result
+
+    def summary(self):
+        """Count, mean, common percentiles and max, for reports"""
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'p50': self.percentile(0.5),
+            'p90': self.percentile(0.9),
+            'p99': self.percentile(0.99),
+            'p999': self.percentile(0.999),
+            'max': self.max if self.count else None
+        }
+
+    def snapshot(self):
+        """Picklable, JSON-friendly state: only non-empty buckets are listed"""
+        return {
+            'buckets': [[i, count] for i, count in enumerate(self.counts) if count],
+            'count': self.count,
+            'sum': self.sum,
+            'max': self.max
+        }
+
+    @classmethod
+    def from_snapshot(cls, data):
+        histogram = cls()
+        for i, count in data['buckets']:
+            histogram.counts[i] = count
+        histogram.count = data['count']
+        histogram.sum = data['sum']
+        histogram.max = data['max']
+        return histogram
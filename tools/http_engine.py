@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Async HTTP Engine
+Event-loop engine for the Batman load tester: thousands of keep-alive
+HTTP/1.1 connections driven from one thread by a minimal client, instead
+of one OS thread per in-flight request.
+For authorized load testing only.
+"""
+
+import asyncio
+import ssl
+import time
+from urllib.parse import urlsplit
+
+from scan_engine import raise_fd_limit
+from load_profile import RequestBudget
+
+DEFAULT_HTTP_CONCURRENCY = 1000
+MAX_HTTP_CONCURRENCY = 20000
+DEFAULT_REQUEST_TIMEOUT = 5.0
+HEADER_LIMIT = 64 * 1024       # Largest response head accepted
+READ_CHUNK = 64 * 1024         # Bodies are read and discarded in chunks of this size
+NO_BODY_STATUSES = (204, 304)
+
+# Failures of a single request; the connection is dropped and the next request opens a new one
+REQUEST_ERRORS = (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError)
+
+
+class HTTPTarget:
+    """Pre-rendered GET requests for one URL"""
+
+    def __init__(self, url, user_agent="Batman"):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f"Unsupported URL: {url}")
+        self.host = parts.hostname
+        self.tls = parts.scheme == 'https'
+        self.port = parts.port or (443 if self.tls else 80)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        host_header = parts.netloc.rsplit('@', 1)[-1]
+        head = (f"GET {path} HTTP/1.1\r\nHost: {host_header}\r\nUser-Agent: {user_agent}\r\n"
+                f"Accept: */*\r\nAccept-Encoding: identity\r\n")
+        self.request = (head + "Connection: keep-alive\r\n\r\n").encode()
+        self.closing_request = (head + "Connection: close\r\n\r\n").encode()
+        self.ssl = ssl.create_default_context() if self.tls else None
+
+
+async def discard(reader, length):
+    """Read and drop exactly `length` body bytes"""
+    while length > 0:
+        data = await reader.read(min(length, READ_CHUNK))
+        if not data:
+            raise asyncio.IncompleteReadError(b'', length)
+        length -= len(data)
+
+
+async def read_response(reader):
+    """Read one response; returns (status, keep_alive). The body is discarded."""
+    while True:
+        head = await reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        version, _, rest = lines[0].partition(' ')
+        if not version.startswith('HTTP/'):
+            raise ValueError(f"Bad status line: {lines[0][:40]!r}")
+        status = int(rest[:3])
+        if status >= 200 or status == 101:
+            break  # 1xx interim responses carry no body and precede the real one
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(':')
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    connection = headers.get('connection', '').lower()
+    keep_alive = 'close' not in connection and (version != 'HTTP/1.0' or 'keep-alive' in connection)
+
+    if status in NO_BODY_STATUSES:
+        return status, keep_alive
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';', 1)[0], 16)
+            if size == 0:
+                while await reader.readuntil(b'\r\n') != b'\r\n':
+                    pass  # Trailers
+                return status, keep_alive
+            await discard(reader, size + 2)
+    if 'content-length' in headers:
+        await discard(reader, int(headers['content-length']))
+        return status, keep_alive
+    # No framing: the body runs until the server closes the connection
+    while await reader.read(READ_CHUNK):
+        pass
+    return status, False
+
+
+class Slot:
+    """One connection of the engine: opened lazily, reopened after the server closes it"""
+
+    __slots__ = ('number', 'reader', 'writer', 'served')
+
+    def __init__(self, number):
+        self.number = number
+        self.reader = self.writer = None
+        self.served = 0
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class AsyncHTTPEngine:
+    """Keep-alive HTTP/1.1 load generator on a single asyncio event loop.
+
+    Closed model (the default): `concurrency` coroutines each hold one
+    connection and send GET requests back to back until `request_count`
+    requests have been issued in total, or until `budget` (a RequestBudget,
+    which can also end the run on time) is spent. Open model: with a
+    `schedule` of send times (seconds from the start, ascending), each
+    request is issued when it is due whether or not earlier ones have
+    completed, on the most recently used free connection; `concurrency`
+    caps the connections, and requests due while all are busy wait for one
+    (counted in `queued`). The budget applies to scheduled requests too.
+
+    Connections are reused until the server closes them or, with
+    `max_requests_per_connection`, until that many requests were sent (the
+    last one with `Connection: close`). Results are reported through
+    on_response(worker_id, status, new_connection, seconds) and
+    on_failure(worker_id, error, new_connection), like the threaded workers.
+    `seconds` runs from the start of the request, connecting included; in
+    the open model it runs from the time the request was due, so a server
+    that falls behind shows up in the latency instead of lowering the load.
+    """
+
+    def __init__(self, url, request_count, on_response, on_failure, concurrency=DEFAULT_HTTP_CONCURRENCY,
+                 timeout=DEFAULT_REQUEST_TIMEOUT, max_requests_per_connection=0, user_agent="Batman",
+                 schedule=None, budget=None):
+        self.target = HTTPTarget(url, user_agent)
+        self.budget = budget or RequestBudget(request_count)
+        self.on_response = on_response
+        self.on_failure = on_failure
+        self.concurrency = raise_fd_limit(max(1, min(concurrency, request_count) if request_count else concurrency))
+        self.timeout = timeout
+        self.max_requests = max(0, max_requests_per_connection)
+        self.schedule = schedule
+        self.queued = 0
+
+    def take(self):
+        """Claim the next request of the budget; False once it is spent"""
+        return self.budget.claim()
+
+    async def connect(self):
+        target = self.target
+        return await asyncio.wait_for(
+            asyncio.open_connection(target.host, target.port, ssl=target.ssl, limit=HEADER_LIMIT,
+                                    server_hostname=target.host if target.tls else None),
+            self.timeout)
+
+    async def exchange(self, reader, writer, last):
+        writer.write(self.target.closing_request if last else self.target.request)
+        return await read_response(reader)
+
+    async def send(self, slot, started):
+        """One request on `slot`, reported with the latency since `started`"""
+        if slot.writer is not None and slot.reader.at_eof():
+            slot.close()  # Closed by the server while idle
+        new_connection = slot.writer is None
+        try:
+            if new_connection:
+                slot.reader, slot.writer = await self.connect()
+                slot.served = 0
+            last = bool(self.max_requests) and slot.served + 1 >= self.max_requests
+            status, keep_alive = await asyncio.wait_for(
+                self.exchange(slot.reader, slot.writer, last), self.timeout)
+            slot.served += 1
+        except REQUEST_ERRORS as e:
+            slot.close()
+            self.on_failure(slot.number, e, new_connection)
+            return
+        self.on_response(slot.number, status, new_connection, time.perf_counter() - started)
+        if last or not keep_alive:
+            slot.close()
+
+    async def _worker(self, worker_id):
+        slot = Slot(worker_id)
+        while self.take():
+            await self.send(slot, time.perf_counter())
+        slot.close()
+
+    async def _scheduled(self, due, idle, free):
+        if free.locked():
+            self.queued += 1
+        async with free:
+            slot = idle.pop()
+            try:
+                await self.send(slot, due)
+            finally:
+                idle.append(slot)
+
+    async def run_open(self):
+        """Issue requests at their scheduled times, independent of completions"""
+        slots = [Slot(i + 1) for i in range(self.concurrency)]
+        idle = slots[::-1]  # A stack, so the warmest connection is reused first
+        free = asyncio.Semaphore(len(slots))
+        pending = set()
+        begin = time.perf_counter()
+        for offset in self.schedule:
+            due = begin + offset
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if not self.take():
+                break
+            task = asyncio.ensure_future(self._scheduled(due, idle, free))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending)
+        for slot in slots:
+            slot.close()
+
+    async def run_async(self):
+        if self.schedule is not None:
+            await self.run_open()
+            return
+        await asyncio.gather(*(self._worker(i + 1) for i in range(self.concurrency)))
+
+    def run(self):
+        asyncio.run(self.run_async())
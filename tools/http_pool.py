@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+HTTP Connection Pool
+Keep-alive connection pooling for the Batman load tester: workers share one
+requests session whose connections stay open between requests, with an
+optional cap on requests per connection and per-request accounting of new
+versus reused connections.
+For authorized load testing only.
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+DEFAULT_POOL_SIZE = 0                      # 0: one connection per worker
+DEFAULT_MAX_REQUESTS_PER_CONNECTION = 0    # 0: unlimited
+
+# Connections are opened in the thread whose request needs them, so each
+# worker can tell whether its last request paid for a handshake
+_local = threading.local()
+
+
+class CountingConnection:
+    """Connection mixin recording new connections and closing after `max_requests`.
+
+    The last request a connection may serve goes out with `Connection: close`,
+    so the server ends it cleanly, and the connection is reopened before its
+    next request even if the server kept it open.
+    """
+
+    max_requests = 0
+    requests_served = 0
+
+    def connect(self):
+        super().connect()
+        self.requests_served = 0
+        _local.new_connection = True
+
+    def request(self, method, url, body=None, headers=None, **kwargs):
+        if self.sock is not None and self.max_requests and self.requests_served >= self.max_requests:
+            self.close()
+        served = self.requests_served if self.sock is not None else 0
+        if self.max_requests and served + 1 >= self.max_requests:
+            headers = {name: value for name, value in (headers or {}).items() if name.lower() != 'connection'}
+            headers['Connection'] = 'close'
+        super().request(method, url, body=body, headers=headers, **kwargs)
+        self.requests_served = served + 1
+
+
+def limited_pool(pool_class, max_requests):
+    """Subclass of a urllib3 pool class whose connections count and cap their requests"""
+    connection_class = type(f"Counting{pool_class.ConnectionCls.__name__}",
+                            (CountingConnection, pool_class.ConnectionCls), {'max_requests': max_requests})
+    return type(f"Counting{pool_class.__name__}", (pool_class,), {'ConnectionCls': connection_class})
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter keeping up to `pool_size` keep-alive connections per host.
+
+    Workers beyond the pool size wait for a free connection rather than
+    opening extra ones, so the pool size is the connection count the target
+    sees.
+    """
+
+    def __init__(self, pool_size, max_requests=DEFAULT_MAX_REQUESTS_PER_CONNECTION):
+        self.max_requests = max(0, max_requests)
+        super().__init__(pool_connections=1, pool_maxsize=max(1, pool_size), pool_block=True)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': limited_pool(HTTPConnectionPool, self.max_requests),
+            'https': limited_pool(HTTPSConnectionPool, self.max_requests),
+        }
+
+
+def pooled_session(pool_size, max_requests=DEFAULT_MAX_REQUESTS_PER_CONNECTION):
+    """requests.Session sending every http(s) request through one PooledAdapter"""
+    session = requests.Session()
+    adapter = PooledAdapter(pool_size, max_requests)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def opened_connection():
+    """Whether a connection was opened in this thread since the last call"""
+    opened = getattr(_local, 'new_connection', False)
+    _local.new_connection = False
+    return opened
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Load Profile
+How much load the Batman load tester sends: exact request budgets and
+time-boxed runs shared by all workers, and open-model arrival schedules in
+which requests are due at times set by a target rate in requests per second,
+whether or not earlier requests have completed, with staged ramp-up / hold /
+ramp-down profiles.
+For authorized load testing only.
+"""
+
+import itertools
+import math
+import re
+import time
+
+_DURATION = re.compile(r'^(\d+(?:\.\d+)?)(ms|s|m|h)?$')
+_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, None: 1}
+
+
+def parse_duration(text):
+    """'90', '90s', '1.5m', '500ms' or '2h' in seconds"""
+    match = _DURATION.match(text.strip().lower())
+    if not match:
+        raise ValueError(f"Invalid duration: {text!r}")
+    return float(match.group(1)) * _UNITS[match.group(2)]
+
+
+def parse_stages(text):
+    """'30s:500,2m:500,30s:0' as [(30.0, 500.0), (120.0, 500.0), (30.0, 0.0)]"""
+    stages = []
+    for part in text.split(','):
+        duration, sep, rate = part.strip().partition(':')
+        if not sep:
+            raise ValueError(f"Invalid stage {part.strip()!r}, expected DURATION:RATE")
+        seconds, rate = parse_duration(duration), float(rate)
+        if seconds <= 0 or rate < 0:
+            raise ValueError(f"Invalid stage {part.strip()!r}")
+        stages.append((seconds, rate))
+    if not stages:
+        raise ValueError("No stages given")
+    return stages
+
+
+class RequestBudget:
+    """Exactly `count` requests, and/or as many as fit in `duration` seconds, shared by all workers.
+
+    claim() draws tickets from an itertools.count, whose next() is a single
+    atomic step under the GIL, so threads never wait on a lock and never
+    claim more than `count` between them. 0 leaves either limit off.
+    Results completing in the first `warmup` seconds are left out of the
+    statistics (see measured()).
+    """
+
+    def __init__(self, count=0, duration=0.0, warmup=0.0):
+        self.count = count
+        self.duration = duration
+        self.warmup = warmup
+        self.start()
+
+    def start(self):
+        """Reset the tickets and the clock; called when the test begins"""
+        self._tickets = itertools.count()
+        self.started = time.perf_counter()
+        self.deadline = self.started + self.duration if self.duration else math.inf
+        self.measure_from = self.started + self.warmup
+
+    def claim(self):
+        """Take one request; False once the count is spent or the time is up"""
+        if self.count and next(self._tickets) >= self.count:
+            return False
+        return time.perf_counter() < self.deadline
+
+    def measured(self):
+        """Whether a result arriving now is past the warm-up"""
+        return time.perf_counter() >= self.measure_from
+
+    def measured_seconds(self, finished):
+        """Length of the measured window of a test that ended at `finished`.
+
+        A time-boxed window closes at the deadline, not when the requests
+        still in flight then have drained.
+        """
+        return max(0.0, min(finished, self.deadline) - self.measure_from)
+
+
+class LoadProfile:
+    """Piecewise-linear request rate over time.
+
+    Each stage moves the rate linearly from where the previous one ended to
+    its own target over its duration; the first starts at `start_rate`. So
+    '30s:500,2m:500,30s:0' ramps up to 500 req/s, holds it for two minutes
+    and ramps down. Request k is due when the integral of the rate reaches k.
+    """
+
+    def __init__(self, stages, start_rate=0.0):
+        self.stages = [(float(seconds), float(rate)) for seconds, rate in stages]
+        self.start_rate = float(start_rate)
+
+    @classmethod
+    def constant(cls, rate, request_count):
+        """`request_count` requests at a steady `rate` per second"""
+        return cls([(request_count / rate, rate)], start_rate=rate)
+
+    def segments(self):
+        """(start, duration, from_rate, to_rate) for every stage"""
+        start, rate = 0.0, self.start_rate
+        for seconds, target in self.stages:
+            yield start, seconds, rate, target
+            start, rate = start + seconds, target
+
+    @property
+    def duration(self):
+        return sum(seconds for seconds, _ in self.stages)
+
+    @property
+    def peak_rate(self):
+        return max([self.start_rate] + [rate for _, rate in self.stages])
+
+    def total_requests(self):
+        # The small tolerance keeps floating-point error from dropping the last request
+        return int(sum((r0 + r1) / 2 * seconds for _, seconds, r0, r1 in self.segments()) + 1e-6)
+
+    def send_times(self):
+        """Due time of every request, in seconds from the start of the test"""
+        due, base = 1, 0.0  # Next request number; requests due before the current stage
+        for start, seconds, r0, r1 in self.segments():
+            stage_total = (r0 + r1) / 2 * seconds
+            if stage_total <= 0:
+                continue  # A pause at rate 0
+            # Requests due `t` into the stage: n(t) = r0*t + a*t^2
+            a = (r1 - r0) / (2 * seconds)
+            while due <= base + stage_total + 1e-6:
+                n = due - base
+                # Root of a*t^2 + r0*t - n in the form that stays stable when a is 0 or negative
+                t = 2 * n / (r0 + math.sqrt(max(0.0, r0 * r0 + 4 * a * n)))
+                yield start + min(t, seconds)
+                due += 1
+            base += stage_total
+
+    def describe(self):
+        """'0→500 req/s over 30s, 500 req/s for 120s, 500→0 req/s over 30s'"""
+        parts = []
+        for _, seconds, r0, r1 in self.segments():
+            if r0 == r1:
+                parts.append(f"{r1:g} req/s for {seconds:g}s")
+            else:
+                parts.append(f"{r0:g}→{r1:g} req/s over {seconds:g}s")
+        return ", ".join(parts)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Load Statistics
+Per-worker request results for the Batman load tester: response latencies
+in a fixed-memory histogram plus counts by HTTP status and by error class,
+merged into one report when the test ends.
+For authorized load testing only.
+"""
+
+from histogram import LatencyHistogram, format_seconds
+
+# Percentiles shown in reports, as (label, quantile)
+REPORT_PERCENTILES = (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('p99.9', 0.999))
+
+
+class RequestStats:
+    """Results of one worker: latency of every response, statuses and error classes.
+
+    Not locked: each worker thread (or the async engine's event loop) keeps
+    its own and the reports merge() them once the workers have stopped.
+    """
+
+    __slots__ = ('latency', 'statuses', 'errors')
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.statuses = {}
+        self.errors = {}
+
+    def response(self, status, seconds):
+        """A response arrived `seconds` after the request was started"""
+        self.latency.record(seconds)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def failure(self, error):
+        """The request got no response; counted by exception class"""
+        name = type(error).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        for name, count in other.errors.items():
+            self.errors[name] = self.errors.get(name, 0) + count
+        return self
+
+    @classmethod
+    def merged(cls, workers):
+        total = cls()
+        for stats in workers:
+            total.merge(stats)
+        return total
+
+    @property
+    def responses(self):
+        return self.latency.count
+
+    @property
+    def failures(self):
+        return sum(self.errors.values())
+
+    def percentile_text(self):
+        """'p50 12ms | p90 30ms | p99 81ms | p99.9 140ms | max 210ms'"""
+        parts = [f"{label} {format_seconds(self.latency.percentile(q))}" for label, q in REPORT_PERCENTILES]
+        parts.append(f"max {format_seconds(self.latency.max if self.responses else None)}")
+        return " | ".join(parts)
@@ -8,11 +8,28 @@ Use only on networks you own or have explicit permission to test.
 import socket
 import threading
 import argparse
+import ipaddress
 import sys
 import time
 from datetime import datetime
 import subprocess
 
+from scan_engine import (AsyncConnectEngine, HostScheduler, HostTimeouts, ENGINES, DEFAULT_ASYNC_CONCURRENCY,
+                         DEFAULT_MIN_TIMEOUT, DEFAULT_ACTIVE_HOSTS, socket_family)
+from banner_stage import BannerStage, DEFAULT_BANNER_WORKERS, DEFAULT_BANNER_TIMEOUT
+from service_probes import get_database
+from result_sink import NDJSONSink
+from rate_limiter import RateGovernor
+from port_set import PortSet, ALL_PORTS
+from target_resolver import get_resolver
+from target_spec import TargetSpec, TargetStream
+from scan_progress import ScanProgress
+from scan_metrics import ScanMetrics, MetricsExporter, DEFAULT_EXPORT_INTERVAL
+from udp_engine import UDPScanEngine, DEFAULT_UDP_RETRIES, DEFAULT_UDP_PER_HOST_LIMIT
+from udp_probes import UDP_COMMON_PORTS
+from syn_engine import SynScanEngine, syn_available
+from port_frequency import LikelyOrder, likely_jobs, top_ports
+
 class Colors:
     """Terminal colors for better output formatting"""
     HEADER = '\033[95m'
@@ -26,15 +43,48 @@ class Colors:
     UNDERLINE = '\033[4m'
 
 class PortScanner:
-    def __init__(self, target, start_port=1, end_port=1024, threads=100, timeout=1, port_list=None):
+    def __init__(self, target, start_port=1, end_port=1024, threads=100, timeout=1, port_list=None,
+                 engine='threaded', concurrency=DEFAULT_ASYNC_CONCURRENCY,
+                 adaptive_timeout=True, min_timeout=DEFAULT_MIN_TIMEOUT,
+                 banner_workers=DEFAULT_BANNER_WORKERS, banner_timeout=DEFAULT_BANNER_TIMEOUT,
+                 result_sink=None, max_rate=0, per_target_rate=0, exclude=None, live_progress=None,
+                 metrics_output=None, metrics_interval=DEFAULT_EXPORT_INTERVAL, udp_retries=DEFAULT_UDP_RETRIES,
+                 likely_first=True):
         self.target = target
+        # A single host, or a spec (CIDR, range, @file, several entries) streamed address by address
+        self.spec = TargetSpec.parse(target, exclude)
+        self.single_host = len(self.spec.entries) == 1 and not self.spec.files and self.spec.count() == 1
+        self.addresses = [target]  # Every A/AAAA address of a single target, filled in by scan()
         self.start_port = start_port
         self.end_port = end_port
         self.threads = threads
         self.timeout = timeout
         self.open_ports = []
         self.lock = threading.Lock()
-        self.port_list = port_list  # Specific ports to scan
+        self.port_list = PortSet.from_ports(port_list) if port_list else None  # Specific ports to scan
+        self.engine = engine
+        self.protocol = 'udp' if engine == 'udp' else 'tcp'
+        self.concurrency = concurrency
+        self.udp_retries = udp_retries
+        self.likely_first = likely_first  # Probe the ports most often found open first
+        self.unanswered = 0  # UDP ports with no reply and no ICMP error (open|filtered)
+        self.metrics = ScanMetrics('milko')
+        self.metrics_output = metrics_output  # Path prefix for <prefix>.json / <prefix>.prom
+        self.metrics_interval = metrics_interval
+        self.host_timeouts = HostTimeouts(timeout, floor=min_timeout, adaptive=adaptive_timeout, metrics=self.metrics)
+        self.probe_db = get_database()
+        self.result_sink = result_sink  # Optional NDJSONSink for streaming output
+        self.governor = RateGovernor(max_rate, per_target_rate, metrics=self.metrics)
+        self.live_progress = live_progress
+        self.progress = None  # ScanProgress renderer while scan() runs
+        self.banner_stage = BannerStage(
+            self.grab_banner,
+            self.record_open_port,
+            workers=banner_workers,
+            timeout=banner_timeout,
+            governor=self.governor,
+            metrics=self.metrics
+        )
         
         # Common services dictionary
         self.services = {
@@ -55,117 +105,244 @@ class PortScanner:
         print("=" * 60)
         print(f"{Colors.ENDC}")
         print(f"{Colors.OKCYAN}Target: {Colors.BOLD}{self.target}{Colors.ENDC}")
-        print(f"{Colors.OKCYAN}Port Range: {Colors.BOLD}{self.start_port}-{self.end_port}{Colors.ENDC}")
-        print(f"{Colors.OKCYAN}Threads: {Colors.BOLD}{self.threads}{Colors.ENDC}")
-        print(f"{Colors.OKCYAN}Timeout: {Colors.BOLD}{self.timeout}s{Colors.ENDC}")
+        if not self.single_host:
+            print(f"{Colors.OKCYAN}Hosts: {Colors.BOLD}{self.spec.count():,}{Colors.ENDC}")
+        elif len(self.addresses) > 1:
+            print(f"{Colors.OKCYAN}Addresses: {Colors.BOLD}{', '.join(self.addresses)}{Colors.ENDC}")
+        ports_text = self.port_list.to_spec() if self.port_list else f"{self.start_port}-{self.end_port}"
+        if len(ports_text) > 40:
+            ports_text = f"{ports_text[:37]}... ({len(self.port_list)} ports)"
+        print(f"{Colors.OKCYAN}Port Range: {Colors.BOLD}{ports_text}{Colors.ENDC}")
+        if self.engine == 'udp':
+            print(f"{Colors.OKCYAN}Engine: {Colors.BOLD}udp ({self.concurrency} in flight, {self.udp_retries} retransmissions){Colors.ENDC}")
+        elif self.engine == 'syn':
+            print(f"{Colors.OKCYAN}Engine: {Colors.BOLD}syn ({self.concurrency} outstanding SYNs){Colors.ENDC}")
+        elif self.engine == 'async':
+            print(f"{Colors.OKCYAN}Engine: {Colors.BOLD}async ({self.concurrency} in flight){Colors.ENDC}")
+        else:
+            print(f"{Colors.OKCYAN}Threads: {Colors.BOLD}{self.threads}{Colors.ENDC}")
+        timeout_text = f"≤{self.timeout}s adaptive" if self.host_timeouts.adaptive else f"{self.timeout}s"
+        print(f"{Colors.OKCYAN}Timeout: {Colors.BOLD}{timeout_text}{Colors.ENDC}")
+        if self.governor.enabled:
+            print(f"{Colors.OKCYAN}Max Rate: {Colors.BOLD}{self.governor.limits()}{Colors.ENDC}")
         print(f"{Colors.OKCYAN}Started: {Colors.BOLD}{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}{Colors.ENDC}")
         print("-" * 60)
 
     def resolve_target(self):
-        """Resolve hostname to IP if needed"""
+        """Resolve hostname to all of its IPv4/IPv6 addresses"""
         try:
-            ip = socket.gethostbyname(self.target)
-            if ip != self.target:
-                print(f"{Colors.OKBLUE}Resolved {self.target} to {ip}{Colors.ENDC}")
-            return ip
+            addresses = get_resolver().lookup(self.target, self.metrics)
+            if addresses != [self.target]:
+                print(f"{Colors.OKBLUE}Resolved {self.target} to {', '.join(addresses)}{Colors.ENDC}")
+            return addresses
         except socket.gaierror:
             print(f"{Colors.FAIL}Error: Could not resolve hostname {self.target}{Colors.ENDC}")
             return None
 
-    def scan_port(self, port):
+    def scan_port(self, target, port):
         """Scan a single port"""
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(self.timeout)
-            result = sock.connect_ex((self.target, port))
+            if self.governor.enabled:
+                self.governor.wait(target)
+            sock = socket.socket(socket_family(target), socket.SOCK_STREAM)
+            result = self.host_timeouts.connect(sock, target, port)
+            sock.close()
             
             if result == 0:
-                # Try to grab banner
-                banner = self.grab_banner(sock, port)
-                service = self.services.get(port, "Unknown")
-                
-                with self.lock:
-                    self.open_ports.append({
-                        'port': port,
-                        'service': service,
-                        'banner': banner
-                    })
-                    print(f"{Colors.OKGREEN}[+] Port {port:5d} - {service:15s} - OPEN{Colors.ENDC}")
-                    if banner:
-                        print(f"    {Colors.WARNING}Banner: {banner}{Colors.ENDC}")
-            
-            sock.close()
+                # Banners are grabbed by the second stage
+                self.banner_stage.submit(target, port)
         except Exception as e:
             pass  # Port closed or filtered
+        finally:
+            self.progress.probe_done(target)
+
+    def record_open_port(self, target, port, fingerprint=None):
+        """Store and announce an open port found by any scan engine"""
+        service = (fingerprint and fingerprint.service) or self.services.get(port, "Unknown")
+        product = fingerprint.product if fingerprint else None
+        version = fingerprint.version if fingerprint else None
+        banner = fingerprint.banner if fingerprint else None
+        
+        with self.lock:
+            port_info = {
+                'target': target,
+                'port': port,
+                'protocol': self.protocol,
+                'service': service,
+                'product': product,
+                'version': version,
+                'banner': banner
+            }
+            self.open_ports.append(port_info)
+            if self.result_sink:
+                self.result_sink.write(dict(type='result', timestamp=datetime.now().isoformat(), **port_info))
+        
+        # Printed in batches by the progress renderer, outside the lock
+        address = f" on {target}" if self.multi_address else ""
+        protocol = "/udp" if self.protocol == 'udp' else ""
+        lines = [f"{Colors.OKGREEN}[+] Port {port:5d}{protocol} - {service:15s} - OPEN{address}{Colors.ENDC}"]
+        if product or version:
+            lines.append(f"    {Colors.OKCYAN}Version: {' '.join(filter(None, [product, version]))}{Colors.ENDC}")
+        if banner:
+            lines.append(f"    {Colors.WARNING}Banner: {banner}{Colors.ENDC}")
+        self.progress.finding("\n".join(lines))
+
+    def udp_unanswered(self, target, port):
+        with self.lock:
+            self.unanswered += 1
 
     def grab_banner(self, sock, port):
-        """Attempt to grab service banner"""
+        """Probe an open port and fingerprint the service behind it"""
         try:
-            if port in [21, 22, 23, 25, 110, 143]:  # Services that send banners
-                sock.settimeout(2)
-                banner = sock.recv(1024).decode('utf-8', errors='ignore').strip()
-                return banner[:100] if banner else None
-            elif port == 80:  # HTTP
-                sock.send(b"HEAD / HTTP/1.0\r\n\r\n")
-                response = sock.recv(1024).decode('utf-8', errors='ignore')
-                if 'Server:' in response:
-                    server_line = [line for line in response.split('\n') if 'Server:' in line]
-                    return server_line[0].strip() if server_line else None
+            return self.probe_db.fingerprint(sock, port, sock.gettimeout())
         except:
             pass
         return None
 
-    def worker(self, port_queue):
-        """Worker thread for scanning ports"""
+    def worker(self, jobs, jobs_lock):
+        """Worker thread pulling (address, port) jobs from the shared lazy iterator"""
         while True:
-            try:
-                port = port_queue.get(timeout=1)
-                self.scan_port(port)
-                port_queue.task_done()
-            except:
+            started = time.monotonic()
+            with jobs_lock:
+                job = next(jobs, None)
+            if job is None:
                 break
+            self.metrics.observe('queue_wait_seconds', time.monotonic() - started, stage='dispatch')
+            self.scan_port(*job)
+
+    @property
+    def multi_address(self):
+        return not self.single_host or len(self.addresses) > 1
 
     def scan(self):
         """Main scanning function"""
-        # Resolve target
-        resolved_ip = self.resolve_target()
-        if not resolved_ip:
-            return
-        
-        self.target = resolved_ip
+        if self.single_host:
+            addresses = self.resolve_target()
+            if not addresses:
+                return
+            self.target = addresses[0]
+            self.addresses = addresses
+        else:
+            # Addresses are generated (and names resolved) only as the engine consumes them
+            addresses = TargetStream(self.spec, get_resolver(), on_unresolved=lambda name: self.progress.message(
+                f"{Colors.FAIL}Error: Could not resolve hostname {name}{Colors.ENDC}"), metrics=self.metrics)
+            self.addresses = []
         self.banner()
         
-        # Create port queue
-        import queue
-        port_queue = queue.Queue()
-        
-        # Add ports to queue
-        if self.port_list:
-            # Use specific port list
-            for port in self.port_list:
-                port_queue.put(port)
-            total_ports = len(self.port_list)
+        ports = self.port_list if self.port_list else PortSet([(self.start_port, self.end_port)])
+        total_ports = len(ports) * (len(addresses) if self.single_host else self.spec.count())
+        if self.likely_first:
+            jobs = likely_jobs(addresses, ports, DEFAULT_ACTIVE_HOSTS, self.protocol)
         else:
-            # Use port range
-            for port in range(self.start_port, self.end_port + 1):
-                port_queue.put(port)
-            total_ports = self.end_port - self.start_port + 1
+            jobs = ((address, port) for address in addresses for port in ports)
+        
+        start_time = time.time()
+        completed = False
+        exporter = None
+        if self.metrics_output:
+            try:
+                exporter = MetricsExporter(self.metrics, self.metrics_output, self.metrics_interval).start()
+                print(f"{Colors.OKBLUE}Exporting metrics to {exporter.json_path}, {exporter.prom_path}{Colors.ENDC}")
+            except OSError as e:
+                print(f"{Colors.FAIL}Error: Cannot write metrics to {self.metrics_output} - {e}{Colors.ENDC}")
+        self.progress = ScanProgress(total=total_ports, ports_per_host=len(ports), live=self.live_progress).start()
+        self.banner_stage.start()
+        try:
+            if self.engine == 'udp':
+                self.metrics.set_gauge('workers', min(self.concurrency, total_ports))
+                # Scheduled per host: targets rate-limit ICMP errors, so a host only gets a few probes at once
+                scheduler = HostScheduler(
+                    addresses, LikelyOrder(ports, 'udp') if self.likely_first else ports,
+                    per_host_limit=DEFAULT_UDP_PER_HOST_LIMIT,
+                    on_probe_done=self.progress.probe_done,
+                    target_count=len(addresses) if self.single_host else self.spec.count(),
+                    metrics=self.metrics
+                )
+                engine = UDPScanEngine(
+                    on_open=self.record_open_port,
+                    timeout=self.timeout,
+                    retries=self.udp_retries,
+                    concurrency=min(self.concurrency, total_ports),
+                    timeouts=self.host_timeouts,
+                    governor=self.governor,
+                    on_unanswered=self.udp_unanswered,
+                    metrics=self.metrics
+                )
+                engine.run(scheduler)
+            elif self.engine == 'syn':
+                self.metrics.set_gauge('workers', min(self.concurrency, total_ports))
+                engine = SynScanEngine(
+                    on_open=self.banner_stage.submit,
+                    timeout=self.timeout,
+                    window=min(self.concurrency, total_ports),
+                    timeouts=self.host_timeouts,
+                    governor=self.governor,
+                    on_probe_done=self.progress.probe_done,
+                    metrics=self.metrics
+                )
+                engine.run(jobs)
+            elif self.engine == 'async':
+                self.metrics.set_gauge('workers', min(self.concurrency, total_ports))
+                engine = AsyncConnectEngine(
+                    on_open=self.banner_stage.submit,
+                    timeout=self.timeout,
+                    concurrency=min(self.concurrency, total_ports),
+                    timeouts=self.host_timeouts,
+                    governor=self.governor,
+                    on_probe_done=self.progress.probe_done,
+                    metrics=self.metrics
+                )
+                engine.run(jobs)
+            else:
+                self.metrics.set_gauge('workers', min(self.threads, total_ports))
+                self.run_threaded(jobs, total_ports)
+            completed = True
+            if not self.single_host:
+                total_ports = len(ports) * addresses.last_count
+        finally:
+            self.banner_stage.close()
+            self.progress.finish()
+            if exporter:
+                try:
+                    exporter.close(completed)
+                except OSError as e:
+                    print(f"{Colors.FAIL}Error: Failed to export metrics - {e}{Colors.ENDC}")
+            if self.result_sink:
+                self.result_sink.close(summary={
+                    'type': 'summary',
+                    'scanner': 'Network Port Scanner',
+                    'target': self.target,
+                    'addresses': self.addresses if self.single_host else None,
+                    'timestamp': datetime.now().isoformat(),
+                    'completed': completed,
+                    'total_results': len(self.open_ports),
+                    'protocol': self.protocol,
+                    'ports_scanned': total_ports,
+                    'scan_time': round(time.time() - start_time, 3),
+                    'probe_rate': round(self.governor.achieved_rate() or 0, 1)
+                })
+        scan_time = time.time() - start_time
+        
+        # Display results
+        self.display_results(scan_time, total_ports)
+
+    def run_threaded(self, jobs, total_jobs):
+        """Discovery with one blocking connect per worker thread"""
+        # Workers share one lazy iterator instead of a queue holding every port
+        jobs = iter(jobs)
+        jobs_lock = threading.Lock()
         
         # Start worker threads
         threads_list = []
-        for _ in range(min(self.threads, port_queue.qsize())):
-            t = threading.Thread(target=self.worker, args=(port_queue,))
+        for _ in range(min(self.threads, total_jobs)):
+            t = threading.Thread(target=self.worker, args=(jobs, jobs_lock))
             t.daemon = True
             t.start()
             threads_list.append(t)
         
         # Wait for completion
-        start_time = time.time()
-        port_queue.join()
-        scan_time = time.time() - start_time
-        
-        # Display results
-        self.display_results(scan_time, total_ports)
+        for t in threads_list:
+            t.join()
 
     def display_results(self, scan_time, total_ports):
         """Display scan results summary"""
@@ -176,20 +353,48 @@ class PortScanner:
         if self.open_ports:
             print(f"{Colors.OKGREEN}Found {len(self.open_ports)} open ports:{Colors.ENDC}\n")
             
-            # Sort by port number
-            self.open_ports.sort(key=lambda x: x['port'])
+            # Sort by address (IPv4 first), then port number
+            self.open_ports.sort(key=lambda x: (ipaddress.ip_address(x['target']).version,
+                                                ipaddress.ip_address(x['target']), x['port']))
+            multi_address = self.multi_address
             
-            print(f"{'PORT':<8} {'SERVICE':<15} {'BANNER'}")
+            address_header = f"{'ADDRESS':<26} " if multi_address else ""
+            print(f"{address_header}{'PORT':<8} {'SERVICE':<15} {'VERSION / BANNER'}")
             print("-" * 60)
             
             for port_info in self.open_ports:
-                banner = port_info['banner'][:40] + "..." if port_info['banner'] and len(port_info['banner']) > 40 else port_info['banner'] or ""
-                print(f"{port_info['port']:<8} {port_info['service']:<15} {banner}")
+                description = " ".join(filter(None, [port_info['product'], port_info['version']])) or port_info['banner']
+                banner = description[:40] + "..." if description and len(description) > 40 else description or ""
+                address = f"{port_info['target']:<26} " if multi_address else ""
+                port = f"{port_info['port']}/udp" if self.protocol == 'udp' else port_info['port']
+                print(f"{address}{port:<8} {port_info['service']:<15} {banner}")
         else:
             print(f"{Colors.WARNING}No open ports found in the specified range.{Colors.ENDC}")
         
         print(f"\n{Colors.OKCYAN}Scan completed in {scan_time:.2f} seconds{Colors.ENDC}")
+        if self.host_timeouts.adaptive and not self.single_host:
+            learned = sorted(self.host_timeouts.timeouts.values())
+            if learned:
+                print(f"{Colors.OKCYAN}Learned timeouts: {len(learned)} hosts, median {learned[len(learned) // 2] * 1000:.0f}ms{Colors.ENDC}")
+        elif self.host_timeouts.adaptive:
+            for address in self.addresses:
+                label = f" ({address})" if len(self.addresses) > 1 else ""
+                print(f"{Colors.OKCYAN}Learned timeout{label}: {self.host_timeouts.get(address) * 1000:.0f}ms{Colors.ENDC}")
         print(f"{Colors.OKCYAN}Ports scanned: {total_ports}{Colors.ENDC}")
+        if self.unanswered:
+            print(f"{Colors.OKCYAN}Open|filtered (UDP, no reply): {self.unanswered}{Colors.ENDC}")
+        if self.governor.enabled:
+            print(f"{Colors.OKCYAN}Probe rate: {self.governor.describe()}{Colors.ENDC}")
+        for label, text in self.metrics.summary_lines():
+            print(f"{Colors.OKCYAN}{label}: {text}{Colors.ENDC}")
+
+def validate_target(target, exclude=None):
+    """Validate a target spec; returns the error message or None"""
+    try:
+        TargetSpec.parse(target, exclude)
+        return None
+    except ValueError as e:
+        return str(e)
 
 def validate_ip(ip):
     """Validate IP address format"""
@@ -215,64 +420,103 @@ Examples:
   python3 network_scanner.py -t 192.168.1.1
   python3 network_scanner.py -t example.com -p 1-1000
   python3 network_scanner.py -t 10.0.0.1 -p 80,443,22,21
+  python3 network_scanner.py -t 10.0.0.1 -p all --engine async --concurrency 5000
   python3 network_scanner.py -t 192.168.1.0/24 --top-ports
+  python3 network_scanner.py -t 10.0.0.0/16 --exclude 10.0.5.0/24,10.0.0.1 -p 22,443
+  python3 network_scanner.py -t 10.0.0.1-50,2001:db8::/120 -p 80
+  python3 network_scanner.py -t @assets.txt --exclude @do-not-scan.txt
+  python3 network_scanner.py -t 10.0.0.0/24 -p all --engine async --metrics /var/lib/node_exporter/milko
+  python3 network_scanner.py -t 10.0.0.0/24 -p udp --engine udp
+  sudo python3 network_scanner.py -t 10.0.0.0/16 -p 1-1024 --engine syn --max-rate 20000
         """
     )
     
     parser.add_argument('-t', '--target', required=True,
-                       help='Target IP address or hostname')
+                       help='Target: IP, hostname, CIDR, range (10.0.0.1-50) or @file; comma-separated, !exclusion')
+    parser.add_argument('--exclude', metavar='SPEC',
+                       help='Addresses, CIDRs or ranges to skip (comma-separated, or @file)')
     parser.add_argument('-p', '--ports', default='1-1024',
-                       help='Port range (e.g., 1-1000, 80,443,22) or "all" for 1-65535')
+                       help='Port range (e.g., 1-1000, 80,443,22), "all" for 1-65535, "top100"/"top1000" for the '
+                            'ports most often found open, or "udp" for common UDP services')
     parser.add_argument('--top-ports', action='store_true',
-                       help='Scan top 100 most common ports')
+                       help='Scan the 100 ports most often found open')
     parser.add_argument('--threads', type=int, default=100,
                        help='Number of threads (default: 100)')
     parser.add_argument('--timeout', type=float, default=1,
                        help='Connection timeout in seconds (default: 1)')
     parser.add_argument('--stealth', action='store_true',
                        help='Use slower, more stealthy scanning')
+    parser.add_argument('--fixed-timeout', action='store_true',
+                       help='Disable per-host adaptive timeouts and always wait the full --timeout')
+    parser.add_argument('--min-timeout', type=float, default=DEFAULT_MIN_TIMEOUT,
+                       help=f'Floor for adaptive timeouts in seconds (default: {DEFAULT_MIN_TIMEOUT})')
+    parser.add_argument('--banner-workers', type=int, default=DEFAULT_BANNER_WORKERS,
+                       help=f'Threads grabbing banners from confirmed open ports (default: {DEFAULT_BANNER_WORKERS})')
+    parser.add_argument('--banner-timeout', type=float, default=DEFAULT_BANNER_TIMEOUT,
+                       help=f'Banner stage connect/read timeout in seconds (default: {DEFAULT_BANNER_TIMEOUT})')
+    parser.add_argument('--ndjson', metavar='FILE',
+                       help='Stream results as NDJSON to FILE ("-" for stdout) as they are found')
+    parser.add_argument('--engine', choices=ENGINES + ('udp', 'syn'), default='threaded',
+                       help='Scan engine: one thread per connect, a single asyncio event loop, UDP probes '
+                            'with protocol payloads, or half-open SYN probes from raw sockets (root; '
+                            'default: threaded)')
+    parser.add_argument('--udp-retries', type=int, default=DEFAULT_UDP_RETRIES, metavar='N',
+                       help=f'Retransmissions of unanswered UDP probes (default: {DEFAULT_UDP_RETRIES})')
+    parser.add_argument('--port-order', choices=('likely', 'numeric'), default='likely',
+                       help='Probe the ports most often found open first, across all targets, or in numeric '
+                            'order (default: likely)')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_ASYNC_CONCURRENCY,
+                       help=f'In-flight connects for the async engine, outstanding SYNs for the syn engine '
+                            f'(default: {DEFAULT_ASYNC_CONCURRENCY})')
+    parser.add_argument('--max-rate', type=float, default=0, metavar='PPS',
+                       help='Maximum connection attempts per second, banner reconnects included (default: unlimited)')
+    parser.add_argument('--per-target-rate', type=float, default=0, metavar='PPS',
+                       help='Maximum connection attempts per second to each target address (default: unlimited)')
+    parser.add_argument('--no-progress', action='store_true',
+                       help='Do not draw the live progress line (findings are still printed)')
+    parser.add_argument('--metrics', metavar='PREFIX',
+                       help='Export counters and latency histograms to PREFIX.json and PREFIX.prom (Prometheus)')
+    parser.add_argument('--metrics-interval', type=float, default=DEFAULT_EXPORT_INTERVAL, metavar='SECONDS',
+                       help=f'Seconds between metrics exports while scanning (default: {DEFAULT_EXPORT_INTERVAL:g})')
     
     args = parser.parse_args()
     
+    # Open the stream before anything else prints; with stdout streaming, the
+    # human-readable output moves to stderr so the NDJSON stays clean
+    result_sink = None
+    if args.ndjson:
+        try:
+            result_sink = NDJSONSink(args.ndjson)
+        except OSError as e:
+            print(f"{Colors.FAIL}Error: Cannot open {args.ndjson} - {e}{Colors.ENDC}")
+            sys.exit(1)
+        if args.ndjson == '-':
+            sys.stdout = sys.stderr
+    
     # Validate target
-    if not (validate_ip(args.target) or validate_hostname(args.target)):
-        print(f"{Colors.FAIL}Error: Invalid target format{Colors.ENDC}")
+    error = validate_target(args.target, args.exclude)
+    if error:
+        print(f"{Colors.FAIL}Error: Invalid target format - {error}{Colors.ENDC}")
         sys.exit(1)
     
+    if args.engine == 'syn':
+        reason = syn_available()
+        if reason:
+            print(f"{Colors.FAIL}Error: {reason}{Colors.ENDC}")
+            sys.exit(1)
+    
     # Parse port range
-    port_list = []
-    if args.top_ports:
-        # Top 100 ports
-        port_list = [21,22,23,25,53,69,80,110,119,123,135,139,143,161,389,443,445,993,995,1723,3306,3389,5432,5900,6379,8080,8443]
-        start_port, end_port = min(port_list), max(port_list)
+    if args.top_ports and args.engine == 'udp':
+        port_list = PortSet.from_ports(UDP_COMMON_PORTS)
+        print(f"{Colors.WARNING}Top ports mode - scanning common UDP services{Colors.ENDC}")
+    elif args.top_ports:
+        port_list = top_ports(100)
         print(f"{Colors.WARNING}Top ports mode - scanning most common ports{Colors.ENDC}")
-    elif args.ports == 'all':
-        start_port, end_port = 1, 65535
     else:
         # Parse complex port specifications (ranges and individual ports)
         try:
-            for part in args.ports.split(','):
-                part = part.strip()
-                if '-' in part:
-                    # Port range
-                    range_start, range_end = map(int, part.split('-'))
-                    if range_start > range_end or range_start < 1 or range_end > 65535:
-                        raise ValueError(f"Invalid range: {part}")
-                    port_list.extend(range(range_start, range_end + 1))
-                else:
-                    # Single port
-                    port = int(part)
-                    if port < 1 or port > 65535:
-                        raise ValueError(f"Invalid port: {port}")
-                    port_list.append(port)
-            
-            if not port_list:
-                raise ValueError("No valid ports specified")
-            
-            # Remove duplicates and sort
-            port_list = sorted(list(set(port_list)))
-            start_port, end_port = min(port_list), max(port_list)
-            
+            port_list = PortSet.parse(args.ports, {'all': ALL_PORTS, 'udp': PortSet.from_ports(UDP_COMMON_PORTS),
+                                                   'top100': top_ports(100), 'top1000': top_ports(1000)})
         except ValueError as e:
             print(f"{Colors.FAIL}Error: Invalid port specification - {e}{Colors.ENDC}")
             sys.exit(1)
@@ -280,6 +524,7 @@ Examples:
     # Adjust settings for stealth mode
     if args.stealth:
         args.threads = min(args.threads, 10)
+        args.concurrency = min(args.concurrency, 10)
         args.timeout = max(args.timeout, 3)
         print(f"{Colors.WARNING}Stealth mode enabled - slower but less detectable{Colors.ENDC}")
     
@@ -296,11 +541,26 @@ Examples:
     # Create and run scanner
     scanner = PortScanner(
         target=args.target,
-        start_port=start_port,
-        end_port=end_port,
+        start_port=port_list.first,
+        end_port=port_list.last,
         threads=args.threads,
         timeout=args.timeout,
-        port_list=port_list if port_list else None
+        port_list=port_list if port_list else None,
+        engine=args.engine,
+        concurrency=args.concurrency,
+        adaptive_timeout=not (args.fixed_timeout or args.stealth),
+        min_timeout=args.min_timeout,
+        banner_workers=args.banner_workers,
+        banner_timeout=args.banner_timeout,
+        result_sink=result_sink,
+        max_rate=args.max_rate,
+        per_target_rate=args.per_target_rate,
+        exclude=args.exclude,
+        live_progress=False if args.no_progress else None,
+        metrics_output=args.metrics,
+        metrics_interval=args.metrics_interval,
+        udp_retries=max(0, args.udp_retries),
+        likely_first=args.port_order == 'likely'
     )
     
     try:
@@ -11,10 +11,43 @@ import sys
 import time
 import os
 import json
+import math
+from itertools import chain, islice
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime
 import subprocess
 import ipaddress
 import re
+import glob
+import sqlite3
+
+from scan_engine import (AsyncConnectEngine, HostScheduler, HostTimeouts, ENGINES,
+                         DEFAULT_ASYNC_CONCURRENCY, DEFAULT_PER_HOST_LIMIT, DEFAULT_MIN_TIMEOUT,
+                         DEFAULT_ACTIVE_HOSTS, DEFAULT_WORKERS, SHARDS_PER_WORKER, shard_work, socket_family)
+from banner_stage import BannerStage, DEFAULT_BANNER_WORKERS, DEFAULT_BANNER_TIMEOUT
+from service_probes import get_database
+from result_sink import NDJSONSink
+from scan_checkpoint import ScanCheckpoint, CHUNK_SIZE
+from rate_limiter import RateGovernor
+from port_set import PortSet, ALL_PORTS
+from scan_history import ScanHistory, HISTORY_DB
+from target_resolver import get_resolver
+from target_spec import TargetSpec, TargetStream, split_entries
+from scan_progress import ScanProgress
+from scan_metrics import ScanMetrics, MetricsExporter, DEFAULT_EXPORT_INTERVAL
+from udp_engine import UDPScanEngine, DEFAULT_UDP_RETRIES, DEFAULT_UDP_PER_HOST_LIMIT
+from udp_probes import UDP_PROBES, UDP_COMMON_PORTS
+from syn_engine import SynScanEngine, syn_available
+from port_frequency import LikelyOrder, port_tiers, top_ports
+
+# O'Azis can additionally shard the async engine across worker processes, scan UDP or send raw SYNs
+SCAN_ENGINES = ENGINES + ('multiprocess', 'udp', 'syn')
+
+# Unanswered UDP ports listed by name in the summary (the rest are only counted)
+MAX_UNANSWERED_LISTED = 20
+
+# Sweeps larger than this only print per-host completion lines for hosts with open ports
+QUIET_HOSTS_ABOVE = 256
 
 class Colors:
     """Terminal colors for Ice Queen theme"""
@@ -50,7 +83,27 @@ class OAzisScanner:
             'timeout': 1.0,
             'stealth_mode': False,
             'save_results': True,
-            'output_format': 'table'
+            'output_format': 'table',
+            'engine': 'threaded',
+            'async_concurrency': DEFAULT_ASYNC_CONCURRENCY,
+            'per_host_limit': DEFAULT_PER_HOST_LIMIT,
+            'adaptive_timeout': True,
+            'min_timeout': DEFAULT_MIN_TIMEOUT,
+            'workers': DEFAULT_WORKERS,
+            'banner_workers': DEFAULT_BANNER_WORKERS,
+            'banner_timeout': DEFAULT_BANNER_TIMEOUT,
+            'stream_output': '',
+            'checkpoint': True,
+            'max_rate': 0,
+            'per_target_rate': 0,
+            'history': True,
+            'differential': False,
+            'sweep_rotation': 1,
+            'live_progress': None,  # None: only when output is a terminal
+            'metrics_output': '',
+            'metrics_interval': DEFAULT_EXPORT_INTERVAL,
+            'udp_retries': DEFAULT_UDP_RETRIES,
+            'likely_first': True
         }
         
         # Enhanced service detection
@@ -66,8 +119,28 @@ class OAzisScanner:
             27017: "MongoDB", 5984: "CouchDB", 6667: "IRC", 1080: "SOCKS"
         }
         
+        # Compiled probe/match database for service and version detection
+        self.probe_db = get_database()
+        
         self.common_ports = [21,22,23,25,53,69,80,110,111,119,123,135,139,143,161,194,389,443,445,465,514,587,636,993,995,1433,1521,1723,3306,3389,5432,5900,6379,8080,8443,9200,27017,5984,6667,1080]
         self.lock = threading.Lock()
+        self.host_timeouts = HostTimeouts(self.scan_config['timeout'], adaptive=False)
+        self.banner_stage = None
+        self.discovered = {}
+        self.result_sink = None
+        self.streamed_to = None
+        self.open_counts = {}
+        self.checkpoint = None
+        self.governor = RateGovernor()
+        self.history = None
+        self.history_scan_id = None
+        self.baseline = None
+        self.resolver = get_resolver()
+        self.progress = None
+        self.metrics = None
+        self.metrics_exporter = None
+        self.unanswered = []
+        self.unanswered_count = 0
 
     def display_banner(self):
         """Display the Ice Queen themed O'Azis banner"""
@@ -157,36 +230,24 @@ class OAzisScanner:
         return all(c in allowed for c in hostname)
 
     def validate_target(self, target):
-        """Validate if target is valid IP or hostname"""
-        return self.validate_ip(target) or self.validate_hostname(target)
+        """Validate a target spec: IP, hostname, CIDR, range, @file or !exclusion"""
+        try:
+            TargetSpec.parse(target)
+            return True
+        except ValueError:
+            return False
 
     def parse_port_input(self, port_input):
-        """Parse flexible port input (ranges, lists, keywords)"""
-        ports = []
-        
-        if port_input.lower() == "common":
-            return self.common_ports
-        elif port_input.lower() == "all":
-            return list(range(1, 65536))
-        elif port_input.lower() == "top1000":
-            # Top 1000 ports (simplified)
-            return list(range(1, 1001))
-        
+        """Parse flexible port input (ranges, lists, keywords) into a PortSet"""
+        keywords = {
+            'common': PortSet.from_ports(self.common_ports),
+            'udp': PortSet.from_ports(UDP_COMMON_PORTS),
+            'all': ALL_PORTS,
+            'top100': top_ports(100),
+            'top1000': top_ports(1000)
+        }
         try:
-            for part in port_input.split(','):
-                part = part.strip()
-                if '-' in part:
-                    start, end = map(int, part.split('-'))
-                    if start > end or start < 1 or end > 65535:
-                        raise ValueError(f"Invalid range: {part}")
-                    ports.extend(range(start, end + 1))
-                else:
-                    port = int(part)
-                    if port < 1 or port > 65535:
-                        raise ValueError(f"Invalid port: {port}")
-                    ports.append(port)
-            
-            return sorted(list(set(ports)))
+            return PortSet.parse(port_input, keywords)
         except ValueError as e:
             print(f"{Colors.FAIL}❌ Port parsing error: {e}{Colors.ENDC}")
             return None
@@ -198,7 +259,7 @@ class OAzisScanner:
         
         # Get target
         target = self.get_user_input(
-            "🎯 Enter target (IP or hostname): ",
+            "🎯 Enter target (IP, hostname, CIDR or range): ",
             validation=self.validate_target
         )
         
@@ -207,7 +268,7 @@ class OAzisScanner:
         print("  • Ranges: 1-1000, 8000-9000")
         print("  • Lists: 22,80,443,8080")
         print("  • Mixed: 20-25,80,443,8000-8090")
-        print("  • Keywords: 'common', 'all', 'top1000'")
+        print("  • Keywords: 'common', 'all', 'top100', 'top1000', 'udp'")
         
         port_input = self.get_user_input("🔍 Enter ports to scan: ")
         ports = self.parse_port_input(port_input)
@@ -247,19 +308,27 @@ class OAzisScanner:
         print("=" * 60)
         
         targets = []
-        print(f"{Colors.OKCYAN}Enter targets (one per line, empty line to finish):{Colors.ENDC}")
+        print(f"{Colors.OKCYAN}Enter targets (one or more per line, empty line to finish):{Colors.ENDC}")
+        print("  • IPs / hostnames: 10.0.0.5, 2001:db8::5, host.example.com")
+        print("  • CIDRs / ranges: 10.0.0.0/24, 10.0.1.1-10.0.1.50, 10.0.2.1-50")
+        print("  • Target files: @assets.txt (one spec per line, # comments)")
+        print("  • Exclusions: !10.0.0.1, !10.0.0.128/25")
         
         while True:
-            target = input(f"{Colors.OKCYAN}Target {len(targets)+1}: {Colors.ENDC}").strip()
-            if not target:
+            line = input(f"{Colors.OKCYAN}Target {len(targets)+1}: {Colors.ENDC}").strip()
+            if not line:
                 break
-            if self.validate_target(target):
-                targets.append(target)
-                print(f"{Colors.OKGREEN}✅ Added: {target}{Colors.ENDC}")
-            else:
-                print(f"{Colors.FAIL}❌ Invalid target: {target}{Colors.ENDC}")
+            try:
+                TargetSpec(split_entries(line))
+            except ValueError as e:
+                print(f"{Colors.FAIL}❌ {e}{Colors.ENDC}")
+                continue
+            targets.extend(split_entries(line))
+            print(f"{Colors.OKGREEN}✅ Added: {line}{Colors.ENDC}")
         
-        if not targets:
+        try:
+            targets = TargetSpec.parse(targets)
+        except ValueError:
             print(f"{Colors.WARNING}No valid targets provided.{Colors.ENDC}")
             return
         
@@ -272,9 +341,10 @@ class OAzisScanner:
         
         # Execute scan for all targets
         print(f"\n{Colors.BOLD}{Colors.WARNING}📋 MULTI-SCAN SUMMARY:{Colors.ENDC}")
-        print(f"  Targets: {Colors.BOLD}{len(targets)}{Colors.ENDC}")
+        target_count = targets.count()
+        print(f"  Targets: {Colors.BOLD}{target_count:,}{Colors.ENDC}" + (" (hostnames count once)" if targets.hostnames else ""))
         print(f"  Ports per target: {Colors.BOLD}{len(ports)}{Colors.ENDC}")
-        print(f"  Total scans: {Colors.BOLD}{len(targets) * len(ports)}{Colors.ENDC}")
+        print(f"  Total scans: {Colors.BOLD}{target_count * len(ports):,}{Colors.ENDC}")
         
         confirm = self.get_user_input("\n🚀 Start multi-target scan? (y/n): ").lower()
         if confirm == 'y':
@@ -291,6 +361,23 @@ class OAzisScanner:
         print(f"  Timeout: {Colors.BOLD}{self.scan_config['timeout']}s{Colors.ENDC}")
         print(f"  Stealth Mode: {Colors.BOLD}{'Enabled' if self.scan_config['stealth_mode'] else 'Disabled'}{Colors.ENDC}")
         print(f"  Save Results: {Colors.BOLD}{'Yes' if self.scan_config['save_results'] else 'No'}{Colors.ENDC}")
+        print(f"  Scan Engine: {Colors.BOLD}{self.scan_config['engine']}{Colors.ENDC}")
+        print(f"  Async Concurrency: {Colors.BOLD}{self.scan_config['async_concurrency']}{Colors.ENDC}")
+        print(f"  Per-Host Limit: {Colors.BOLD}{self.scan_config['per_host_limit']}{Colors.ENDC}")
+        print(f"  Worker Processes: {Colors.BOLD}{self.scan_config['workers']}{Colors.ENDC}")
+        print(f"  Banner Stage: {Colors.BOLD}{self.scan_config['banner_workers']} workers, {self.scan_config['banner_timeout']}s timeout{Colors.ENDC}")
+        print(f"  Stream Output: {Colors.BOLD}{self.scan_config['stream_output'] or 'Disabled'}{Colors.ENDC}")
+        print(f"  Adaptive Timeout: {Colors.BOLD}{'Enabled' if self.scan_config['adaptive_timeout'] else 'Disabled'} (floor {self.scan_config['min_timeout']}s){Colors.ENDC}")
+        print(f"  Scan History: {Colors.BOLD}{'Enabled' if self.scan_config['history'] else 'Disabled'} ({HISTORY_DB}){Colors.ENDC}")
+        print(f"  Differential Rescan: {Colors.BOLD}{'Enabled' if self.scan_config['differential'] else 'Disabled'} (sweep 1/{self.scan_config['sweep_rotation']} of other ports per run){Colors.ENDC}")
+        print(f"  Checkpoints: {Colors.BOLD}{'Enabled' if self.scan_config['checkpoint'] else 'Disabled'}{Colors.ENDC}")
+        print(f"  Max Probe Rate: {Colors.BOLD}{self.scan_config['max_rate'] or 'unlimited'} total, {self.scan_config['per_target_rate'] or 'unlimited'} per target (probes/s){Colors.ENDC}")
+        live_text = {None: 'Auto (terminal only)', True: 'Enabled', False: 'Disabled'}[self.scan_config['live_progress']]
+        print(f"  Live Progress: {Colors.BOLD}{live_text}{Colors.ENDC}")
+        metrics_text = f"{self.scan_config['metrics_output']} (every {self.scan_config['metrics_interval']:g}s)" if self.scan_config['metrics_output'] else 'Disabled'
+        print(f"  Metrics Export: {Colors.BOLD}{metrics_text}{Colors.ENDC}")
+        print(f"  UDP Retransmissions: {Colors.BOLD}{self.scan_config['udp_retries']}{Colors.ENDC}")
+        print(f"  Port Order: {Colors.BOLD}{'Most likely open first' if self.scan_config['likely_first'] else 'Numeric'}{Colors.ENDC}")
         
         while True:
             print(f"\n{Colors.OKCYAN}Configuration Options:{Colors.ENDC}")
@@ -298,6 +385,26 @@ class OAzisScanner:
             print("  [2] Set timeout")
             print("  [3] Toggle stealth mode")
             print("  [4] Toggle save results")
+            print("  [5] Switch scan engine (threaded/async/multiprocess/udp/syn)")
+            print("  [6] Set async concurrency")
+            print("  [7] Set per-host in-flight limit")
+            print("  [8] Toggle adaptive timeouts")
+            print("  [9] Set adaptive timeout floor")
+            print("  [10] Set worker processes (multiprocess engine)")
+            print("  [11] Set banner stage workers")
+            print("  [12] Set banner stage timeout")
+            print("  [13] Set streaming NDJSON output")
+            print("  [14] Toggle checkpoint/resume")
+            print("  [15] Set max probe rate (whole scan)")
+            print("  [16] Set max probe rate per target")
+            print("  [17] Toggle scan history database")
+            print("  [18] Toggle differential rescan")
+            print("  [19] Set differential sweep rotation")
+            print("  [20] Toggle live progress line (auto/off/on)")
+            print("  [21] Set metrics export (JSON + Prometheus)")
+            print("  [22] Set metrics export interval")
+            print("  [23] Set UDP retransmissions")
+            print("  [24] Toggle port order (most likely open first / numeric)")
             print("  [0] Back to main menu")
             
             choice = self.get_user_input("Choose option: ")
@@ -330,122 +437,787 @@ class OAzisScanner:
                 status = "enabled" if self.scan_config['save_results'] else "disabled"
                 print(f"{Colors.OKGREEN}✅ Save results {status}{Colors.ENDC}")
                 
+            elif choice == "5":
+                current = SCAN_ENGINES.index(self.scan_config['engine'])
+                self.scan_config['engine'] = SCAN_ENGINES[(current + 1) % len(SCAN_ENGINES)]
+                print(f"{Colors.OKGREEN}✅ Scan engine set to {self.scan_config['engine']}{Colors.ENDC}")
+                reason = syn_available() if self.scan_config['engine'] == 'syn' else None
+                if reason:
+                    print(f"{Colors.WARNING}⚠️ {reason}{Colors.ENDC}")
+                
+            elif choice == "6":
+                concurrency = self.get_user_input(
+                    "Enter async concurrency (1-20000): ",
+                    input_type="int",
+                    validation=lambda x: 1 <= x <= 20000
+                )
+                self.scan_config['async_concurrency'] = concurrency
+                print(f"{Colors.OKGREEN}✅ Async concurrency set to {concurrency}{Colors.ENDC}")
+                
+            elif choice == "7":
+                per_host = self.get_user_input(
+                    "Enter per-host in-flight limit (1-20000): ",
+                    input_type="int",
+                    validation=lambda x: 1 <= x <= 20000
+                )
+                self.scan_config['per_host_limit'] = per_host
+                print(f"{Colors.OKGREEN}✅ Per-host limit set to {per_host}{Colors.ENDC}")
+                
+            elif choice == "8":
+                self.scan_config['adaptive_timeout'] = not self.scan_config['adaptive_timeout']
+                status = "enabled" if self.scan_config['adaptive_timeout'] else "disabled"
+                print(f"{Colors.OKGREEN}✅ Adaptive timeouts {status}{Colors.ENDC}")
+                
+            elif choice == "9":
+                floor = self.get_user_input(
+                    "Enter timeout floor in seconds (0.001-30): ",
+                    input_type="float",
+                    validation=lambda x: 0.001 <= x <= 30
+                )
+                self.scan_config['min_timeout'] = floor
+                print(f"{Colors.OKGREEN}✅ Adaptive timeout floor set to {floor}s{Colors.ENDC}")
+                
+            elif choice == "10":
+                workers = self.get_user_input(
+                    f"Enter worker processes (1-{max(DEFAULT_WORKERS, 64)}): ",
+                    input_type="int",
+                    validation=lambda x: 1 <= x <= max(DEFAULT_WORKERS, 64)
+                )
+                self.scan_config['workers'] = workers
+                print(f"{Colors.OKGREEN}✅ Worker processes set to {workers}{Colors.ENDC}")
+                
+            elif choice == "11":
+                banner_workers = self.get_user_input(
+                    "Enter banner stage workers (1-500): ",
+                    input_type="int",
+                    validation=lambda x: 1 <= x <= 500
+                )
+                self.scan_config['banner_workers'] = banner_workers
+                print(f"{Colors.OKGREEN}✅ Banner stage workers set to {banner_workers}{Colors.ENDC}")
+                
+            elif choice == "12":
+                banner_timeout = self.get_user_input(
+                    "Enter banner stage timeout in seconds (0.1-30): ",
+                    input_type="float",
+                    validation=lambda x: 0.1 <= x <= 30
+                )
+                self.scan_config['banner_timeout'] = banner_timeout
+                print(f"{Colors.OKGREEN}✅ Banner stage timeout set to {banner_timeout}s{Colors.ENDC}")
+                
+            elif choice == "13":
+                stream_output = self.get_user_input(
+                    "Enter NDJSON path ('auto' = timestamped file, empty = disabled): "
+                )
+                self.scan_config['stream_output'] = stream_output
+                status = f"to {stream_output}" if stream_output else "disabled"
+                print(f"{Colors.OKGREEN}✅ Streaming output {status}{Colors.ENDC}")
+                
+            elif choice == "14":
+                self.scan_config['checkpoint'] = not self.scan_config['checkpoint']
+                status = "enabled" if self.scan_config['checkpoint'] else "disabled"
+                print(f"{Colors.OKGREEN}✅ Checkpoint/resume {status}{Colors.ENDC}")
+                
+            elif choice == "15":
+                max_rate = self.get_user_input(
+                    "Enter max probes/sec for the whole scan (0 = unlimited): ",
+                    input_type="float",
+                    validation=lambda x: 0 <= x <= 1000000
+                )
+                self.scan_config['max_rate'] = max_rate
+                status = f"{max_rate}/s" if max_rate else "unlimited"
+                print(f"{Colors.OKGREEN}✅ Max probe rate set to {status}{Colors.ENDC}")
+                
+            elif choice == "16":
+                per_target_rate = self.get_user_input(
+                    "Enter max probes/sec per target (0 = unlimited): ",
+                    input_type="float",
+                    validation=lambda x: 0 <= x <= 1000000
+                )
+                self.scan_config['per_target_rate'] = per_target_rate
+                status = f"{per_target_rate}/s" if per_target_rate else "unlimited"
+                print(f"{Colors.OKGREEN}✅ Per-target probe rate set to {status}{Colors.ENDC}")
+                
+            elif choice == "17":
+                self.scan_config['history'] = not self.scan_config['history']
+                status = "enabled" if self.scan_config['history'] else "disabled"
+                print(f"{Colors.OKGREEN}✅ Scan history {status}{Colors.ENDC}")
+                
+            elif choice == "18":
+                self.scan_config['differential'] = not self.scan_config['differential']
+                status = "enabled" if self.scan_config['differential'] else "disabled"
+                print(f"{Colors.OKGREEN}✅ Differential rescan {status}{Colors.ENDC}")
+                
+            elif choice == "19":
+                rotation = self.get_user_input(
+                    "Sweep 1/N of the not-previously-open ports per run, N (1 = all): ",
+                    input_type="int",
+                    validation=lambda x: 1 <= x <= 365
+                )
+                self.scan_config['sweep_rotation'] = rotation
+                print(f"{Colors.OKGREEN}✅ Differential sweep rotation set to 1/{rotation}{Colors.ENDC}")
+                
+            elif choice == "20":
+                # Auto -> off -> forced on -> auto
+                self.scan_config['live_progress'] = {None: False, False: True, True: None}[self.scan_config['live_progress']]
+                status = {None: "set to auto (terminal only)", True: "enabled", False: "disabled"}[self.scan_config['live_progress']]
+                print(f"{Colors.OKGREEN}✅ Live progress line {status}{Colors.ENDC}")
+                
+            elif choice == "21":
+                metrics_output = self.get_user_input(
+                    "Enter metrics path prefix ('auto' = timestamped files, empty = disabled): "
+                )
+                self.scan_config['metrics_output'] = metrics_output
+                status = f"to {metrics_output}.json/.prom" if metrics_output else "disabled"
+                print(f"{Colors.OKGREEN}✅ Metrics export {status}{Colors.ENDC}")
+                
+            elif choice == "22":
+                metrics_interval = self.get_user_input(
+                    "Enter metrics export interval in seconds (1-3600): ",
+                    input_type="float",
+                    validation=lambda x: 1 <= x <= 3600
+                )
+                self.scan_config['metrics_interval'] = metrics_interval
+                print(f"{Colors.OKGREEN}✅ Metrics exported every {metrics_interval:g}s{Colors.ENDC}")
+                
+            elif choice == "23":
+                udp_retries = self.get_user_input(
+                    "Enter UDP retransmissions per unanswered probe (0-10): ",
+                    input_type="int",
+                    validation=lambda x: 0 <= x <= 10
+                )
+                self.scan_config['udp_retries'] = udp_retries
+                print(f"{Colors.OKGREEN}✅ UDP probes sent up to {udp_retries + 1} times{Colors.ENDC}")
+                
+            elif choice == "24":
+                self.scan_config['likely_first'] = not self.scan_config['likely_first']
+                order = "most likely open first" if self.scan_config['likely_first'] else "numeric"
+                print(f"{Colors.OKGREEN}✅ Ports probed in {order} order{Colors.ENDC}")
+                
             elif choice == "0":
                 break
 
     def scan_port(self, target, port):
         """Scan a single port on target"""
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(self.scan_config['timeout'])
-            result = sock.connect_ex((target, port))
-            
-            if result == 0:
-                banner = self.grab_banner(sock, port)
-                service = self.services.get(port, "Unknown")
-                
-                with self.lock:
-                    scan_result = {
-                        'target': target,
-                        'port': port,
-                        'service': service,
-                        'banner': banner,
-                        'timestamp': datetime.now().isoformat()
-                    }
-                    self.scan_results.append(scan_result)
-                    
-                    # Real-time output
-                    banner_text = f" - {banner[:50]}..." if banner and len(banner) > 50 else f" - {banner}" if banner else ""
-                    print(f"{Colors.OKGREEN}[+] {target}:{port:5d} - {service:15s} - OPEN{banner_text}{Colors.ENDC}")
+            if self.governor.enabled:
+                self.governor.wait(target)
+            sock = socket.socket(socket_family(target), socket.SOCK_STREAM)
+            result = self.host_timeouts.connect(sock, target, port)
             
             sock.close()
+            
+            if result == 0:
+                self.port_discovered(target, port)
         except Exception:
             pass
 
+    def port_discovered(self, target, port):
+        """Discovery stage hit: count it and queue the port for banner grabbing"""
+        if self.checkpoint and not self.checkpoint.port_open(target, port):
+            return  # Already found before the scan was resumed
+        with self.lock:
+            self.discovered[target] = self.discovered.get(target, 0) + 1
+        self.banner_stage.submit(target, port)
+
+    def build_result(self, target, port, fingerprint=None, protocol='tcp'):
+        """Build the result record for an open port"""
+        return {
+            'target': target,
+            'port': port,
+            'protocol': protocol,
+            'service': (fingerprint and fingerprint.service) or self.services.get(port, "Unknown"),
+            'product': fingerprint.product if fingerprint else None,
+            'version': fingerprint.version if fingerprint else None,
+            'banner': fingerprint.banner if fingerprint else None,
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def record_open_port(self, target, port, fingerprint=None):
+        """Store and announce an open port found by any scan engine"""
+        self.merge_result(self.build_result(target, port, fingerprint))
+
+    @staticmethod
+    def describe(scan_result):
+        """Product and version when identified, otherwise the raw banner"""
+        product = " ".join(filter(None, [scan_result.get('product'), scan_result.get('version')]))
+        return product or scan_result['banner']
+
+    def merge_result(self, scan_result):
+        """Add a finished result record to scan_results (or the stream) and print it"""
+        banner = self.describe(scan_result)
+        if self.checkpoint:
+            self.checkpoint.add_finding(scan_result)
+        if self.history_scan_id:
+            self.history.add_result(self.history_scan_id, scan_result)
+        with self.lock:
+            target = scan_result['target']
+            self.open_counts[target] = self.open_counts.get(target, 0) + 1
+            if self.result_sink and not self.baseline:
+                self.result_sink.write(dict(type='result', **scan_result))
+            else:
+                self.scan_results.append(scan_result)
+        
+        # Real-time output, printed in batches by the progress renderer
+        banner_text = f" - {banner[:50]}..." if banner and len(banner) > 50 else f" - {banner}" if banner else ""
+        protocol = "/udp" if scan_result.get('protocol') == 'udp' else ""
+        line = f"{Colors.OKGREEN}[+] {scan_result['target']}:{scan_result['port']:5d}{protocol} - {scan_result['service']:15s} - OPEN{banner_text}{Colors.ENDC}"
+        if self.progress:
+            self.progress.finding(line)
+        else:
+            print(line)
+
+    def udp_port_open(self, target, port, fingerprint):
+        """UDP reply: the reply itself is the banner, so the port is recorded straight away"""
+        if self.checkpoint and not self.checkpoint.port_open(target, port):
+            return
+        with self.lock:
+            self.discovered[target] = self.discovered.get(target, 0) + 1
+        self.merge_result(self.build_result(target, port, fingerprint, protocol='udp'))
+
+    def udp_unanswered(self, target, port):
+        """UDP probe with no reply and no ICMP error after every retransmission (open|filtered)"""
+        with self.lock:
+            self.unanswered_count += 1
+            if port in UDP_PROBES and len(self.unanswered) < MAX_UNANSWERED_LISTED:
+                self.unanswered.append((target, port))
+
+    def emit(self, line):
+        """Print a line, through the progress renderer while a scan is running"""
+        if self.progress:
+            self.progress.message(line)
+        else:
+            print(line)
+
+    def probe_done(self, target, port):
+        """Every finished discovery probe: progress and checkpoint bookkeeping"""
+        self.progress.probe_done(target)
+        if self.checkpoint:
+            self.checkpoint.probe_done(target, port)
+
     def grab_banner(self, sock, port):
-        """Enhanced banner grabbing"""
+        """Probe an open port and fingerprint the service behind it"""
         try:
-            if port in [21, 22, 23, 25, 110, 143, 220, 993, 995]:
-                sock.settimeout(2)
-                banner = sock.recv(1024).decode('utf-8', errors='ignore').strip()
-                return banner[:200] if banner else None
-            elif port in [80, 8080, 8443]:
-                sock.send(b"HEAD / HTTP/1.1\r\nHost: localhost\r\n\r\n")
-                response = sock.recv(1024).decode('utf-8', errors='ignore')
-                server_lines = [line for line in response.split('\n') if 'Server:' in line]
-                return server_lines[0].strip() if server_lines else None
+            return self.probe_db.fingerprint(sock, port, sock.gettimeout())
         except:
             pass
         return None
 
-    def worker_thread(self, target, port_queue):
-        """Worker thread for port scanning"""
+    def worker_thread(self, scheduler):
+        """Worker thread pulling (target, port) jobs from the shared scheduler"""
         while True:
+            job = scheduler.acquire()
+            if job is None:
+                break
+            target, port = job
             try:
-                port = port_queue.get(timeout=1)
                 self.scan_port(target, port)
-                port_queue.task_done()
-            except:
-                break
+            finally:
+                scheduler.release(target, port)
 
-    def execute_scan(self, targets, ports, threads, timeout, stealth):
-        """Execute the actual scanning process"""
-        import queue
+    def resolve_targets(self, spec):
+        """Resolution stage: a lazy, re-iterable stream of the spec's addresses
+
+        Address blocks are expanded as the engines consume them; names expand
+        to all of their A/AAAA addresses and are resolved concurrently in
+        chunks ahead of the scan, from the session-wide TTL cache when fresh.
+        Returns None if nothing resolves.
+        """
+        def unresolved(name):
+            self.emit(f"{Colors.FAIL}❌ Could not resolve {name}{Colors.ENDC}")
         
+        stream = TargetStream(spec, self.resolver, on_unresolved=unresolved, metrics=self.metrics)
+        if not spec.files and len(spec.hostnames) <= 20:
+            # Few names: resolve them now (warming the cache) and show the answers
+            for name, addresses in self.resolver.resolve_all(spec.hostnames, self.metrics).items():
+                if addresses:
+                    print(f"{Colors.OKBLUE}🔍 Resolved {name} → {', '.join(addresses)}{Colors.ENDC}")
+                else:
+                    stream.report_unresolved(name)
+        if stream.first() is None:
+            return None
+        return stream
+
+    def execute_scan(self, targets, ports, threads, timeout, stealth):
+        """Execute the actual scanning process; `targets` is a TargetSpec or a list of spec entries"""
         print(f"\n{Colors.BOLD}{Colors.HEADER}🚀 INITIATING O'AZIS SCAN{Colors.ENDC}")
         print("=" * 70)
         
-        total_scans = len(targets) * len(ports)
+        reason = syn_available() if self.scan_config['engine'] == 'syn' else None
+        if reason:
+            print(f"{Colors.FAIL}❌ {reason}{Colors.ENDC}")
+            return
+        
         scan_start = time.time()
+        self.metrics = ScanMetrics('oazis')
+        protocol = 'udp' if self.scan_config['engine'] == 'udp' else 'tcp'
         
-        for target_idx, target in enumerate(targets, 1):
-            print(f"\n{Colors.OKCYAN}📡 Scanning target {target_idx}/{len(targets)}: {Colors.BOLD}{target}{Colors.ENDC}")
-            print(f"{Colors.OKCYAN}Ports: {len(ports)} | Threads: {threads} | Timeout: {timeout}s{Colors.ENDC}")
-            print("-" * 60)
-            
-            # Resolve target
+        spec = targets if isinstance(targets, TargetSpec) else TargetSpec.parse(targets)
+        resolved = self.resolve_targets(spec)
+        if not resolved:
+            print(f"{Colors.WARNING}No targets to scan.{Colors.ENDC}")
+            return
+        target_count = spec.count()
+        total_scans = target_count * len(ports)
+        
+        # Differential mode: re-verify what was open last time, then sweep the rest
+        phases = [ports]
+        history_config = self.scan_config
+        self.baseline = self.find_baseline(spec.key(), protocol) if self.scan_config['differential'] else None
+        if self.baseline:
+            verify_ports, sweep_ports, sweep_slot = self.plan_differential(spec, ports)
+            phases = [verify_ports, sweep_ports]
+            ports = verify_ports | sweep_ports
+            total_scans = target_count * len(ports)
+            history_config = dict(self.scan_config, sweep_slot=sweep_slot)
+            started = datetime.fromtimestamp(self.baseline['started']).strftime('%Y-%m-%d %H:%M')
+            print(f"{Colors.OKGREEN}🔄 Differential rescan against scan #{self.baseline['id']} ({started}): "
+                  f"verifying {len(verify_ports)} known-open ports, then sweeping {len(sweep_ports)} "
+                  f"(slot {sweep_slot + 1}/{self.scan_config['sweep_rotation']}){Colors.ENDC}")
+        
+        # Beyond one scheduler window of hosts, every host gets the likeliest
+        # ports (top 100, then top 1000) before any host gets the rest
+        if self.scan_config['likely_first'] and target_count > DEFAULT_ACTIVE_HOSTS:
+            phases = [tier for phase_ports in phases for tier in port_tiers(phase_ports, protocol)]
+        
+        # Differential runs are short by design and are not checkpointed
+        self.checkpoint = ScanCheckpoint(spec.key(), ports, protocol=protocol) if self.scan_config['checkpoint'] and not self.baseline else None
+        resumed = self.checkpoint is not None and self.checkpoint.exists() and self.checkpoint.load()
+        if resumed:
+            resumed = self.get_user_input(
+                f"{Colors.WARNING}⏯️ An interrupted run of this scan was found. Resume it? (y/n): {Colors.ENDC}"
+            ).lower().startswith('y')
+            if not resumed:
+                self.checkpoint = ScanCheckpoint(spec.key(), ports, protocol=protocol)
+        if resumed:
+            total_scans = self.checkpoint.pending_count(target_count)
+            print(f"{Colors.OKGREEN}⏯️ Resuming: {total_scans:,} probes left, {len(self.checkpoint.findings)} findings restored{Colors.ENDC}")
+        
+        per_host_limit = self.scan_config['per_host_limit']
+        if protocol == 'udp':
+            # Targets rate-limit ICMP errors; a deep per-host queue turns closed ports into retransmissions
+            per_host_limit = min(per_host_limit, DEFAULT_UDP_PER_HOST_LIMIT)
+        # Stealth keeps its fixed, conservative timeout
+        self.host_timeouts = HostTimeouts(
+            timeout,
+            floor=self.scan_config['min_timeout'],
+            adaptive=self.scan_config['adaptive_timeout'] and not stealth,
+            metrics=self.metrics
+        )
+        timeout_text = f"≤{timeout}s adaptive" if self.host_timeouts.adaptive else f"{timeout}s"
+        engine_name = self.scan_config['engine']
+        concurrency = min(self.scan_config['async_concurrency'], 10) if stealth else self.scan_config['async_concurrency']
+        self.governor = RateGovernor(self.scan_config['max_rate'], self.scan_config['per_target_rate'],
+                                     metrics=self.metrics)
+        self.metrics.set_gauge('workers', threads if engine_name == 'threaded' else concurrency)
+        
+        print(f"\n{Colors.OKCYAN}📡 Scanning {target_count:,} targets in parallel{Colors.ENDC}")
+        if engine_name == 'udp':
+            print(f"{Colors.OKCYAN}Ports: {len(ports)}/udp | In flight: {concurrency} | Per host: {per_host_limit} | Timeout: {timeout_text} | Retransmissions: {self.scan_config['udp_retries']}{Colors.ENDC}")
+        elif engine_name == 'syn':
+            print(f"{Colors.OKCYAN}Ports: {len(ports)} | Outstanding SYNs: {concurrency} | Per host: {per_host_limit} | Timeout: {timeout_text}{Colors.ENDC}")
+        elif engine_name == 'async':
+            print(f"{Colors.OKCYAN}Ports: {len(ports)} | Async concurrency: {concurrency} | Per host: {per_host_limit} | Timeout: {timeout_text}{Colors.ENDC}")
+        elif engine_name == 'multiprocess':
+            print(f"{Colors.OKCYAN}Ports: {len(ports)} | Workers: {self.scan_config['workers']} | Async concurrency: {concurrency} | Per host: {per_host_limit} | Timeout: {timeout_text}{Colors.ENDC}")
+        else:
+            print(f"{Colors.OKCYAN}Ports: {len(ports)} | Threads: {threads} | Per host: {per_host_limit} | Timeout: {timeout_text}{Colors.ENDC}")
+        if self.governor.enabled:
+            print(f"{Colors.OKCYAN}Probe rate limit: {self.governor.limits()}{Colors.ENDC}")
+        print("-" * 60)
+        
+        def host_done(target_ip):
+            self.progress.host_done(target_ip)
+            with self.lock:
+                open_count = self.discovered.get(target_ip, 0)
+            if not open_count and target_count > QUIET_HOSTS_ABOVE:
+                return  # Large sweeps only announce hosts with findings
+            timeout_note = f" (timeout {self.host_timeouts.get(target_ip) * 1000:.0f}ms)" if self.host_timeouts.adaptive else ""
+            self.emit(f"{Colors.OKGREEN}✅ Target {resolved.label(target_ip)} discovery complete: {open_count} open ports in {time.time() - scan_start:.2f}s{timeout_note}{Colors.ENDC}")
+        
+        self.discovered = {}
+        self.open_counts = {}
+        self.unanswered = []
+        self.unanswered_count = 0
+        self.history_scan_id = self.begin_history(spec.key(), ports, history_config, protocol)
+        self.result_sink = self.open_result_sink()
+        self.streamed_to = None
+        self.metrics_exporter = self.open_metrics_exporter()
+        completed = False
+        
+        # Console output goes through one renderer thread for the rest of the scan
+        self.progress = ScanProgress(
+            total=total_scans,
+            ports_per_host=len(ports),
+            host_events=True,
+            live=self.scan_config['live_progress']
+        ).start()
+        
+        # Stage two: banners are grabbed off the discovery hot path
+        self.banner_stage = BannerStage(
+            self.grab_banner,
+            self.record_open_port,
+            workers=self.scan_config['banner_workers'],
+            timeout=self.scan_config['banner_timeout'],
+            governor=self.governor,
+            metrics=self.metrics
+        ).start()
+        changes = None
+        try:
+            if resumed:
+                for finding in list(self.checkpoint.findings.values()):
+                    self.merge_result(finding)
+                if protocol == 'tcp':
+                    for target, port in self.checkpoint.unfinished_banners():
+                        self.banner_stage.submit(target, port)
+            phases = [phase_ports for phase_ports in phases if phase_ports]
+            for phase, phase_ports in enumerate(phases):
+                self.run_discovery(resolved, phase_ports, threads, concurrency, per_host_limit,
+                                   host_done if phase == len(phases) - 1 else None, target_count)
+            completed = True
+            if not resumed:
+                total_scans = resolved.last_count * len(ports)
+        finally:
+            self.banner_stage.close()
+            self.progress.finish()
+            self.progress = None
+            if self.history_scan_id:
+                self.history.finish_scan(self.history_scan_id, completed, total_scans)
+                if completed and self.baseline:
+                    changes = self.history.diff(self.baseline['id'], self.history_scan_id)
+                self.history_scan_id = None
+            if self.result_sink:
+                if changes:
+                    for record in self.delta_records(changes):
+                        self.result_sink.write(record)
+                self.close_result_sink(time.time() - scan_start, total_scans, completed)
+            if self.metrics_exporter:
+                self.close_metrics_exporter(completed)
+            if self.checkpoint:
+                if completed:
+                    self.checkpoint.discard()
+                else:
+                    self.checkpoint.close()
+                    print(f"\n{Colors.WARNING}💾 Progress saved; run the same scan again to resume{Colors.ENDC}")
+                self.checkpoint = None
+        
+        total_time = time.time() - scan_start
+        if changes is not None:
+            self.display_deltas(changes, total_time, total_scans)
+        else:
+            self.display_scan_results(total_time, total_scans)
+        self.baseline = None
+
+    def run_discovery(self, targets, ports, threads, concurrency, per_host_limit, host_done=None, target_count=None):
+        """Port discovery for targets x ports on the configured engine; `targets` may be a stream"""
+        engine_name = self.scan_config['engine']
+        if engine_name == 'multiprocess':
+            self.run_sharded(targets, ports, concurrency, per_host_limit, host_done, target_count)
+            return
+        port_count = None
+        if self.checkpoint:
+            port_blocks = PortSet.from_ports(ports).blocks(CHUNK_SIZE)
+            port_count = lambda target: self.checkpoint.pending_ports(target, port_blocks)
+        if self.scan_config['likely_first']:
+            ports = LikelyOrder(ports, 'udp' if engine_name == 'udp' else 'tcp')
+        scheduler = HostScheduler(
+            targets, ports,
+            per_host_limit=per_host_limit,
+            on_host_done=host_done,
+            port_filter=self.checkpoint.is_pending if self.checkpoint else None,
+            port_count=port_count,
+            on_probe_done=self.probe_done,
+            target_count=target_count,
+            metrics=self.metrics
+        )
+        if engine_name == 'udp':
+            self.run_udp(scheduler, concurrency)
+        elif engine_name == 'syn':
+            self.run_syn(scheduler, concurrency)
+        elif engine_name == 'async':
+            self.run_async(scheduler, concurrency)
+        else:
+            self.run_threaded(scheduler, threads)
+
+    def find_baseline(self, targets, protocol='tcp'):
+        """Latest completed scan of these targets (same protocol) to diff against, or None"""
+        if not self.scan_config['history'] or not self.open_history():
+            print(f"{Colors.WARNING}⚠️ Differential rescan needs the scan history database; running a full scan{Colors.ENDC}")
+            return None
+        baseline = self.history.latest_scan(targets, protocol=protocol)
+        if baseline is None:
+            print(f"{Colors.WARNING}⚠️ No previous scan of these targets; running a full scan as the baseline{Colors.ENDC}")
+        return baseline
+
+    def plan_differential(self, spec, ports):
+        """Split the ports into (verify, sweep, sweep_slot) using the baseline scan.
+
+        Every port open on any of the targets last time is re-verified on all
+        of them. The remaining ports are split into `sweep_rotation` slices and
+        each run sweeps the slice after the one the baseline swept.
+        """
+        ports = PortSet.from_ports(ports)
+        # Addresses behind hostnames and target files are only known once streamed
+        named = bool(spec.hostnames or spec.files)
+        known_open = {row['port'] for row in self.history.scan_results(self.baseline['id'])
+                      if row['port'] in ports and (named or spec.contains(row['target']))}
+        verify_ports = PortSet.from_ports(known_open)
+        rest = ports - verify_ports
+        
+        rotation = max(1, self.scan_config['sweep_rotation'])
+        previous_slot = json.loads(self.baseline['configuration'] or '{}').get('sweep_slot', -1)
+        sweep_slot = (previous_slot + 1) % rotation
+        slices = list(rest.chunks(math.ceil(len(rest) / rotation))) if rest else []
+        sweep_ports = slices[sweep_slot] if sweep_slot < len(slices) else PortSet()
+        return verify_ports, sweep_ports, sweep_slot
+
+    @staticmethod
+    def delta_records(changes):
+        """NDJSON records for the output of ScanHistory.diff()"""
+        for change in ('opened', 'closed'):
+            for row in changes[change]:
+                yield dict(type='delta', change=change, **dict(row))
+        for old, new in changes['changed']:
+            yield {'type': 'delta', 'change': 'changed', 'target': new['target'], 'port': new['port'],
+                   'protocol': new['protocol'], 'old': dict(old), 'new': dict(new)}
+
+    def display_deltas(self, changes, scan_time, total_scans):
+        """Differential scan output: only what changed since the baseline"""
+        print(f"\n{Colors.BOLD}{Colors.HEADER}🔄 O'AZIS DIFFERENTIAL RESULTS{Colors.ENDC}")
+        print("=" * 70)
+        started = datetime.fromtimestamp(self.baseline['started']).strftime('%Y-%m-%d %H:%M')
+        print(f"{Colors.OKCYAN}Compared with scan #{self.baseline['id']} ({started}){Colors.ENDC}\n")
+        self.print_scan_diff(changes)
+        
+        print(f"\n{Colors.BOLD}{Colors.OKGREEN}📈 SCAN SUMMARY{Colors.ENDC}")
+        print(f"  Newly Open: {Colors.BOLD}{len(changes['opened'])}{Colors.ENDC}")
+        print(f"  Newly Closed: {Colors.BOLD}{len(changes['closed'])}{Colors.ENDC}")
+        print(f"  Changed: {Colors.BOLD}{len(changes['changed'])}{Colors.ENDC}")
+        print(f"  Open Ports: {Colors.BOLD}{sum(self.open_counts.values())}{Colors.ENDC}")
+        print(f"  Total Scans: {Colors.BOLD}{total_scans:,}{Colors.ENDC}")
+        print(f"  Scan Time: {Colors.BOLD}{scan_time:.2f} seconds{Colors.ENDC}")
+        self.display_timing()
+        if self.streamed_to:
+            print(f"{Colors.OKGREEN}💾 Changes streamed to: {self.streamed_to}{Colors.ENDC}")
+
+    def open_history(self):
+        """The scan history database, opened on first use; None if unavailable"""
+        if self.history is None:
             try:
-                resolved_ip = socket.gethostbyname(target)
-                if resolved_ip != target:
-                    print(f"{Colors.OKBLUE}🔍 Resolved {target} → {resolved_ip}{Colors.ENDC}")
-                target_ip = resolved_ip
-            except socket.gaierror:
-                print(f"{Colors.FAIL}❌ Could not resolve {target}{Colors.ENDC}")
-                continue
-            
-            # Create port queue
-            port_queue = queue.Queue()
-            for port in ports:
-                port_queue.put(port)
-            
-            # Start worker threads
-            thread_list = []
-            active_threads = min(threads, len(ports))
-            
-            for _ in range(active_threads):
-                t = threading.Thread(target=self.worker_thread, args=(target_ip, port_queue))
-                t.daemon = True
-                t.start()
-                thread_list.append(t)
+                self.history = ScanHistory()
+            except (sqlite3.Error, OSError) as e:
+                print(f"{Colors.FAIL}❌ Cannot open scan history {HISTORY_DB}: {e}{Colors.ENDC}")
+        return self.history
+
+    def begin_history(self, targets, ports, configuration, protocol='tcp'):
+        """Register the scan in the history database if history is enabled"""
+        if not self.scan_config['history'] or not self.open_history():
+            return None
+        return self.history.begin_scan(targets, ports, configuration=configuration, protocol=protocol)
+
+    def open_result_sink(self):
+        """Start the NDJSON stream if streaming output is configured"""
+        destination = self.scan_config['stream_output']
+        if not destination:
+            return None
+        if destination == 'auto':
+            destination = f"oazis_scan_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ndjson"
+        try:
+            sink = NDJSONSink(destination)
+        except OSError as e:
+            print(f"{Colors.FAIL}❌ Cannot open stream output {destination}: {e}{Colors.ENDC}")
+            return None
+        print(f"{Colors.OKBLUE}📤 Streaming results to: {sink.name}{Colors.ENDC}")
+        return sink
+
+    def open_metrics_exporter(self):
+        """Start the periodic metrics export if a metrics path is configured"""
+        prefix = self.scan_config['metrics_output']
+        if not prefix:
+            return None
+        if prefix == 'auto':
+            prefix = f"oazis_metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        try:
+            exporter = MetricsExporter(self.metrics, prefix, self.scan_config['metrics_interval']).start()
+        except OSError as e:
+            print(f"{Colors.FAIL}❌ Cannot write metrics to {prefix}: {e}{Colors.ENDC}")
+            return None
+        print(f"{Colors.OKBLUE}📊 Exporting metrics to: {exporter.json_path}, {exporter.prom_path}{Colors.ENDC}")
+        return exporter
+
+    def close_metrics_exporter(self, completed):
+        """Final metrics export"""
+        try:
+            self.metrics_exporter.close(completed)
+            print(f"{Colors.OKGREEN}📊 Metrics written to: {self.metrics_exporter.json_path}, {self.metrics_exporter.prom_path}{Colors.ENDC}")
+        except OSError as e:
+            print(f"{Colors.FAIL}❌ Failed to export metrics: {e}{Colors.ENDC}")
+        self.metrics_exporter = None
+
+    def display_timing(self):
+        """Connect, banner, queue-wait and DNS timing lines for scan summaries"""
+        if not self.metrics:
+            return
+        for label, text in self.metrics.summary_lines():
+            print(f"  {label}: {Colors.BOLD}{text}{Colors.ENDC}")
+
+    def close_result_sink(self, scan_time, total_scans, completed):
+        """Write the summary record and close the NDJSON stream"""
+        self.result_sink.close(summary={
+            'type': 'summary',
+            'scanner': 'O\'Azis Network Security Scanner',
+            'version': self.version,
+            'timestamp': datetime.now().isoformat(),
+            'completed': completed,
+            'total_results': sum(self.open_counts.values()),
+            'open_ports_by_target': self.open_counts,
+            'total_scans': total_scans,
+            'scan_time': round(scan_time, 3),
+            'probe_rate': round(self.governor.achieved_rate() or 0, 1),
+            'configuration': self.scan_config
+        })
+        self.streamed_to = self.result_sink.name
+        self.result_sink = None
+
+    def run_threaded(self, scheduler, threads):
+        """Drain the scheduler with one pool of worker threads shared by every target"""
+        thread_list = []
+        for _ in range(min(threads, len(scheduler))):
+            t = threading.Thread(target=self.worker_thread, args=(scheduler,))
+            t.daemon = True
+            t.start()
+            thread_list.append(t)
+        
+        # Wait for completion
+        for t in thread_list:
+            t.join()
+
+    def run_async(self, scheduler, concurrency):
+        """Drain the scheduler on a single asyncio event loop"""
+        engine = AsyncConnectEngine(
+            on_open=self.port_discovered,
+            timeout=self.host_timeouts.ceiling,
+            concurrency=min(concurrency, len(scheduler)),
+            timeouts=self.host_timeouts,
+            governor=self.governor,
+            metrics=self.metrics
+        )
+        engine.run(scheduler)
+
+    def run_udp(self, scheduler, concurrency):
+        """Drain the scheduler with UDP probes on a single asyncio event loop"""
+        engine = UDPScanEngine(
+            on_open=self.udp_port_open,
+            timeout=self.host_timeouts.ceiling,
+            retries=self.scan_config['udp_retries'],
+            concurrency=min(concurrency, len(scheduler)),
+            timeouts=self.host_timeouts,
+            governor=self.governor,
+            on_unanswered=self.udp_unanswered,
+            metrics=self.metrics
+        )
+        engine.run(scheduler)
+
+    def run_syn(self, scheduler, concurrency):
+        """Drain the scheduler with half-open SYN probes from raw sockets"""
+        engine = SynScanEngine(
+            on_open=self.port_discovered,
+            timeout=self.host_timeouts.ceiling,
+            window=min(concurrency, len(scheduler)),
+            timeouts=self.host_timeouts,
+            governor=self.governor,
+            metrics=self.metrics
+        )
+        engine.run(scheduler)
+
+    def run_sharded(self, targets, ports, concurrency, per_host_limit, host_done, target_count=None):
+        """Split targets x ports over worker processes, each running its own async engine.
+
+        Shards are cut from the target stream as workers free up, with at most
+        two per process queued, so a huge target list is never sharded up front.
+        """
+        workers = max(1, self.scan_config['workers'])
+        shards = shard_work(targets, ports, workers * SHARDS_PER_WORKER, target_count)
+        first_shards = list(islice(shards, workers))
+        processes = max(1, len(first_shards))
+        # The concurrency and rate budgets are global, so every process gets a share of them
+        options = {
+            'timeout': self.host_timeouts.ceiling,
+            'min_timeout': self.host_timeouts.floor,
+            'adaptive_timeout': self.host_timeouts.adaptive,
+            'concurrency': max(1, math.ceil(concurrency / workers)),
+            'per_host_limit': max(1, per_host_limit // processes),
+            'max_rate': self.scan_config['max_rate'] / processes,
+            'likely_first': self.scan_config['likely_first']
+        }
+        shards = chain(first_shards, shards)
+        shards_left = {}
+        
+        def shard_options(shard_targets, parts):
+            # A host split by port range is probed by up to that many processes at once
+            completed_blocks = {}
+            if self.checkpoint:
+                completed_blocks = {target: sorted(self.checkpoint.completed[target])
+                                    for target in shard_targets if target in self.checkpoint.completed}
+            return dict(options, per_target_rate=self.scan_config['per_target_rate'] / min(processes, parts),
+                        completed_blocks=completed_blocks)
+        
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = {}
             
-            # Wait for completion
-            target_start = time.time()
-            port_queue.join()
-            target_time = time.time() - target_start
+            def submit_next():
+                shard = next(shards, None)
+                if shard is None:
+                    return
+                shard_targets, shard_ports, parts = shard
+                for target in shard_targets:
+                    shards_left.setdefault(target, parts)
+                futures[executor.submit(scan_shard, shard_targets, shard_ports,
+                                        shard_options(shard_targets, parts))] = (shard_targets, shard_ports)
             
-            target_results = [r for r in self.scan_results if r['target'] == target_ip]
-            print(f"\n{Colors.OKGREEN}✅ Target {target} complete: {len(target_results)} open ports in {target_time:.2f}s{Colors.ENDC}")
-        
-        total_time = time.time() - scan_start
-        self.display_scan_results(total_time, total_scans)
+            try:
+                for _ in range(processes * 2):
+                    submit_next()
+                while futures:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        shard_targets, shard_ports = futures.pop(future)
+                        open_ports, learned_timeouts, rate_stats, metrics = future.result()
+                        for target, port in open_ports:
+                            self.port_discovered(target, port)
+                        self.host_timeouts.timeouts.update(learned_timeouts)
+                        self.governor.merge(*rate_stats)
+                        self.metrics.merge(metrics)
+                        for target in shard_targets:
+                            if self.checkpoint:
+                                # Only ports still pending count; the resumed total left the rest out
+                                pending = [p for p in shard_ports if self.checkpoint.is_pending(target, p)]
+                                self.progress.advance(len(pending))
+                                self.checkpoint.ports_done(target, pending)
+                            else:
+                                self.progress.advance(len(shard_ports))
+                            shards_left[target] -= 1
+                            if shards_left[target] == 0:
+                                del shards_left[target]
+                                if host_done:
+                                    host_done(target)
+                        submit_next()
+            except KeyboardInterrupt:
+                for future in futures:
+                    future.cancel()
+                raise
 
     def display_scan_results(self, scan_time, total_scans):
         """Display comprehensive scan results"""
         print(f"\n{Colors.BOLD}{Colors.HEADER}📊 O'AZIS SCAN RESULTS{Colors.ENDC}")
         print("=" * 70)
         
+        if self.streamed_to:
+            self.display_stream_summary(scan_time, total_scans)
+            return
+        
         if not self.scan_results:
             print(f"{Colors.WARNING}🔍 No open ports discovered in scan.{Colors.ENDC}")
+            self.display_unanswered()
             return
         
         # Group results by target
@@ -461,12 +1233,15 @@ class OAzisScanner:
             print(f"\n{Colors.BOLD}{Colors.OKCYAN}🎯 Target: {target}{Colors.ENDC}")
             print(f"{Colors.OKGREEN}Open Ports: {len(results)}{Colors.ENDC}")
             print("-" * 60)
-            print(f"{'PORT':<8} {'SERVICE':<15} {'BANNER':<45}")
+            print(f"{'PORT':<8} {'SERVICE':<15} {'VERSION / BANNER':<45}")
             print("-" * 60)
             
-            for result in sorted(results, key=lambda x: x['port']):
-                banner = result['banner'][:42] + "..." if result['banner'] and len(result['banner']) > 42 else result['banner'] or ""
-                print(f"{result['port']:<8} {result['service']:<15} {banner:<45}")
+            for result in sorted(results, key=lambda x: (x.get('protocol', 'tcp'), x['port'])):
+                description = self.describe(result)
+                banner = description[:42] + "..." if description and len(description) > 42 else description or ""
+                port = f"{result['port']}/udp" if result.get('protocol') == 'udp' else result['port']
+                print(f"{port:<8} {result['service']:<15} {banner:<45}")
+        self.display_unanswered()
         
         # Summary
         print(f"\n{Colors.BOLD}{Colors.OKGREEN}📈 SCAN SUMMARY{Colors.ENDC}")
@@ -475,11 +1250,44 @@ class OAzisScanner:
         print(f"  Total Scans: {Colors.BOLD}{total_scans:,}{Colors.ENDC}")
         print(f"  Scan Time: {Colors.BOLD}{scan_time:.2f} seconds{Colors.ENDC}")
         print(f"  Rate: {Colors.BOLD}{total_scans/scan_time:.1f} scans/sec{Colors.ENDC}")
+        if self.governor.enabled:
+            print(f"  Probe Rate: {Colors.BOLD}{self.governor.describe()}{Colors.ENDC}")
+        if self.unanswered_count:
+            print(f"  Open|Filtered (UDP, no reply): {Colors.BOLD}{self.unanswered_count:,}{Colors.ENDC}")
+        self.display_timing()
         
         # Save results
         if self.scan_config['save_results']:
             self.save_scan_results()
 
+    def display_stream_summary(self, scan_time, total_scans):
+        """Summary for streamed scans, which keep only per-target counts in memory"""
+        for target, count in self.open_counts.items():
+            print(f"{Colors.BOLD}{Colors.OKCYAN}🎯 Target: {target}{Colors.ENDC} - {Colors.OKGREEN}{count} open ports{Colors.ENDC}")
+        
+        print(f"\n{Colors.BOLD}{Colors.OKGREEN}📈 SCAN SUMMARY{Colors.ENDC}")
+        print(f"  Targets With Open Ports: {Colors.BOLD}{len(self.open_counts)}{Colors.ENDC}")
+        print(f"  Open Ports: {Colors.BOLD}{sum(self.open_counts.values())}{Colors.ENDC}")
+        print(f"  Total Scans: {Colors.BOLD}{total_scans:,}{Colors.ENDC}")
+        print(f"  Scan Time: {Colors.BOLD}{scan_time:.2f} seconds{Colors.ENDC}")
+        print(f"  Rate: {Colors.BOLD}{total_scans/scan_time:.1f} scans/sec{Colors.ENDC}")
+        if self.governor.enabled:
+            print(f"  Probe Rate: {Colors.BOLD}{self.governor.describe()}{Colors.ENDC}")
+        if self.unanswered_count:
+            print(f"  Open|Filtered (UDP, no reply): {Colors.BOLD}{self.unanswered_count:,}{Colors.ENDC}")
+        self.display_timing()
+        print(f"{Colors.OKGREEN}💾 Results streamed to: {self.streamed_to}{Colors.ENDC}")
+
+    def display_unanswered(self):
+        """UDP service ports that neither replied nor returned an ICMP error"""
+        if not self.unanswered:
+            return
+        print(f"\n{Colors.BOLD}{Colors.WARNING}❔ No reply to the protocol probe (open|filtered):{Colors.ENDC}")
+        for target, port in self.unanswered:
+            print(f"{Colors.WARNING}[?] {target}:{port}/udp - {UDP_PROBES[port].service}{Colors.ENDC}")
+        if self.unanswered_count > len(self.unanswered):
+            print(f"{Colors.WARNING}    ... {self.unanswered_count - len(self.unanswered):,} more unanswered ports{Colors.ENDC}")
+
     def save_scan_results(self):
         """Save scan results to file"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -503,6 +1311,128 @@ class OAzisScanner:
         except Exception as e:
             print(f"{Colors.FAIL}❌ Failed to save results: {e}{Colors.ENDC}")
 
+    def view_previous_results(self):
+        """Browse and query the scan history database"""
+        history = self.open_history()
+        if not history:
+            input(f"{Colors.OKCYAN}Press Enter to continue...{Colors.ENDC}")
+            return
+        
+        while True:
+            print(f"\n{Colors.BOLD}{Colors.OKGREEN}📊 SCAN HISTORY{Colors.ENDC}")
+            print("=" * 60)
+            print("  [1] Recent scans")
+            print("  [2] Show results of a scan")
+            print("  [3] Find hosts with a port open")
+            print("  [4] Search by target / port / service")
+            print("  [5] Compare two scans")
+            print("  [6] Import saved JSON result files")
+            print("  [0] Back to main menu")
+            
+            choice = self.get_user_input("Choose option: ")
+            
+            if choice == "1":
+                self.show_recent_scans(history)
+            elif choice == "2":
+                scan_id = self.get_user_input("Scan ID: ", input_type="int")
+                rows = history.scan_results(scan_id)
+                if rows:
+                    self.print_history_rows(rows)
+                else:
+                    print(f"{Colors.WARNING}🔍 No results for scan {scan_id}.{Colors.ENDC}")
+            elif choice == "3":
+                port, protocol = self.parse_history_port(self.get_user_input(
+                    "Port (e.g. 6379 or 53/udp): ", validation=lambda x: self.parse_history_port(x) is not None))
+                days = self.get_user_input("Within the last N days (0 = all time): ", input_type="int",
+                                           validation=lambda x: x >= 0)
+                since = time.time() - days * 86400 if days else None
+                rows = history.hosts_with_port(port, since, protocol)
+                print(f"\n{Colors.OKGREEN}{len(rows)} hosts with port {port}/{protocol} open{Colors.ENDC}")
+                for row in rows:
+                    seen = datetime.fromtimestamp(row['last_seen']).strftime('%Y-%m-%d %H:%M')
+                    product = " ".join(filter(None, [row['product'], row['version']]))
+                    print(f"  {row['target']:<40} last seen {seen} ({row['scans']} scans) {product}")
+            elif choice == "4":
+                target = self.get_user_input("Target IP (empty = any): ") or None
+                port_text = self.get_user_input("Port, e.g. 22 or 53/udp (empty = any): ",
+                                                validation=lambda x: not x or self.parse_history_port(x) is not None)
+                service = self.get_user_input("Service, e.g. SSH (empty = any): ") or None
+                port, protocol = self.parse_history_port(port_text) if port_text else (None, None)
+                rows = history.search(target=target, port=port, service=service, protocol=protocol)
+                if rows:
+                    self.print_history_rows(rows)
+                else:
+                    print(f"{Colors.WARNING}🔍 No matching results.{Colors.ENDC}")
+            elif choice == "5":
+                old_id = self.get_user_input("Older scan ID: ", input_type="int")
+                new_id = self.get_user_input("Newer scan ID: ", input_type="int")
+                try:
+                    self.print_scan_diff(history.diff(old_id, new_id))
+                except ValueError as e:
+                    print(f"{Colors.FAIL}❌ {e}{Colors.ENDC}")
+            elif choice == "6":
+                pattern = self.get_user_input("Files to import (default: oazis_scan_*.json): ") or "oazis_scan_*.json"
+                for filename in sorted(glob.glob(pattern)):
+                    try:
+                        scan_id = history.import_json(filename)
+                        print(f"{Colors.OKGREEN}✅ {filename} imported as scan {scan_id}{Colors.ENDC}")
+                    except (OSError, ValueError, KeyError) as e:
+                        print(f"{Colors.FAIL}❌ {filename}: {e}{Colors.ENDC}")
+            elif choice == "0":
+                break
+
+    @staticmethod
+    def parse_history_port(text):
+        """'53/udp' -> (53, 'udp'), '22' -> (22, 'tcp'); None if invalid"""
+        port, _, protocol = text.strip().lower().partition('/')
+        protocol = protocol or 'tcp'
+        if not port.isdigit() or not 1 <= int(port) <= 65535 or protocol not in ('tcp', 'udp'):
+            return None
+        return int(port), protocol
+
+    @staticmethod
+    def history_port(row):
+        """Port of a history row, with /udp for UDP results"""
+        return f"{row['port']}/udp" if row['protocol'] == 'udp' else str(row['port'])
+
+    def show_recent_scans(self, history):
+        """List the most recent scans in the history database"""
+        scans = history.recent_scans()
+        if not scans:
+            print(f"{Colors.WARNING}🔍 No scans recorded yet.{Colors.ENDC}")
+            return
+        print(f"\n{'ID':<6} {'STARTED':<17} {'TARGETS':<30} {'PORTS':<15} {'OPEN':<6} STATUS")
+        print("-" * 85)
+        for scan in scans:
+            targets = json.loads(scan['targets'])
+            targets_text = ", ".join(targets[:2]) + (f" +{len(targets) - 2}" if len(targets) > 2 else "")
+            ports_text = scan['ports'] + ("/udp" if scan['protocol'] == 'udp' else "")
+            ports_text = ports_text if len(ports_text) <= 15 else ports_text[:12] + "..."
+            started = datetime.fromtimestamp(scan['started']).strftime('%Y-%m-%d %H:%M')
+            status = "complete" if scan['completed'] else "incomplete"
+            print(f"{scan['id']:<6} {started:<17} {targets_text[:30]:<30} {ports_text:<15} {scan['open_count']:<6} {status}")
+
+    def print_history_rows(self, rows):
+        """Print result rows from the history database"""
+        print(f"\n{'TARGET':<20} {'PORT':<8} {'SERVICE':<15} {'SEEN':<17} VERSION / BANNER")
+        print("-" * 85)
+        for row in rows:
+            seen = datetime.fromtimestamp(row['seen']).strftime('%Y-%m-%d %H:%M')
+            description = self.describe(dict(row)) or ""
+            print(f"{row['target']:<20} {self.history_port(row):<8} {row['service'] or '':<15} {seen:<17} {description[:40]}")
+
+    def print_scan_diff(self, changes):
+        """Print the output of ScanHistory.diff()"""
+        if not any(changes.values()):
+            print(f"{Colors.OKGREEN}✅ No changes between the two scans.{Colors.ENDC}")
+            return
+        for row in changes['opened']:
+            print(f"{Colors.OKGREEN}[+] {row['target']}:{self.history_port(row)} {row['service']} newly open{Colors.ENDC}")
+        for row in changes['closed']:
+            print(f"{Colors.FAIL}[-] {row['target']}:{self.history_port(row)} {row['service']} closed{Colors.ENDC}")
+        for old, new in changes['changed']:
+            print(f"{Colors.WARNING}[~] {new['target']}:{self.history_port(new)} {self.describe(dict(old)) or '-'} -> {self.describe(dict(new)) or '-'}{Colors.ENDC}")
+
     def show_help(self):
         """Display help and documentation"""
         help_text = f"""
@@ -510,24 +1440,64 @@ class OAzisScanner:
 {'=' * 50}
 
 {Colors.OKCYAN}🎯 SCANNING MODES:{Colors.ENDC}
-  • Single Target  - Scan one IP/hostname
-  • Multi-Target   - Scan multiple targets
+  • Single Target  - Scan one IP/hostname, CIDR or range
+  • Multi-Target   - Scan multiple targets in parallel
+  
+{Colors.OKCYAN}🌐 TARGET SPECIFICATIONS:{Colors.ENDC}
+  • Hosts:    10.0.0.5, 2001:db8::5, host.example.com
+  • Blocks:   10.0.0.0/24, 10.0.0.1-50, 10.0.0.1-10.0.0.50
+  • Files:    @assets.txt (entries per line, # comments)
+  • Exclude:  !10.0.0.1, !10.0.0.128/25
   
 {Colors.OKCYAN}🔍 PORT SPECIFICATIONS:{Colors.ENDC}
   • Ranges:   1-1000, 8000-9000
   • Lists:    22,80,443,8080
   • Mixed:    20-25,80,443,8000-8090
-  • Keywords: 'common', 'all', 'top1000'
+  • Keywords: 'common', 'all', 'top100', 'top1000' (most often open
+              first), 'udp' (mixable: common,9000-9100)
   
 {Colors.OKCYAN}⚙️ CONFIGURATION OPTIONS:{Colors.ENDC}
   • Threads:      1-500 (default: 100)
   • Timeout:      0.1-30s (default: 1s)
   • Stealth Mode: Slower, less detectable
   • Save Results: Auto-save to JSON
+  • Scan History: every scan recorded in a SQLite database; browse
+                  and query it from main menu option [4]
+  • Differential Rescan: re-verify last scan's open ports first, then
+                  sweep the rest (or a rotating 1/N slice); reports
+                  only new, closed and changed ports
+  • Stream Output: NDJSON file written as results arrive, with a
+                   final summary line; results are not kept in memory
+  • Live Progress: status line with %, probes/s, ETA, open ports and
+                   host states; findings are printed in batches. Auto
+                   draws it only when output is a terminal
+  • Metrics Export: connect/banner/queue-wait/DNS latency histograms
+                   and counters, written as <prefix>.json and
+                   <prefix>.prom (Prometheus) periodically and at the end
+  • Scan Engine:  threaded (default), async event loop,
+                  multiprocess (async engine sharded over CPU cores), or
+                  udp (protocol payloads for DNS, NTP, SNMP, TFTP, ...;
+                  ICMP port unreachable marks a port closed), or
+                  syn (half-open SYN scan from raw sockets; root,
+                  Linux and scapy; async concurrency is the SYN window)
+  • UDP Retransmissions: extra sends of unanswered UDP probes (default: 2)
+  • Port Order:   most likely open ports first, across all targets
+                  (default), or numeric
+  • Async Concurrency: 1-20000 in-flight connects (default: 2000)
+  • Per-Host Limit:    in-flight probes per target (default: 500)
+  • Banner Stage:      separate workers/timeout for banner grabbing
+                       on confirmed open ports (default: 50, 2s)
+  • Adaptive Timeout:  per-host timeout from measured RTT, capped
+                       at the configured timeout (off in stealth)
+  • Checkpoints:       progress saved to ~/.payner_checkpoints/ so an
+                       interrupted scan can be resumed (default: on)
+  • Max Probe Rate:    token-bucket cap on connection attempts, for the
+                       whole scan and/or per target (default: unlimited)
   
 {Colors.OKCYAN}🔧 ADVANCED FEATURES:{Colors.ENDC}
   • Service Detection: 50+ common services
-  • Banner Grabbing:   Version identification
+  • Version Detection: Probe/match database with product and version
+  • Banner Grabbing:   Raw service banners
   • Multi-threading:   High-speed scanning
   • Real-time Output:  Live scan results
   • JSON Export:       Machine-readable results
@@ -584,8 +1554,7 @@ Unauthorized scanning may violate laws and regulations.
             elif choice == "3":
                 self.scan_configuration()
             elif choice == "4":
-                print(f"{Colors.WARNING}📊 Results viewing feature coming soon!{Colors.ENDC}")
-                time.sleep(2)
+                self.view_previous_results()
             elif choice == "5":
                 print(f"{Colors.WARNING}🔧 Advanced tools coming soon!{Colors.ENDC}")
                 time.sleep(2)
@@ -601,6 +1570,45 @@ Unauthorized scanning may violate laws and regulations.
                 print(f"{Colors.FAIL}❌ Invalid option. Please try again.{Colors.ENDC}")
                 time.sleep(1)
 
+def scan_shard(targets, ports, options):
+    """Worker-process entry point for the multiprocess engine.
+
+    Runs port discovery for one shard on a private async engine and returns
+    the open (target, port) pairs, the learned per-host timeouts, the
+    rate-governor counters and a metrics snapshot; the parent feeds them to
+    its banner stage and does all printing.
+    """
+    metrics = ScanMetrics('oazis')
+    timeouts = HostTimeouts(
+        options['timeout'],
+        floor=options['min_timeout'],
+        adaptive=options['adaptive_timeout']
+    )
+    governor = RateGovernor(options['max_rate'], options['per_target_rate'], metrics=metrics)
+    open_ports = []
+    
+    def collect(target, port):
+        open_ports.append((target, port))
+    
+    # Blocks finished before a resume are skipped
+    completed_blocks = {target: set(blocks) for target, blocks in options['completed_blocks'].items()}
+    scheduler = HostScheduler(
+        targets, LikelyOrder(ports) if options['likely_first'] else ports,
+        per_host_limit=options['per_host_limit'],
+        port_filter=(lambda target, port: port // CHUNK_SIZE not in completed_blocks.get(target, ()))
+                    if completed_blocks else None
+    )
+    engine = AsyncConnectEngine(
+        on_open=collect,
+        timeout=options['timeout'],
+        concurrency=min(options['concurrency'], len(scheduler)),
+        timeouts=timeouts,
+        governor=governor,
+        metrics=metrics
+    )
+    engine.run(scheduler)
+    return open_ports, timeouts.timeouts, governor.stats(), metrics.snapshot()
+
 def main():
     """Main application entry point"""
     try:
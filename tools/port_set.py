@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Port Set
+Compact, range-based set of TCP/UDP ports shared by the O'Azis and MILKO
+scanners. A full 1-65535 sweep is one range rather than 65535 Python ints, and
+engines iterate it lazily.
+For authorized security testing only.
+"""
+
+import bisect
+from itertools import chain, islice
+
+MIN_PORT = 1
+MAX_PORT = 65535
+
+
+class PortSet:
+    """Immutable set of ports stored as sorted, disjoint, inclusive ranges.
+
+    Supports parsing ("22,80,8000-8100"), union, membership tests, len(),
+    lazy ascending iteration, chunked iteration and positional slicing, so it
+    can stand in wherever the scanners used a sorted list of ports.
+    """
+
+    __slots__ = ('ranges', 'offsets', 'size')
+
+    def __init__(self, ranges=()):
+        merged = []
+        for start, end in sorted(ranges):
+            if start > end:
+                continue
+            if merged and start <= merged[-1][1] + 1:
+                if end > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        self.ranges = tuple(merged)
+        # offsets[i] is the position of ranges[i][0] in iteration order
+        offsets = []
+        self.size = 0
+        for start, end in self.ranges:
+            offsets.append(self.size)
+            self.size += end - start + 1
+        self.offsets = tuple(offsets)
+
+    @classmethod
+    def from_ports(cls, ports):
+        """Build a set from any iterable of port numbers"""
+        if isinstance(ports, PortSet):
+            return ports
+        if isinstance(ports, range) and ports.step == 1:
+            return cls([(ports.start, ports.stop - 1)])
+        return cls((port, port) for port in ports)
+
+    @classmethod
+    def parse(cls, spec, keywords=None):
+        """Parse "22,80,443,8000-8100"; `keywords` maps names to PortSets.
+
+        Raises ValueError on malformed input or out-of-range ports.
+        """
+        keywords = keywords or {}
+        ranges = []
+        for part in spec.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            if part.lower() in keywords:
+                ranges.extend(keywords[part.lower()].ranges)
+            elif '-' in part:
+                start, end = map(int, part.split('-'))
+                if start > end or start < MIN_PORT or end > MAX_PORT:
+                    raise ValueError(f"Invalid range: {part}")
+                ranges.append((start, end))
+            else:
+                port = int(part)
+                if port < MIN_PORT or port > MAX_PORT:
+                    raise ValueError(f"Invalid port: {port}")
+                ranges.append((port, port))
+        if not ranges:
+            raise ValueError("No valid ports specified")
+        return cls(ranges)
+
+    def union(self, *others):
+        return PortSet(chain(self.ranges, *(PortSet.from_ports(other).ranges for other in others)))
+
+    __or__ = union
+
+    def difference(self, other):
+        """Ports in this set but not in `other`"""
+        other = PortSet.from_ports(other)
+        ranges = []
+        j = 0
+        for start, end in self.ranges:
+            while j < len(other.ranges) and other.ranges[j][1] < start:
+                j += 1
+            k = j
+            while start <= end and k < len(other.ranges) and other.ranges[k][0] <= end:
+                cut_start, cut_end = other.ranges[k]
+                if cut_start > start:
+                    ranges.append((start, cut_start - 1))
+                start = max(start, cut_end + 1)
+                k += 1
+            if start <= end:
+                ranges.append((start, end))
+        return PortSet(ranges)
+
+    __sub__ = difference
+
+    def intersection(self, other):
+        """Ports in both this set and `other`"""
+        return self - (self - PortSet.from_ports(other))
+
+    __and__ = intersection
+
+    def __contains__(self, port):
+        i = bisect.bisect_right(self.ranges, (port, MAX_PORT + 1)) - 1
+        return i >= 0 and self.ranges[i][0] <= port <= self.ranges[i][1]
+
+    def __len__(self):
+        return self.size
+
+    def __bool__(self):
+        return self.size > 0
+
+    def __iter__(self):
+        for start, end in self.ranges:
+            yield from range(start, end + 1)
+
+    def __eq__(self, other):
+        return isinstance(other, PortSet) and self.ranges == other.ranges
+
+    def __hash__(self):
+        return hash(self.ranges)
+
+    def __getitem__(self, index):
+        """Port at a position in ascending order, or a PortSet for a slice"""
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.size)
+            if step != 1:
+                return PortSet.from_ports(islice(self, start, stop, step))
+            return self._slice(start, stop)
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("PortSet index out of range")
+        i = bisect.bisect_right(self.offsets, index) - 1
+        return self.ranges[i][0] + index - self.offsets[i]
+
+    def _slice(self, start, stop):
+        ranges = []
+        for (low, high), offset in zip(self.ranges, self.offsets):
+            first = max(start - offset, 0)
+            last = min(stop - offset, high - low + 1) - 1
+            if first <= last:
+                ranges.append((low + first, low + last))
+        return PortSet(ranges)
+
+    def chunks(self, size):
+        """Yield consecutive PortSets of at most `size` ports each"""
+        for start in range(0, self.size, size):
+            yield self._slice(start, start + size)
+
+    def blocks(self, block_size):
+        """Number of ports in each `port // block_size` block"""
+        counts = {}
+        for start, end in self.ranges:
+            port = start
+            while port <= end:
+                block = port // block_size
+                block_end = min(end, (block + 1) * block_size - 1)
+                counts[block] = counts.get(block, 0) + block_end - port + 1
+                port = block_end + 1
+        return counts
+
+    @property
+    def first(self):
+        return self.ranges[0][0] if self.ranges else None
+
+    @property
+    def last(self):
+        return self.ranges[-1][1] if self.ranges else None
+
+    def to_spec(self):
+        """Canonical "22,80,8000-8100" form"""
+        return ','.join(str(start) if start == end else f"{start}-{end}" for start, end in self.ranges)
+
+    def __str__(self):
+        return self.to_spec()
+
+    def __repr__(self):
+        return f"PortSet('{self.to_spec()}')"
+
+
+ALL_PORTS = PortSet([(MIN_PORT, MAX_PORT)])
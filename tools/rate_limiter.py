@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Rate Limiter
+Token-bucket probe-rate governor shared by every scan engine, so a scan can be
+held to the maximum probe rate of a change window regardless of target latency.
+For authorized security testing only.
+"""
+
+import asyncio
+import threading
+import time
+
+# Idle capacity a bucket may bank, as seconds' worth of its rate; small enough
+# that no window much longer than this ever exceeds the configured rate
+DEFAULT_BURST_WINDOW = 0.05
+
+
+class TokenBucket:
+    """Thread-safe token bucket that hands out send times instead of blocking.
+
+    Implemented as a virtual schedule (GCRA): each reservation takes the next
+    slot, `1 / rate` seconds after the previous one. Up to `burst` unused
+    slots can be caught up on at once, which absorbs sleep jitter without
+    letting the long-run rate drift above or below `rate`.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.interval = 1.0 / self.rate
+        self.burst = max(1.0, burst if burst is not None else self.rate * DEFAULT_BURST_WINDOW)
+        self.next_slot = None
+        self.lock = threading.Lock()
+
+    def reserve(self, earliest):
+        """Reserve one token usable no sooner than `earliest` (monotonic); returns its send time"""
+        with self.lock:
+            if self.next_slot is None:
+                self.next_slot = earliest
+            slot = max(self.next_slot, earliest - (self.burst - 1) * self.interval)
+            self.next_slot = slot + self.interval
+        return max(slot, earliest)
+
+
+class RateGovernor:
+    """Per-run and per-target probe-rate limits for connection attempts.
+
+    `rate` caps the whole run and `per_target_rate` each target address, both
+    in probes per second; 0 or None disables a limit. Blocking engines call
+    wait(target) and the async engine awaits wait_async(target) immediately
+    before each connect. The achieved rate is tracked for the scan summary,
+    and with `metrics` every wait is recorded as a rate_limit queue wait.
+    """
+
+    def __init__(self, rate=None, per_target_rate=None, burst=None, metrics=None):
+        self.rate = rate or None
+        self.metrics = metrics
+        self.per_target_rate = per_target_rate or None
+        self.burst = burst
+        self.bucket = TokenBucket(self.rate, burst) if self.rate else None
+        self.target_buckets = {}
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.first_sent = None
+        self.last_sent = None
+
+    @property
+    def enabled(self):
+        return self.rate is not None or self.per_target_rate is not None
+
+    def reserve(self, target):
+        """Reserve a probe slot for `target`; returns the seconds to wait before sending"""
+        now = time.monotonic()
+        send_at = now
+        if self.per_target_rate:
+            bucket = self.target_buckets.get(target)
+            if bucket is None:
+                with self.lock:
+                    bucket = self.target_buckets.setdefault(target, TokenBucket(self.per_target_rate, self.burst))
+            send_at = bucket.reserve(send_at)
+        if self.bucket:
+            send_at = self.bucket.reserve(send_at)
+        return send_at - now
+
+    def wait(self, target):
+        """Block the calling thread until a probe to `target` may be sent"""
+        delay = self.reserve(target)
+        if delay > 0:
+            time.sleep(delay)
+        self._record(delay)
+
+    async def wait_async(self, target):
+        """Coroutine version of wait() for the async engine"""
+        delay = self.reserve(target)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._record(delay)
+
+    def _record(self, delay):
+        if self.metrics:
+            self.metrics.observe('queue_wait_seconds', max(0.0, delay), stage='rate_limit')
+        now = time.time()
+        with self.lock:
+            self.sent += 1
+            if self.first_sent is None:
+                self.first_sent = now
+            self.last_sent = now
+
+    def merge(self, sent, first_sent, last_sent):
+        """Fold in the counters of a governor that ran in another process"""
+        if not sent:
+            return
+        with self.lock:
+            self.sent += sent
+            self.first_sent = first_sent if self.first_sent is None else min(self.first_sent, first_sent)
+            self.last_sent = last_sent if self.last_sent is None else max(self.last_sent, last_sent)
+
+    def stats(self):
+        """(sent, first_sent, last_sent), picklable for merge()"""
+        with self.lock:
+            return self.sent, self.first_sent, self.last_sent
+
+    def achieved_rate(self):
+        """Probes per second between the first and the last probe"""
+        with self.lock:
+            if self.sent < 2 or self.last_sent <= self.first_sent:
+                return None
+            return (self.sent - 1) / (self.last_sent - self.first_sent)
+
+    def limits(self):
+        """Configured limits as text, e.g. '2,000/s, 100/s per target'"""
+        limits = []
+        if self.rate:
+            limits.append(f"{self.rate:,.0f}/s")
+        if self.per_target_rate:
+            limits.append(f"{self.per_target_rate:,.0f}/s per target")
+        return ", ".join(limits) or "none"
+
+    def describe(self):
+        """Achieved vs. configured rate, for scan summaries"""
+        achieved = self.achieved_rate()
+        achieved_text = f"{achieved:,.1f}/s" if achieved is not None else "n/a"
+        return f"{achieved_text} achieved (limit {self.limits()})"
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Result Sink
+Streams scan findings as newline-delimited JSON (one object per line) while
+the scan runs, so results survive a crash and can be ingested in real time.
+For authorized security testing only.
+"""
+
+import json
+import sys
+import threading
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+
+class NDJSONSink:
+    """Append-only NDJSON writer that flushes in batches.
+
+    Records are buffered and written once `batch_size` are pending or
+    `flush_interval` seconds have passed, whichever comes first. close()
+    writes a final summary record. Pass '-' to stream to stdout.
+    """
+
+    def __init__(self, destination, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        if destination == '-':
+            self.stream = sys.stdout
+            self.owns_stream = False
+        elif hasattr(destination, 'write'):
+            self.stream = destination
+            self.owns_stream = False
+        else:
+            self.stream = open(destination, 'a', encoding='utf-8')
+            self.owns_stream = True
+        self.name = getattr(self.stream, 'name', str(destination))
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.written = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.flusher = threading.Thread(target=self._flush_periodically)
+        self.flusher.daemon = True
+        self.flusher.start()
+
+    def write(self, record):
+        """Queue one record; flushes when the batch is full"""
+        line = json.dumps(record, separators=(',', ':'), default=str)
+        with self.lock:
+            self.pending.append(line)
+            if len(self.pending) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def close(self, summary=None):
+        """Flush everything, append the summary record and release the file"""
+        self.stopped.set()
+        self.flusher.join()
+        if summary is not None:
+            self.write(summary)
+        self.flush()
+        if self.owns_stream:
+            self.stream.close()
+
+    def _flush_locked(self):
+        if not self.pending:
+            return
+        self.stream.write('\n'.join(self.pending) + '\n')
+        self.stream.flush()
+        self.written += len(self.pending)
+        self.pending = []
+
+    def _flush_periodically(self):
+        while not self.stopped.wait(self.flush_interval):
+            self.flush()
@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+Scan Benchmark
+Loopback benchmark suite for the O'Azis and MILKO port scanners: starts a
+stand-in fleet on 127.0.0.0/8 addresses (banner services, closed ports and
+filtered ports), runs each scanner/engine combination against it and writes
+a machine-readable report of throughput, time to first result, peak RSS and
+accuracy, optionally compared with an earlier report to flag regressions.
+For authorized security testing only.
+"""
+
+import argparse
+import asyncio
+import io
+import ipaddress
+import json
+import multiprocessing
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from scan_engine import DEFAULT_ASYNC_CONCURRENCY, DEFAULT_WORKERS, raise_fd_limit
+from port_set import PortSet, ALL_PORTS
+
+FORMAT_VERSION = 1
+DEFAULT_BASE_ADDRESS = '127.77.0.1'
+DEFAULT_HOSTS = 4
+DEFAULT_PORTS = '1-10000'
+DEFAULT_TIMEOUT = 0.5
+DEFAULT_THREADS = 200
+DEFAULT_TOLERANCE = 0.15
+CASE_TIMEOUT = 900.0       # Seconds before a hung case is killed
+RESPONSE_WAIT = 2.0        # How long a request/response service waits for the request
+
+# Absolute changes below these never count as regressions, however large in percent
+MIN_TTFR_DELTA = 0.05      # Seconds
+MIN_RSS_DELTA = 5.0        # MB
+
+# (scanner, engine) combinations, in run order
+CASES = (
+    ('oazis', 'threaded'),
+    ('oazis', 'async'),
+    ('oazis', 'multiprocess'),
+    ('milko', 'threaded'),
+    ('milko', 'async'),
+    ('oazis', 'syn'),
+    ('milko', 'syn'),
+)
+
+# Every fleet host runs these. `banner` is sent on connect (after `delay`
+# seconds); `response` answers the first request. `service` is what the
+# banner stage is expected to identify.
+DEFAULT_FLEET = {
+    'services': [
+        {'port': 21, 'banner': '220 (vsFTPd 3.0.5)\r\n', 'delay': 0.05, 'service': 'FTP'},
+        {'port': 22, 'banner': 'SSH-2.0-OpenSSH_8.9p1 Ubuntu-3ubuntu0.6\r\n', 'service': 'SSH'},
+        {'port': 25, 'banner': '220 mail.bench.local ESMTP Postfix\r\n', 'delay': 0.2, 'service': 'SMTP'},
+        {'port': 80, 'response': 'HTTP/1.1 200 OK\r\nServer: nginx/1.24.0\r\nContent-Length: 0\r\n\r\n',
+         'service': 'HTTP'},
+        {'port': 6379, 'response': '-NOAUTH Authentication required.\r\n', 'service': 'Redis'},
+    ],
+    # Listening with a full, never-accepted backlog: SYNs are dropped, so
+    # connects time out the way they do against a firewall
+    'filtered': [135, 139, 445, 3389],
+}
+
+
+def peak_rss_mb(who=None):
+    """Peak resident set size of this process (or its waited-for children) in MB; None if unknown"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024  # bytes on macOS, KB elsewhere
+
+
+def fleet_addresses(base, hosts):
+    """`hosts` consecutive loopback addresses starting at `base`"""
+    first = ipaddress.IPv4Address(base)
+    last = first + (hosts - 1)
+    if first not in ipaddress.ip_network('127.0.0.0/8') or last not in ipaddress.ip_network('127.0.0.0/8'):
+        raise ValueError(f"The fleet must stay inside 127.0.0.0/8 ({first} + {hosts} hosts)")
+    return [str(first + i) for i in range(hosts)]
+
+
+def listening_ports(address, ports, timeout=0.2):
+    """Ports already accepting connections on `address` before the fleet starts"""
+    found = []
+    for port in ports:
+        with socket.socket() as sock:
+            sock.settimeout(timeout)
+            if sock.connect_ex((address, port)) == 0:
+                found.append(port)
+    return found
+
+
+class LoopbackFleet:
+    """Stand-in hosts on loopback addresses, served from a separate process.
+
+    Linux routes all of 127.0.0.0/8 to the loopback interface, so any address
+    in it can be bound without setup; on macOS each address needs an alias
+    first (sudo ifconfig lo0 alias 127.77.0.2 up). Running the fleet in its
+    own process keeps its CPU time and memory out of the scanner's numbers.
+    """
+
+    def __init__(self, addresses, services, filtered):
+        self.addresses = addresses
+        self.services = services
+        self.filtered = filtered
+        self.process = None
+        self.stop_event = None
+
+    def expected(self):
+        """{(address, port): service} of every open port"""
+        return {(address, service['port']): service.get('service')
+                for address in self.addresses for service in self.services}
+
+    def start(self):
+        context = multiprocessing.get_context('spawn')
+        ready, self.stop_event = context.Event(), context.Event()
+        parent, child = context.Pipe(duplex=False)
+        self.process = context.Process(target=serve_fleet,
+                                       args=(self.addresses, self.services, self.filtered, ready, self.stop_event,
+                                             child))
+        self.process.daemon = True
+        self.process.start()
+        while not ready.wait(0.1):
+            if not self.process.is_alive():
+                break
+        if parent.poll():
+            error = parent.recv()
+            self.stop()
+            raise OSError(error)
+        if not ready.is_set():
+            self.stop()
+            raise OSError("Fleet process exited before it was ready")
+        return self
+
+    def stop(self):
+        if self.process:
+            self.stop_event.set()
+            self.process.join(5)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def serve_fleet(addresses, services, filtered, ready, stop, errors):
+    """Fleet process entry point: serve every listener until `stop` is set"""
+    raise_fd_limit(len(addresses) * (len(services) + 2 * len(filtered)) + 1024)
+
+    async def handle(service, reader, writer):
+        try:
+            if service.get('delay'):
+                await asyncio.sleep(service['delay'])
+            if service.get('banner'):
+                writer.write(service['banner'].encode())
+            if service.get('response'):
+                request = await asyncio.wait_for(reader.read(4096), RESPONSE_WAIT)
+                if request:
+                    writer.write(service['response'].encode())
+            await writer.drain()
+        except (OSError, asyncio.TimeoutError):
+            pass  # The discovery stage hangs up straight away
+        finally:
+            writer.close()
+
+    async def main():
+        servers, held = [], []
+        try:
+            for address in addresses:
+                for service in services:
+                    servers.append(await asyncio.start_server(
+                        lambda r, w, service=service: handle(service, r, w), address, service['port'],
+                        reuse_address=True, backlog=1024))
+                for port in filtered:
+                    listener = socket.socket()
+                    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                    listener.bind((address, port))
+                    listener.listen(0)
+                    # Fill the accept queue so later SYNs are dropped
+                    filler = socket.socket()
+                    filler.setblocking(False)
+                    filler.connect_ex((address, port))
+                    held.extend([listener, filler])
+        except OSError as e:
+            errors.send(f"Cannot start the fleet on {address}: {e}")
+            return
+        await asyncio.sleep(0.2)  # Let the filler handshakes complete
+        ready.set()
+        await asyncio.get_running_loop().run_in_executor(None, stop.wait)
+        for server in servers:
+            server.close()
+        for sock in held:
+            sock.close()
+
+    asyncio.run(main())
+
+
+def run_case(scanner, engine, addresses, ports, options):
+    """Run one scan against the fleet in this process and measure it"""
+    import oazis_scanner
+    import network_scanner
+
+    class TimedOAzis(oazis_scanner.OAzisScanner):
+        first_result = None
+
+        def merge_result(self, scan_result):
+            if self.first_result is None:
+                self.first_result = time.perf_counter()
+            super().merge_result(scan_result)
+
+    class TimedPortScanner(network_scanner.PortScanner):
+        first_result = None
+
+        def record_open_port(self, target, port, fingerprint=None):
+            if self.first_result is None:
+                self.first_result = time.perf_counter()
+            super().record_open_port(target, port, fingerprint)
+
+    baseline_rss = peak_rss_mb()
+    output = io.StringIO()
+    with redirect_stdout(output):
+        if scanner == 'oazis':
+            bench = TimedOAzis()
+            bench.scan_config.update(
+                engine=engine, save_results=False, checkpoint=False, history=False, differential=False,
+                stream_output='', metrics_output='', live_progress=False,
+                async_concurrency=options['concurrency'], workers=options['workers'],
+                likely_first=options['port_order'] == 'likely'
+            )
+            started = time.perf_counter()
+            bench.execute_scan(addresses, ports, options['threads'], options['timeout'], False)
+            elapsed = time.perf_counter() - started
+            results = [(r['target'], r['port'], r['service']) for r in bench.scan_results]
+        else:
+            bench = TimedPortScanner(','.join(addresses), port_list=ports, engine=engine, threads=options['threads'],
+                                     concurrency=options['concurrency'], timeout=options['timeout'],
+                                     live_progress=False, likely_first=options['port_order'] == 'likely')
+            started = time.perf_counter()
+            bench.scan()
+            elapsed = time.perf_counter() - started
+            results = [(r['target'], r['port'], r['service']) for r in bench.open_ports]
+    peak_rss = peak_rss_mb()
+    children_rss = peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None
+
+    probes = len(addresses) * len(ports)
+    connect = {}
+    for outcome in ('open', 'refused', 'timeout', 'error'):
+        histogram = bench.metrics.histogram('connect_seconds', result=outcome)
+        if histogram.count:
+            connect[outcome] = {'count': histogram.count, 'p50': histogram.percentile(0.5),
+                                'p99': histogram.percentile(0.99)}
+    return {
+        'probes': probes,
+        'seconds': round(elapsed, 4),
+        'ports_per_sec': round(probes / elapsed, 1) if elapsed > 0 else None,
+        'time_to_first_result': round(bench.first_result - started, 4) if bench.first_result else None,
+        'baseline_rss_mb': round(baseline_rss, 1) if baseline_rss is not None else None,
+        'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else None,
+        'worker_peak_rss_mb': round(children_rss, 1) if children_rss else None,
+        'results': results,
+        'connect': connect
+    }
+
+
+def _case_process(conn, scanner, engine, addresses, ports, options):
+    try:
+        conn.send(run_case(scanner, engine, addresses, ports, options))
+    except BaseException as e:
+        conn.send({'error': f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def run_isolated(scanner, engine, addresses, ports, options):
+    """run_case() in a fresh process, so every case starts with a clean peak RSS and resolver cache"""
+    context = multiprocessing.get_context('spawn')
+    parent, child = context.Pipe(duplex=False)
+    process = context.Process(target=_case_process, args=(child, scanner, engine, addresses, ports, options))
+    process.start()
+    child.close()
+    try:
+        if not parent.poll(CASE_TIMEOUT):
+            return {'error': f"Timed out after {CASE_TIMEOUT:.0f}s"}
+        return parent.recv()
+    except EOFError:
+        return {'error': f"Case process died (exit code {process.exitcode})"}
+    finally:
+        process.join(5)
+        if process.is_alive():
+            process.terminate()
+
+
+def score(run, expected, ignored):
+    """Accuracy of one run against the fleet's open ports, ignoring pre-existing listeners"""
+    found = {}
+    for target, port, service in run.pop('results'):
+        if port not in ignored:
+            found[(target, port)] = service
+    hits = found.keys() & expected.keys()
+    run['accuracy'] = {
+        'expected': len(expected),
+        'found': len(hits),
+        'missed': len(expected) - len(hits),
+        'unexpected': len(found.keys() - expected.keys()),
+        'recall': round(len(hits) / len(expected), 4) if expected else None,
+        'services_identified': sum(1 for key in hits if found[key] == expected[key])
+    }
+    return run
+
+
+def median_of(runs):
+    """Per-metric median over the successful runs of a case"""
+    runs = [run for run in runs if 'error' not in run]
+    if not runs:
+        return None
+    summary = {}
+    for key in ('seconds', 'ports_per_sec', 'time_to_first_result', 'peak_rss_mb', 'worker_peak_rss_mb'):
+        values = [run[key] for run in runs if run.get(key) is not None]
+        summary[key] = round(statistics.median(values), 4) if values else None
+    for key in ('recall', 'services_identified', 'unexpected'):
+        summary[key] = statistics.median(run['accuracy'][key] for run in runs)
+    return summary
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Regressions of `report` against an earlier report, as human-readable strings"""
+    regressions = []
+    previous = {case['name']: case['median'] for case in baseline.get('cases', []) if case.get('median')}
+    for case in report['cases']:
+        new, old = case.get('median'), previous.get(case['name'])
+        if not new or not old:
+            continue
+        name = case['name']
+        if new['ports_per_sec'] and old['ports_per_sec'] and new['ports_per_sec'] < old['ports_per_sec'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {old['ports_per_sec']:,.0f} -> {new['ports_per_sec']:,.0f} ports/s")
+        new_ttfr, old_ttfr = new['time_to_first_result'], old['time_to_first_result']
+        if new_ttfr and old_ttfr and new_ttfr > old_ttfr * (1 + tolerance) and new_ttfr - old_ttfr > MIN_TTFR_DELTA:
+            regressions.append(f"{name}: time to first result {old_ttfr:.3f}s -> {new_ttfr:.3f}s")
+        new_rss, old_rss = new['peak_rss_mb'], old['peak_rss_mb']
+        if new_rss and old_rss and new_rss > old_rss * (1 + tolerance) and new_rss - old_rss > MIN_RSS_DELTA:
+            regressions.append(f"{name}: peak RSS {old_rss:.1f} -> {new_rss:.1f} MB")
+        for key in ('recall', 'services_identified'):
+            if new[key] is not None and old[key] is not None and new[key] < old[key]:
+                regressions.append(f"{name}: {key.replace('_', ' ')} {old[key]} -> {new[key]}")
+        if new['unexpected'] > old['unexpected']:
+            regressions.append(f"{name}: unexpected open ports {old['unexpected']} -> {new['unexpected']}")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_table(report):
+    print(f"\n{'CASE':<22} {'PORTS/S':>10} {'FIRST':>8} {'TIME':>8} {'RSS MB':>8} {'RECALL':>7} {'IDENT':>6}")
+    print("-" * 75)
+    for case in report['cases']:
+        median = case['median']
+        if not median:
+            print(f"{case['name']:<22} {'failed: ' + case['runs'][-1].get('error', '?')}")
+            continue
+        first = f"{median['time_to_first_result']:.3f}s" if median['time_to_first_result'] is not None else "-"
+        rss = f"{median['peak_rss_mb']:.1f}" if median['peak_rss_mb'] is not None else "-"
+        print(f"{case['name']:<22} {median['ports_per_sec'] or 0:>10,.0f} {first:>8} {median['seconds']:>7.2f}s "
+              f"{rss:>8} {median['recall']:>7.2%} {median['services_identified']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Loopback benchmark for the O'Azis and MILKO scan engines",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python3 scan_benchmark.py
+  python3 scan_benchmark.py --hosts 32 --ports 1-65535 --engines async,multiprocess --repeat 3
+  python3 scan_benchmark.py --output after.json --compare before.json
+        """
+    )
+    parser.add_argument('--scanners', default='oazis,milko', help='Scanners to run (default: oazis,milko)')
+    parser.add_argument('--engines', default='threaded,async,multiprocess',
+                        help='Engines to run; multiprocess is O\'Azis only, syn needs root '
+                             '(default: threaded,async,multiprocess)')
+    parser.add_argument('--hosts', type=int, default=DEFAULT_HOSTS, help=f'Fleet hosts (default: {DEFAULT_HOSTS})')
+    parser.add_argument('--base', default=DEFAULT_BASE_ADDRESS,
+                        help=f'First fleet address in 127.0.0.0/8 (default: {DEFAULT_BASE_ADDRESS})')
+    parser.add_argument('--ports', default=DEFAULT_PORTS, help=f'Ports to scan on every host (default: {DEFAULT_PORTS})')
+    parser.add_argument('--fleet', metavar='FILE',
+                        help='JSON file with "services" and "filtered" lists replacing the built-in fleet')
+    parser.add_argument('--threads', type=int, default=DEFAULT_THREADS,
+                        help=f'Threads for the threaded engine (default: {DEFAULT_THREADS})')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_ASYNC_CONCURRENCY,
+                        help=f'In-flight connects for the async engines (default: {DEFAULT_ASYNC_CONCURRENCY})')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Processes for the multiprocess engine (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help=f'Connect timeout; filtered ports cost this much (default: {DEFAULT_TIMEOUT})')
+    parser.add_argument('--port-order', choices=('likely', 'numeric'), default='likely',
+                        help='Port order of the scanners under test (default: likely)')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per case; the report keeps every run and the median')
+    parser.add_argument('--output', metavar='FILE', help='Report path (default: scan_benchmark_<timestamp>.json)')
+    parser.add_argument('--compare', metavar='FILE', help='Earlier report; exit with status 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'Relative slack before a change counts as a regression (default: {DEFAULT_TOLERANCE})')
+    args = parser.parse_args()
+
+    try:
+        ports = PortSet.parse(args.ports, {'all': ALL_PORTS})
+        addresses = fleet_addresses(args.base, args.hosts)
+    except ValueError as e:
+        parser.error(str(e))
+    fleet_config = dict(DEFAULT_FLEET)
+    if args.fleet:
+        with open(args.fleet) as f:
+            fleet_config.update(json.load(f))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    scanners = [name.strip() for name in args.scanners.split(',')]
+    engines = [name.strip() for name in args.engines.split(',')]
+    cases = [(scanner, engine) for scanner, engine in CASES if scanner in scanners and engine in engines]
+    if not cases:
+        parser.error("No scanner/engine combination selected")
+
+    # Listeners bound to 0.0.0.0 answer on every fleet address; keep them out of the scores
+    foreign = listening_ports(addresses[0], ports)
+    fleet_ports = {service['port'] for service in fleet_config['services']} | set(fleet_config['filtered'])
+    clashes = sorted(fleet_ports & set(foreign))
+    if clashes:
+        print(f"Error: fleet ports already in use on {addresses[0]}: {clashes}")
+        sys.exit(1)
+    if foreign:
+        print(f"Ignoring ports already open on this machine: {foreign}")
+    services = [service for service in fleet_config['services'] if service['port'] in ports]
+    filtered = [port for port in fleet_config['filtered'] if port in ports]
+    options = {'threads': args.threads, 'concurrency': args.concurrency, 'workers': args.workers,
+               'timeout': args.timeout, 'port_order': args.port_order}
+
+    report = {
+        'format': FORMAT_VERSION,
+        'timestamp': datetime.now().isoformat(),
+        'revision': git_revision(),
+        'system': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'fleet': {'addresses': len(addresses), 'first': addresses[0], 'ports': ports.to_spec(),
+                  'services': services, 'filtered': filtered, 'ignored_ports': foreign},
+        'options': options,
+        'cases': []
+    }
+    fleet = LoopbackFleet(addresses, services, filtered)
+    expected = fleet.expected()
+    print(f"Fleet: {len(addresses)} hosts from {addresses[0]}, {len(services)} open and {len(filtered)} filtered "
+          f"ports each; scanning {len(ports):,} ports per host")
+    try:
+        fleet.start()
+    except OSError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    try:
+        for scanner, engine in cases:
+            name = f"{scanner}/{engine}"
+            runs = []
+            for attempt in range(args.repeat):
+                print(f"  {name} run {attempt + 1}/{args.repeat}...", flush=True)
+                run = run_isolated(scanner, engine, addresses, ports, options)
+                runs.append(score(run, expected, set(foreign)) if 'error' not in run else run)
+            report['cases'].append({'name': name, 'scanner': scanner, 'engine': engine,
+                                    'runs': runs, 'median': median_of(runs)})
+    finally:
+        fleet.stop()
+
+    print_table(report)
+    regressions = compare(report, baseline, args.tolerance) if baseline else []
+    if baseline:
+        report['compared_with'] = {'revision': baseline.get('revision'), 'timestamp': baseline.get('timestamp'),
+                                   'regressions': regressions}
+    output = args.output or f"scan_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {output}")
+    if baseline:
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print(f"No regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
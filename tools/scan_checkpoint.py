@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Scan Checkpoint
+Periodically records which (target, port-range) blocks of a scan are finished
+and what was found, so an interrupted scan can resume where it stopped.
+For authorized security testing only.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+from port_set import PortSet
+
+CHECKPOINT_DIR = os.path.expanduser("~/.payner_checkpoints/")
+CHUNK_SIZE = 1024          # Ports per checkpointed block (port // CHUNK_SIZE)
+SAVE_INTERVAL = 10.0       # Seconds between periodic saves
+FORMAT_VERSION = 1
+
+
+def scan_key(targets, ports, protocol='tcp'):
+    """Stable identifier for a scan's work definition"""
+    digest = hashlib.sha1()
+    digest.update(json.dumps(sorted(targets)).encode())
+    digest.update(PortSet.from_ports(ports).to_spec().encode())
+    if protocol != 'tcp':  # TCP keys predate the protocol and stay unchanged
+        digest.update(protocol.encode())
+    return digest.hexdigest()
+
+
+def to_ranges(numbers):
+    """[1, 2, 3, 7] -> [[1, 3], [7, 7]]"""
+    ranges = []
+    for n in sorted(numbers):
+        if ranges and n == ranges[-1][1] + 1:
+            ranges[-1][1] = n
+        else:
+            ranges.append([n, n])
+    return ranges
+
+
+def from_ranges(ranges):
+    return {n for start, end in ranges for n in range(start, end + 1)}
+
+
+class ScanCheckpoint:
+    """Completed blocks and findings of one scan, saved atomically to disk.
+
+    Work is tracked per (target, port // CHUNK_SIZE) block: a block is
+    complete once every port of it has been probed. Open ports are recorded at
+    discovery time and their result records once the banner stage reports
+    them, so resuming can replay findings and re-queue unfinished banners.
+    `targets` identifies the scan (target spec entries or addresses), together
+    with the ports and `protocol`; per-host state is only created once a host
+    is probed, so streamed target lists are never materialized here.
+
+    Periodic saves run on a saver thread started by the first finished probe,
+    so scan workers and the async engine's event loop never wait on the
+    serialization and the disk.
+    """
+
+    def __init__(self, targets, ports, directory=CHECKPOINT_DIR, save_interval=SAVE_INTERVAL, protocol='tcp'):
+        self.key = scan_key(targets, ports, protocol)
+        self.path = os.path.join(directory, f"oazis_{self.key[:16]}.json")
+        self.save_interval = save_interval
+        self.completed = {}
+        self.open_ports = set()
+        self.findings = {}
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.closed = False
+        self.dirty = False
+        self.stopped = threading.Event()
+        self.saver = None
+
+        self.block_remaining = PortSet.from_ports(ports).blocks(CHUNK_SIZE)
+        self.remaining = {}
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        """Load progress saved by an earlier run of the same scan; returns False if unusable"""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get('format') != FORMAT_VERSION or data.get('key') != self.key:
+            return False
+        with self.lock:
+            for target, ranges in data['completed'].items():
+                self.completed[target] = from_ranges(ranges)
+                blocks = {block: count for block, count in self.block_remaining.items()
+                          if block not in self.completed[target]}
+                if blocks:
+                    self.remaining[target] = blocks
+            self.open_ports = {tuple(pair) for pair in data['open_ports']}
+            self.findings = {(r['target'], r['port']): r for r in data['findings']}
+        return True
+
+    def is_pending(self, target, port):
+        """Whether (target, port) still needs probing"""
+        return port // CHUNK_SIZE not in self.completed.get(target, ())
+
+    def pending_ports(self, target, blocks=None):
+        """How many ports of `target` pass is_pending, from block sizes alone.
+
+        `blocks` ({block: port count}) narrows this to a subset of the
+        checkpoint's ports, such as a single phase.
+        """
+        if blocks is None:
+            blocks = self.block_remaining
+        completed = self.completed.get(target)
+        if not completed:
+            return sum(blocks.values())
+        return sum(count for block, count in blocks.items() if block not in completed)
+
+    def pending_count(self, target_count):
+        """Probes left for a scan of `target_count` hosts"""
+        with self.lock:
+            started = len(self.completed.keys() | self.remaining.keys())
+            left = sum(sum(blocks.values()) for blocks in self.remaining.values())
+        return left + max(0, target_count - started) * sum(self.block_remaining.values())
+
+    def probe_done(self, target, port, count=1):
+        """Record `count` finished probes in the block holding `port`"""
+        block = port // CHUNK_SIZE
+        with self.lock:
+            completed = self.completed.get(target)
+            if completed is not None and block in completed:
+                return
+            blocks = self.remaining.get(target)
+            if blocks is None:
+                blocks = self.remaining[target] = dict(self.block_remaining)
+            if block not in blocks:
+                return
+            blocks[block] -= count
+            if blocks[block] <= 0:
+                del blocks[block]
+                self.completed.setdefault(target, set()).add(block)
+                self.dirty = True
+                if not blocks:
+                    del self.remaining[target]
+            if self.saver is None and not self.stopped.is_set():
+                self.saver = threading.Thread(target=self._save_periodically, daemon=True)
+                self.saver.start()
+
+    def ports_done(self, target, ports):
+        """Bulk probe_done for a finished shard"""
+        per_block = {}
+        for port in ports:
+            block = port // CHUNK_SIZE
+            per_block[block] = per_block.get(block, 0) + 1
+        for block, count in per_block.items():
+            self.probe_done(target, block * CHUNK_SIZE, count)
+
+    def port_open(self, target, port):
+        """Record an open port; returns False if it was already known (e.g. re-probed after resume)"""
+        with self.lock:
+            if (target, port) in self.open_ports:
+                return False
+            self.open_ports.add((target, port))
+            self.dirty = True
+            return True
+
+    def add_finding(self, scan_result):
+        with self.lock:
+            self.findings[(scan_result['target'], scan_result['port'])] = scan_result
+            self.dirty = True
+
+    def unfinished_banners(self):
+        """Open ports discovered before the interruption that never got a result record"""
+        with self.lock:
+            return sorted(pair for pair in self.open_ports if pair not in self.findings)
+
+    def save(self):
+        """Write the checkpoint atomically (temp file + rename)"""
+        with self.save_lock:
+            if not self.closed:
+                self._write()
+
+    def close(self):
+        """Final save for an interrupted scan; probes still finishing afterwards are ignored"""
+        self._stop_saver()
+        with self.save_lock:
+            if not self.closed:
+                self._write()
+                self.closed = True
+
+    def discard(self):
+        """Remove the checkpoint once the scan has finished"""
+        self._stop_saver()
+        with self.save_lock:
+            self.closed = True
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def _save_periodically(self):
+        while not self.stopped.wait(self.save_interval):
+            if self.dirty:
+                self.save()
+
+    def _stop_saver(self):
+        self.stopped.set()
+        with self.lock:
+            saver, self.saver = self.saver, None
+        if saver is not None:
+            saver.join()
+
+    def _write(self):
+        with self.lock:
+            data = {
+                'format': FORMAT_VERSION,
+                'key': self.key,
+                'saved': datetime.now().isoformat(),
+                'completed': {target: to_ranges(blocks) for target, blocks in self.completed.items() if blocks},
+                'open_ports': sorted(self.open_ports),
+                'findings': list(self.findings.values())
+            }
+            self.dirty = False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(temp_path, self.path)
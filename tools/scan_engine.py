@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+"""
+Scan Engines
+Shared TCP connect-scan engines for the O'Azis and MILKO port scanners.
+For authorized security testing only.
+"""
+
+import asyncio
+import errno
+import math
+import os
+import socket
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ENGINES = ('threaded', 'async')
+DEFAULT_ASYNC_CONCURRENCY = 2000
+DEFAULT_PER_HOST_LIMIT = 500
+DEFAULT_ACTIVE_HOSTS = 1024
+DEFAULT_MIN_TIMEOUT = 0.05
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Shards per worker process, so results stream back while other shards still run
+SHARDS_PER_WORKER = 4
+# Hosts per shard at most, so huge target lists stream through the workers
+MAX_SHARD_TARGETS = 256
+
+# connect_ex() results meaning "handshake still in progress" (10035 is WSAEWOULDBLOCK)
+CONNECT_PENDING = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, 10035}
+
+# connect_ex() results that still prove the host answered (10061 is WSAECONNREFUSED)
+CONNECT_ANSWERED = {0, errno.ECONNREFUSED, 10061}
+
+# connect_ex() results of a handshake that never completed in time; blocking
+# sockets with a timeout report EWOULDBLOCK (10060 is WSAETIMEDOUT)
+CONNECT_TIMED_OUT = {errno.EAGAIN, errno.EWOULDBLOCK, errno.ETIMEDOUT, 10060}
+
+# File descriptors kept free for stdout, log files and the event loop itself
+FD_HEADROOM = 64
+
+
+def raise_fd_limit(wanted):
+    """Raise the soft open-file limit towards `wanted` and return the usable concurrency"""
+    if resource is None:
+        return wanted
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        target = wanted + FD_HEADROOM
+        if soft != resource.RLIM_INFINITY and soft < target:
+            new_soft = target if hard == resource.RLIM_INFINITY else min(target, hard)
+            resource.setrlimit(resource.RLIMIT_NOFILE, (new_soft, hard))
+            soft = new_soft
+        if soft == resource.RLIM_INFINITY:
+            return wanted
+        return max(1, min(wanted, soft - FD_HEADROOM))
+    except (ValueError, OSError):
+        return wanted
+
+
+def connect_outcome(result):
+    """Classify a connect result for metrics: open, refused, timeout or error (None is a timeout)"""
+    if result == 0:
+        return 'open'
+    if result in CONNECT_ANSWERED:
+        return 'refused'
+    if result is None or result in CONNECT_TIMED_OUT:
+        return 'timeout'
+    return 'error'
+
+
+def socket_family(address):
+    """Address family for a numeric IPv4 or IPv6 target"""
+    return socket.AF_INET6 if ':' in address else socket.AF_INET
+
+
+class HostTimeouts:
+    """Per-host connect timeouts derived from measured round-trip times.
+
+    Each completed handshake or RST is an RTT sample. Samples are smoothed the
+    way TCP computes its retransmission timeout (RFC 6298): SRTT and RTTVAR with
+    gains of 1/8 and 1/4, timeout = SRTT + 4 * RTTVAR, clamped to
+    [floor, ceiling]. Hosts without samples yet use the configured timeout,
+    which is also the ceiling, so adaptation can only make a scan faster.
+    Blocking connects made through connect() are timed into `metrics`.
+    """
+
+    ALPHA = 0.125
+    BETA = 0.25
+    K = 4
+
+    def __init__(self, initial, floor=DEFAULT_MIN_TIMEOUT, ceiling=None, adaptive=True, metrics=None):
+        self.initial = initial
+        self.metrics = metrics
+        self.ceiling = initial if ceiling is None else ceiling
+        self.floor = min(floor, self.ceiling)
+        self.adaptive = adaptive
+        self.timeouts = {}
+        self.estimates = {}
+        self.lock = threading.Lock()
+
+    def get(self, target):
+        """Current connect timeout for `target`"""
+        return self.timeouts.get(target, self.initial)
+
+    def observe(self, target, rtt):
+        """Feed one RTT sample (seconds) for `target`"""
+        if not self.adaptive:
+            return
+        with self.lock:
+            estimate = self.estimates.get(target)
+            if estimate is None:
+                srtt, rttvar = rtt, rtt / 2
+            else:
+                srtt, rttvar = estimate
+                rttvar = (1 - self.BETA) * rttvar + self.BETA * abs(srtt - rtt)
+                srtt = (1 - self.ALPHA) * srtt + self.ALPHA * rtt
+            self.estimates[target] = (srtt, rttvar)
+            self.timeouts[target] = min(self.ceiling, max(self.floor, srtt + self.K * rttvar))
+
+    def connect(self, sock, target, port):
+        """Blocking connect_ex() under the host's timeout, feeding the RTT back in"""
+        sock.settimeout(self.get(target))
+        started = time.monotonic()
+        result = sock.connect_ex((target, port))
+        elapsed = time.monotonic() - started
+        if result in CONNECT_ANSWERED:
+            self.observe(target, elapsed)
+        if self.metrics:
+            self.metrics.connect(connect_outcome(result), elapsed)
+        return result
+
+
+def filter_ports(ports, target, port_filter):
+    """Lazily yield the ports of `target` that pass `port_filter`"""
+    for port in ports:
+        if port_filter(target, port):
+            yield port
+
+
+class HostScheduler:
+    """Dispense (target, port) work round-robin across all hosts.
+
+    Every host keeps its own lazy port iterator and an in-flight counter, so a
+    host full of filtered ports can only hold `per_host_limit` workers while the
+    rest of the global budget keeps moving on the other hosts. Workers call
+    acquire() for the next job and release() once the probe is finished.
+    `port_filter(target, port)` drops work up front (e.g. when resuming);
+    `port_count(target)` should then give how many ports pass it, so that
+    activating a host does not run the filter over every port under the
+    lock. Hosts with nothing left to probe are reported to on_host_done
+    right away. `on_probe_done(target, port)` sees every finished probe.
+    With `metrics`, the time each acquire() spends waiting for a job is
+    recorded.
+
+    `targets` may be any iterable, including a generator: hosts are pulled
+    from it only as earlier ones finish, keeping at most `max_active_hosts`
+    in the rotation, so a /16 is never held in memory at once.
+    """
+
+    def __init__(self, targets, ports, per_host_limit=DEFAULT_PER_HOST_LIMIT, on_host_done=None,
+                 port_filter=None, on_probe_done=None, max_active_hosts=DEFAULT_ACTIVE_HOSTS, target_count=None,
+                 metrics=None, port_count=None):
+        self.per_host_limit = max(1, per_host_limit)
+        self.metrics = metrics
+        self.on_host_done = on_host_done
+        self.on_probe_done = on_probe_done
+        self.port_filter = port_filter
+        self.port_count = port_count
+        self.ports = ports
+        self.max_active_hosts = max(1, max_active_hosts)
+        if target_count is None and hasattr(targets, '__len__'):
+            target_count = len(targets)
+        self.target_count = target_count
+        self.targets = iter(targets)
+        self.started = 0
+        self.exhausted = False
+        self.remaining = {}
+        self.in_flight = {}
+        self.pending = deque()
+        self.skipped = []  # Hosts found to have nothing left to probe, not yet reported
+        self.condition = threading.Condition()
+        self._activate()
+        self._report_skipped()
+
+    def _activate(self):
+        """Pull hosts from the target iterator until the active window is full"""
+        while len(self.remaining) < self.max_active_hosts and not self.exhausted:
+            target = next(self.targets, None)
+            if target is None:
+                self.exhausted = True
+                break
+            self.started += 1
+            if target in self.remaining:
+                continue  # Listed twice and still being scanned
+            if self.port_filter is None:
+                count, ports = len(self.ports), iter(self.ports)
+            else:
+                if self.port_count is not None:
+                    count = self.port_count(target)
+                else:
+                    count = sum(1 for p in self.ports if self.port_filter(target, p))
+                ports = filter_ports(self.ports, target, self.port_filter)
+            if count:
+                self.remaining[target] = count
+                self.in_flight[target] = 0
+                self.pending.append((target, ports))
+            else:
+                self.skipped.append(target)
+
+    def _report_skipped(self):
+        """on_host_done for skipped hosts; called without holding the lock"""
+        if not self.skipped:
+            return
+        with self.condition:
+            skipped, self.skipped = self.skipped, []
+        if self.on_host_done:
+            for target in skipped:
+                self.on_host_done(target)
+
+    def _next_job(self):
+        """Return the next job, None if every live host is at its limit, or raise StopIteration"""
+        self._activate()
+        for _ in range(len(self.pending)):
+            target, ports = self.pending[0]
+            if target not in self.in_flight:
+                self.pending.popleft()  # Every port handed out and already finished
+                continue
+            if self.in_flight[target] >= self.per_host_limit:
+                self.pending.rotate(-1)
+                continue
+            port = next(ports, None)
+            if port is None:
+                self.pending.popleft()
+                continue
+            self.pending.rotate(-1)
+            self.in_flight[target] += 1
+            return target, port
+        if not self.pending and self.exhausted:
+            raise StopIteration
+        return None
+
+    def try_acquire(self):
+        """Non-blocking acquire for the async engine"""
+        try:
+            with self.condition:
+                return self._next_job()
+        finally:
+            self._report_skipped()
+
+    def acquire(self):
+        """Blocking acquire for worker threads; returns None once all work is handed out"""
+        started = time.monotonic() if self.metrics else None
+        with self.condition:
+            while True:
+                try:
+                    job = self._next_job()
+                except StopIteration:
+                    job = None
+                    break
+                if job is not None:
+                    break
+                self.condition.wait()
+        self._report_skipped()
+        if job is None:
+            return None
+        if self.metrics:
+            self.metrics.observe('queue_wait_seconds', time.monotonic() - started, stage='dispatch')
+        return job
+
+    def release(self, target, port):
+        """Mark the probe of (target, port) as finished; returns how many job slots it freed.
+
+        That is one slot on the host, or when it finished the host, the
+        per-host limit of every host brought into the rotation in its place.
+        """
+        if self.on_probe_done:
+            self.on_probe_done(target, port)
+        with self.condition:
+            self.in_flight[target] -= 1
+            self.remaining[target] -= 1
+            host_done = self.remaining[target] == 0
+            freed = 1
+            if host_done:
+                del self.remaining[target], self.in_flight[target]
+                active = len(self.remaining)
+                self._activate()
+                freed = (len(self.remaining) - active) * self.per_host_limit
+            self.condition.notify_all()
+        if host_done and self.on_host_done:
+            self.on_host_done(target)
+        self._report_skipped()
+        return freed
+
+    def __len__(self):
+        """Probes left; estimated from `target_count` for hosts not yet pulled"""
+        unstarted = 0
+        if not self.exhausted:
+            unstarted = max(0, (self.target_count or 0) - self.started) * len(self.ports)
+        return sum(self.remaining.values()) + unstarted
+
+
+def wake(waiters, count):
+    """Resolve up to `count` of the futures idle async workers are sleeping on"""
+    while count > 0 and waiters:
+        waiter = waiters.popleft()
+        if not waiter.done():
+            waiter.set_result(None)
+            count -= 1
+
+
+class AsyncConnectEngine:
+    """Non-blocking TCP connect scanner running on a single asyncio event loop.
+
+    A fixed pool of coroutines pulls (target, port) jobs from a shared iterator,
+    so thousands of connects can be in flight without one OS thread each and
+    without materializing a task per port. Sockets are driven directly through
+    the loop rather than through streams to keep the per-probe cost low.
+    With `metrics`, connect times and the waits for a job are recorded.
+    """
+
+    def __init__(self, on_open, timeout=1.0, concurrency=DEFAULT_ASYNC_CONCURRENCY, timeouts=None, governor=None,
+                 on_probe_done=None, metrics=None):
+        self.on_open = on_open
+        self.metrics = metrics
+        self.on_probe_done = on_probe_done
+        self.timeout = timeout
+        self.timeouts = timeouts or HostTimeouts(timeout, adaptive=False)
+        self.governor = governor if governor and governor.enabled else None
+        self.concurrency = raise_fd_limit(concurrency)
+        self.probes_sent = 0
+
+    async def probe(self, target, port):
+        """Attempt one connect; report the port through on_open(target, port) if it accepts"""
+        if self.governor:
+            await self.governor.wait_async(target)
+        self.probes_sent += 1
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket_family(target), socket.SOCK_STREAM)
+        sock.setblocking(False)
+        started = time.monotonic()
+        try:
+            err = await self._connect(loop, sock, (target, port))
+        finally:
+            sock.close()
+        if self.metrics:
+            self.metrics.connect(connect_outcome(err), time.monotonic() - started)
+        if err == 0:
+            self.on_open(target, port)
+
+    async def _connect(self, loop, sock, address):
+        """Non-blocking connect; returns the socket error code, or None on timeout.
+
+        Refused and unreachable ports usually fail inside connect_ex() itself, so
+        only handshakes still in progress pay for a writer callback and a timer.
+        """
+        target = address[0]
+        started = time.monotonic()
+        try:
+            err = sock.connect_ex(address)
+        except OSError as e:
+            return e.errno or -1
+        if err not in CONNECT_PENDING:
+            if err in CONNECT_ANSWERED:
+                self.timeouts.observe(target, time.monotonic() - started)
+            return err
+
+        ready = loop.create_future()
+
+        def finish(result):
+            if not ready.done():
+                ready.set_result(result)
+
+        fd = sock.fileno()
+        loop.add_writer(fd, finish, True)
+        timer = loop.call_later(self.timeouts.get(target), finish, False)
+        try:
+            connected = await ready
+        finally:
+            loop.remove_writer(fd)
+            timer.cancel()
+        if not connected:
+            return None
+        err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err in CONNECT_ANSWERED:
+            self.timeouts.observe(target, time.monotonic() - started)
+        return err
+
+    async def _worker(self, jobs):
+        while True:
+            started = time.monotonic() if self.metrics else None
+            job = next(jobs, None)
+            if job is None:
+                return
+            if self.metrics:
+                self.metrics.observe('queue_wait_seconds', time.monotonic() - started, stage='dispatch')
+            target, port = job
+            try:
+                await self.probe(target, port)
+            finally:
+                if self.on_probe_done:
+                    self.on_probe_done(target, port)
+
+    async def _scheduled_worker(self, scheduler, waiters):
+        loop = asyncio.get_running_loop()
+        waiting_since = None
+        while True:
+            try:
+                job = scheduler.try_acquire()
+            except StopIteration:
+                # Nothing left to hand out: let idle workers exit too
+                wake(waiters, len(waiters))
+                return
+            if job is None:
+                # Every live host is at its in-flight limit; sleep until a probe finishes
+                if self.metrics and waiting_since is None:
+                    waiting_since = time.monotonic()
+                waiter = loop.create_future()
+                waiters.append(waiter)
+                await waiter
+                continue
+            if self.metrics:
+                waited = time.monotonic() - waiting_since if waiting_since is not None else 0.0
+                self.metrics.observe('queue_wait_seconds', waited, stage='dispatch')
+                waiting_since = None
+            target, port = job
+            try:
+                await self.probe(target, port)
+            finally:
+                # Wake as many sleeping workers as there are newly free slots
+                wake(waiters, scheduler.release(target, port))
+
+    async def run_async(self, jobs):
+        """Scan every (target, port) pair yielded by `jobs` or handed out by a HostScheduler"""
+        if isinstance(jobs, HostScheduler):
+            waiters = deque()
+            workers = [asyncio.ensure_future(self._scheduled_worker(jobs, waiters))
+                       for _ in range(self.concurrency)]
+        else:
+            jobs = iter(jobs)
+            workers = [asyncio.ensure_future(self._worker(jobs)) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+    def run(self, jobs):
+        """Blocking entry point for the thread-based tools"""
+        asyncio.run(self.run_async(jobs))
+
+
+def shard_work(targets, ports, shard_count, target_count=None):
+    """Split the target x port space into (targets, ports, parts) shards, lazily.
+
+    Large target lists are split by host into groups of at most
+    MAX_SHARD_TARGETS, so each shard keeps whole hosts and a generator of
+    targets is consumed only as shards are handed out; short lists are split
+    by port range so a single host still spreads over roughly `shard_count`
+    shards. `parts` is the number of shards each of the shard's hosts is
+    split over.
+    """
+    shard_count = max(1, shard_count)
+    if target_count is None:
+        targets = list(targets)
+        target_count = len(targets)
+    target_groups = max(1, min(target_count, shard_count))
+    port_chunks = max(1, min(len(ports), math.ceil(shard_count / target_groups)))
+
+    targets_per_group = max(1, min(MAX_SHARD_TARGETS, math.ceil(target_count / target_groups)))
+    ports_per_chunk = math.ceil(len(ports) / port_chunks)
+    targets = iter(targets)
+    while True:
+        group = list(islice(targets, targets_per_group))
+        if not group:
+            return
+        for p in range(0, len(ports), ports_per_chunk):
+            yield group, ports[p:p + ports_per_chunk], port_chunks
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Scan History
+Embedded SQLite store for O'Azis scan results. Every scan and its findings are
+recorded with indexes on target, port, service and scan time, so questions
+like "which hosts had 6379 open last week" or "what changed since the last
+scan" are answered without loading old result files.
+For authorized security testing only.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from port_set import PortSet
+from target_spec import TargetSpec, parse_address_block
+
+HISTORY_DB = os.path.expanduser("~/.payner_reports/oazis_history.db")
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 2.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started REAL NOT NULL,
+    finished REAL,
+    scanner TEXT,
+    targets TEXT NOT NULL,
+    ports TEXT NOT NULL,
+    protocol TEXT NOT NULL DEFAULT 'tcp',
+    completed INTEGER NOT NULL DEFAULT 0,
+    total_scans INTEGER,
+    open_count INTEGER NOT NULL DEFAULT 0,
+    configuration TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    scan_id INTEGER NOT NULL REFERENCES scans(id) ON DELETE CASCADE,
+    target TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    protocol TEXT NOT NULL DEFAULT 'tcp',
+    service TEXT,
+    product TEXT,
+    version TEXT,
+    banner TEXT,
+    seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scans_started ON scans(started);
+CREATE INDEX IF NOT EXISTS idx_results_scan ON results(scan_id, target, port);
+CREATE INDEX IF NOT EXISTS idx_results_target ON results(target, seen);
+CREATE INDEX IF NOT EXISTS idx_results_port ON results(port, seen);
+CREATE INDEX IF NOT EXISTS idx_results_service ON results(service, seen);
+"""
+
+RESULT_FIELDS = ('target', 'port', 'protocol', 'service', 'product', 'version', 'banner')
+# Columns named, since databases migrated from before UDP scanning have `protocol` last
+INSERT_RESULT = (f"INSERT INTO results (scan_id, {', '.join(RESULT_FIELDS)}, seen) "
+                 f"VALUES ({', '.join('?' * (len(RESULT_FIELDS) + 2))})")
+
+
+def target_coverage(entries):
+    """(spec of the address entries, set of name/file entries) for a stored target list"""
+    addresses, names = [], set()
+    for entry in entries:
+        try:
+            if parse_address_block(entry.lstrip('!')) is not None:
+                addresses.append(entry)
+                continue
+        except ValueError:
+            continue
+        if not entry.startswith('!'):
+            names.add(entry)
+    return TargetSpec(addresses), names
+
+
+def to_epoch(timestamp):
+    """ISO timestamp (as stored in result records) or epoch -> epoch seconds"""
+    if timestamp is None:
+        return time.time()
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    return datetime.fromisoformat(timestamp).timestamp()
+
+
+class ScanHistory:
+    """SQLite-backed history of scans and their open ports.
+
+    Results are buffered and written with executemany() once `batch_size`
+    are pending or `flush_interval` seconds have passed, so recording stays
+    off the scan's hot path. The connection is shared between threads and
+    guarded by a lock.
+    """
+
+    def __init__(self, path=HISTORY_DB, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(SCHEMA)
+        columns = {row['name'] for row in self.db.execute("PRAGMA table_info(scans)")}
+        if 'protocol' not in columns:  # Databases created before UDP scanning
+            self.db.execute("ALTER TABLE scans ADD COLUMN protocol TEXT NOT NULL DEFAULT 'tcp'")
+            self.db.commit()
+        columns = {row['name'] for row in self.db.execute("PRAGMA table_info(results)")}
+        if 'protocol' not in columns:  # Results take the protocol of their scan
+            self.db.execute("ALTER TABLE results ADD COLUMN protocol TEXT NOT NULL DEFAULT 'tcp'")
+            self.db.execute("UPDATE results SET protocol = "
+                            "(SELECT protocol FROM scans WHERE scans.id = results.scan_id)")
+            self.db.commit()
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.lock = threading.RLock()
+        self.stopped = threading.Event()
+        self.flusher = None
+
+    # -- recording -----------------------------------------------------
+
+    def begin_scan(self, targets, ports, scanner="O'Azis", configuration=None, started=None, protocol='tcp'):
+        """Register a new scan and return its id"""
+        with self.lock:
+            cursor = self.db.execute(
+                "INSERT INTO scans (started, scanner, targets, ports, protocol, configuration) VALUES (?, ?, ?, ?, ?, ?)",
+                (started or time.time(), scanner, json.dumps(list(targets)),
+                 PortSet.from_ports(ports).to_spec(), protocol, json.dumps(configuration, default=str))
+            )
+            self.db.commit()
+        if self.flusher is None:
+            self.stopped.clear()
+            self.flusher = threading.Thread(target=self._flush_periodically)
+            self.flusher.daemon = True
+            self.flusher.start()
+        return cursor.lastrowid
+
+    def add_result(self, scan_id, scan_result):
+        """Queue one result record for the scan; flushes when the batch is full"""
+        values = {field: scan_result.get(field) for field in RESULT_FIELDS}
+        values['protocol'] = values['protocol'] or 'tcp'  # Records from before UDP scanning
+        row = (scan_id,) + tuple(values.values()) + (to_epoch(scan_result.get('timestamp')),)
+        with self.lock:
+            self.pending.append(row)
+            if len(self.pending) >= self.batch_size:
+                self._flush_locked()
+
+    def finish_scan(self, scan_id, completed, total_scans=None):
+        """Flush pending results and close the scan's record"""
+        self.stopped.set()
+        if self.flusher:
+            self.flusher.join()
+            self.flusher = None
+        with self.lock:
+            self._flush_locked()
+            self.db.execute(
+                "UPDATE scans SET finished = ?, completed = ?, total_scans = ?, "
+                "open_count = (SELECT COUNT(*) FROM results WHERE scan_id = ?) WHERE id = ?",
+                (time.time(), int(bool(completed)), total_scans, scan_id, scan_id)
+            )
+            self.db.commit()
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self.pending:
+            return
+        self.db.executemany(INSERT_RESULT, self.pending)
+        self.db.commit()
+        self.pending = []
+
+    def _flush_periodically(self):
+        while not self.stopped.wait(self.flush_interval):
+            self.flush()
+
+    def import_json(self, filename):
+        """Load an oazis_scan_<timestamp>.json export; returns the new scan id"""
+        with open(filename) as f:
+            data = json.load(f)
+        # Exports can repeat a port when several scans ran in one session; keep the latest
+        results = list({(r['target'], r['port'], r.get('protocol', 'tcp')): r for r in data.get('results', [])}.values())
+        info = data.get('scan_info', {})
+        started = to_epoch(info.get('timestamp')) if info.get('timestamp') else os.path.getmtime(filename)
+        targets = sorted({r['target'] for r in results})
+        protocol = 'udp' if (data.get('configuration') or {}).get('engine') == 'udp' else 'tcp'
+        scan_id = self.begin_scan(targets, [r['port'] for r in results], scanner=info.get('scanner', "O'Azis"),
+                                  configuration=data.get('configuration'), started=started, protocol=protocol)
+        for scan_result in results:
+            self.add_result(scan_id, scan_result)
+        self.finish_scan(scan_id, completed=True)
+        return scan_id
+
+    def close(self):
+        self.stopped.set()
+        with self.lock:
+            self._flush_locked()
+            self.db.close()
+
+    # -- queries ---------------------------------------------------------
+
+    def recent_scans(self, limit=20):
+        with self.lock:
+            return self.db.execute("SELECT * FROM scans ORDER BY started DESC LIMIT ?", (limit,)).fetchall()
+
+    def get_scan(self, scan_id):
+        with self.lock:
+            return self.db.execute("SELECT * FROM scans WHERE id = ?", (scan_id,)).fetchone()
+
+    def scan_results(self, scan_id):
+        with self.lock:
+            return self.db.execute(
+                "SELECT * FROM results WHERE scan_id = ? ORDER BY target, port, protocol", (scan_id,)
+            ).fetchall()
+
+    def hosts_with_port(self, port, since=None, protocol='tcp'):
+        """Hosts seen with `port`/`protocol` open since `since` (epoch), with the last sighting"""
+        with self.lock:
+            return self.db.execute(
+                "SELECT target, MAX(seen) AS last_seen, COUNT(DISTINCT scan_id) AS scans, service, product, version "
+                "FROM results WHERE port = ? AND protocol = ? AND seen >= ? GROUP BY target ORDER BY last_seen DESC",
+                (port, protocol, since or 0)
+            ).fetchall()
+
+    def search(self, target=None, port=None, service=None, since=None, limit=500, protocol=None):
+        """Results matching every given filter, newest first; `service` matches case-insensitively"""
+        clauses, params = ["seen >= ?"], [since or 0]
+        if protocol:
+            clauses.append("protocol = ?")
+            params.append(protocol)
+        if target:
+            clauses.append("target = ?")
+            params.append(target)
+        if port:
+            clauses.append("port = ?")
+            params.append(port)
+        if service:
+            clauses.append("service = ? COLLATE NOCASE")
+            params.append(service)
+        params.append(limit)
+        with self.lock:
+            return self.db.execute(
+                f"SELECT * FROM results WHERE {' AND '.join(clauses)} ORDER BY seen DESC LIMIT ?", params
+            ).fetchall()
+
+    def latest_scan(self, targets, before=None, protocol='tcp'):
+        """Most recent completed `protocol` scan covering every one of `targets` (addresses or spec entries)"""
+        wanted = set(targets)
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT * FROM scans WHERE completed = 1 AND started < ? AND protocol = ? ORDER BY started DESC",
+                (before or time.time() + 1, protocol)
+            ).fetchall()
+        for row in rows:
+            if wanted <= set(json.loads(row['targets'])):
+                return row
+        return None
+
+    def diff(self, old_scan_id, new_scan_id):
+        """What changed between two scans.
+
+        Returns {'opened': [...], 'closed': [...], 'changed': [(old, new), ...]}.
+        A port only counts as closed if the newer scan actually covered it:
+        its address falls in the newer scan's address entries, or it came
+        from hostnames or target files that the newer scan listed too.
+        """
+        old_scan, new_scan = self.get_scan(old_scan_id), self.get_scan(new_scan_id)
+        if old_scan is None or new_scan is None:
+            raise ValueError("Unknown scan id")
+        old = {(r['target'], r['port'], r['protocol']): r for r in self.scan_results(old_scan_id)}
+        new = {(r['target'], r['port'], r['protocol']): r for r in self.scan_results(new_scan_id)}
+        old_spec, old_names = target_coverage(json.loads(old_scan['targets']))
+        new_spec, new_names = target_coverage(json.loads(new_scan['targets']))
+        new_ports = PortSet.parse(new_scan['ports']) if new_scan['ports'] else PortSet()
+
+        changes = {'opened': [], 'closed': [], 'changed': []}
+        for key, row in sorted(new.items()):
+            if key not in old:
+                changes['opened'].append(row)
+            elif any(old[key][field] != row[field] for field in ('service', 'product', 'version', 'banner')):
+                changes['changed'].append((old[key], row))
+        for key, row in sorted(old.items()):
+            target, port, protocol = key
+            covered = new_spec.contains(target) or (
+                not old_spec.contains(target) and old_names and old_names <= new_names)
+            if key not in new and covered and protocol == new_scan['protocol'] and port in new_ports:
+                changes['closed'].append(row)
+        return changes
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Scan Metrics
+Counters and latency histograms for the O'Azis and MILKO scan engines -
+connect time by outcome, banner-grab time, queue waits and DNS time - with
+periodic and end-of-run export as JSON and Prometheus text format, so a slow
+scan can be traced to timeouts, starved workers or the network.
+For authorized security testing only.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime
+
+from histogram import LatencyHistogram, format_seconds
+
+DEFAULT_EXPORT_INTERVAL = 10.0
+METRIC_PREFIX = 'payner_scan_'
+
+# Short name -> (type, help text); exported as payner_scan_<name>
+METRICS = {
+    'probes_total': ('counter', 'Discovery connect attempts (or UDP probes) by outcome'),
+    'connect_seconds': ('histogram', 'Discovery connect time by outcome (open, refused, timeout, error); for UDP '
+                                     'refused is an ICMP port unreachable and timeout no answer after retransmissions'),
+    'banner_seconds': ('histogram', 'Banner stage reconnect and grab time, by whether a service was identified'),
+    'queue_wait_seconds': ('histogram', 'Time spent waiting: for a job (dispatch), for the rate limiter '
+                                        '(rate_limit) or for a banner worker (banner)'),
+    'dns_seconds': ('histogram', 'Hostname resolution time for cache misses, by outcome'),
+    'dns_cache_hits_total': ('counter', 'Hostname lookups answered from the resolver cache'),
+    'workers': ('gauge', 'Discovery workers: threads or async connect slots'),
+    'elapsed_seconds': ('gauge', 'Seconds since the scan started'),
+    'completed': ('gauge', '1 once the scan has finished, 0 while running or if interrupted'),
+}
+
+
+def label_text(labels):
+    """(('result', 'open'),) -> '{result="open"}'"""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+def series_name(labels):
+    """(('result', 'open'),) -> 'result=open', for JSON keys"""
+    return ','.join(f'{key}={value}' for key, value in labels)
+
+
+def prometheus_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+class ScanMetrics:
+    """Thread-safe metric registry for one scan.
+
+    Series are keyed by metric name plus label pairs, e.g.
+    observe('connect_seconds', 0.002, result='open'). Worker processes keep
+    their own registry and ship snapshot() to the parent, which merge()s it.
+    Every update takes one lock; the work under it is a dictionary lookup
+    and a bisect, which is small next to the syscalls being measured.
+    """
+
+    def __init__(self, scanner):
+        self.scanner = scanner
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.started_at = datetime.now().isoformat()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def set_gauge(self, name, value):
+        with self.lock:
+            self.gauges[(name, ())] = value
+
+    def connect(self, outcome, seconds):
+        """One discovery probe: `outcome` is open, refused, timeout or error"""
+        self.observe('connect_seconds', seconds, result=outcome)
+        self.inc('probes_total', result=outcome)
+
+    def histogram(self, name, **labels):
+        """The histogram of one series, or an empty one"""
+        with self.lock:
+            histogram = self.histograms.get((name, tuple(sorted(labels.items()))))
+            return LatencyHistogram().merge(histogram) if histogram else LatencyHistogram()
+
+    def counter(self, name, **labels):
+        with self.lock:
+            return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def snapshot(self):
+        """Picklable counters and histograms, for merge() in another process"""
+        with self.lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, labels, histogram.snapshot()]
+                               for (name, labels), histogram in self.histograms.items()]
+            }
+
+    def merge(self, snapshot):
+        """Fold in the snapshot() of a registry that ran in a worker process"""
+        if not snapshot:
+            return
+        with self.lock:
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                self.counters[key] = self.counters.get(key, 0) + value
+            for name, labels, data in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = LatencyHistogram()
+                histogram.merge(data)
+
+    def _series(self):
+        """Sorted (name, labels, value) triples of every series, with the elapsed time updated"""
+        with self.lock:
+            self.gauges[('elapsed_seconds', ())] = round(time.monotonic() - self.started, 3)
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted((key, LatencyHistogram().merge(histogram))
+                                for key, histogram in self.histograms.items())
+        return counters, gauges, histograms
+
+    def to_json(self):
+        counters, gauges, histograms = self._series()
+        data = {
+            'scanner': self.scanner,
+            'started': self.started_at,
+            'timestamp': datetime.now().isoformat(),
+            'counters': {},
+            'gauges': {},
+            'histograms': {}
+        }
+        for (name, labels), value in counters:
+            data['counters'].setdefault(name, {})[series_name(labels) or 'total'] = value
+        for (name, labels), value in gauges:
+            data['gauges'][name] = value
+        for (name, labels), histogram in histograms:
+            summary = histogram.summary()
+            summary['buckets'] = {prometheus_number(bound): count for bound, count in histogram.cumulative()}
+            data['histograms'].setdefault(name, {})[series_name(labels) or 'all'] = summary
+        return data
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (e.g. for node_exporter's textfile collector)"""
+        counters, gauges, histograms = self._series()
+        scanner = (('scanner', self.scanner),)
+        lines = []
+        declared = set()
+
+        def declare(name):
+            if name not in declared:
+                declared.add(name)
+                kind, help_text = METRICS[name]
+                lines.append(f"# HELP {METRIC_PREFIX}{name} {help_text}")
+                lines.append(f"# TYPE {METRIC_PREFIX}{name} {kind}")
+
+        for (name, labels), value in counters + gauges:
+            declare(name)
+            lines.append(f"{METRIC_PREFIX}{name}{label_text(scanner + labels)} {prometheus_number(value)}")
+        for (name, labels), histogram in histograms:
+            declare(name)
+            metric = METRIC_PREFIX + name
+            for bound, count in histogram.cumulative():
+                le = (('le', prometheus_number(bound)),)
+                lines.append(f"{metric}_bucket{label_text(scanner + labels + le)} {count}")
+            lines.append(f"{metric}_sum{label_text(scanner + labels)} {prometheus_number(histogram.sum)}")
+            lines.append(f"{metric}_count{label_text(scanner + labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def summary_lines(self):
+        """[(label, text), ...] timing breakdown for the end-of-scan summary"""
+        lines = []
+        outcomes = []
+        for outcome in ('open', 'refused', 'timeout', 'error'):
+            histogram = self.histogram('connect_seconds', result=outcome)
+            if histogram.count:
+                outcomes.append(f"{histogram.count:,} {outcome} (p50 {format_seconds(histogram.percentile(0.5))}, "
+                                f"p99 {format_seconds(histogram.percentile(0.99))})")
+        if outcomes:
+            lines.append(("Connect", " | ".join(outcomes)))
+        banner = LatencyHistogram()
+        for result in ('identified', 'none'):
+            banner.merge(self.histogram('banner_seconds', result=result))
+        if banner.count:
+            lines.append(("Banner Grab", f"{banner.count:,} grabs, p50 {format_seconds(banner.percentile(0.5))}, "
+                                         f"p99 {format_seconds(banner.percentile(0.99))}"))
+        waits = []
+        for stage in ('dispatch', 'rate_limit', 'banner'):
+            histogram = self.histogram('queue_wait_seconds', stage=stage)
+            if histogram.count:
+                waits.append(f"{stage} p50 {format_seconds(histogram.percentile(0.5))}, "
+                             f"p99 {format_seconds(histogram.percentile(0.99))}")
+        if waits:
+            lines.append(("Queue Wait", " | ".join(waits)))
+        dns = LatencyHistogram()
+        for result in ('resolved', 'failed'):
+            dns.merge(self.histogram('dns_seconds', result=result))
+        cache_hits = self.counter('dns_cache_hits_total')
+        if dns.count:
+            lines.append(("DNS", f"{dns.count:,} lookups, p50 {format_seconds(dns.percentile(0.5))}, "
+                                 f"p99 {format_seconds(dns.percentile(0.99))}, {cache_hits:,} cached"))
+        elif cache_hits:
+            lines.append(("DNS", f"{cache_hits:,} cached"))
+        return lines
+
+
+class MetricsExporter:
+    """Writes a ScanMetrics registry to `<prefix>.json` and `<prefix>.prom`.
+
+    Both files are rewritten atomically (temp file + rename) every `interval`
+    seconds while the scan runs and once more by close(), so a scraper or a
+    `watch` never sees a partial file.
+    """
+
+    def __init__(self, metrics, prefix, interval=DEFAULT_EXPORT_INTERVAL):
+        for extension in ('.json', '.prom'):
+            if prefix.endswith(extension):
+                prefix = prefix[:-len(extension)]
+        self.metrics = metrics
+        self.json_path = prefix + '.json'
+        self.prom_path = prefix + '.prom'
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = None
+        directory = os.path.dirname(self.json_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        self.write()  # Fails early on an unwritable path
+        if self.interval and self.interval > 0 and math.isfinite(self.interval):
+            self.thread = threading.Thread(target=self._export_periodically)
+            self.thread.daemon = True
+            self.thread.start()
+        return self
+
+    def close(self, completed=False):
+        """Stop the timer and write the final export"""
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        self.metrics.set_gauge('completed', 1 if completed else 0)
+        self.write()
+
+    def write(self):
+        self._replace(self.json_path, json.dumps(self.metrics.to_json(), indent=2))
+        self._replace(self.prom_path, self.metrics.to_prometheus())
+
+    @staticmethod
+    def _replace(path, text):
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+
+    def _export_periodically(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.write()
+            except OSError:
+                pass  # Retried on the next tick; close() reports a persistent failure
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Scan Progress
+Live progress renderer shared by the O'Azis and MILKO scanners. Workers only
+append events to lock-free queues; one renderer thread prints findings in
+batches and redraws a status line at a fixed rate, so terminal I/O never
+serializes the scan.
+For authorized security testing only.
+"""
+
+import shutil
+import sys
+import threading
+import time
+from collections import deque
+
+DEFAULT_REFRESH_INTERVAL = 0.25   # Seconds between redraws
+RATE_SMOOTHING = 0.3              # Weight of the latest interval in the probe-rate average
+MAX_NAMED_HOSTS = 3               # Active hosts listed by name on the status line
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class ScanProgress:
+    """Status line and batched output for one scan.
+
+    Workers call probe_done(target) per finished probe (or advance(count) for
+    probes finished elsewhere), host_done(target), finding(text) for open
+    ports and message(text) for anything else. These only append to
+    collections.deque objects, whose append/popleft are atomic, and the
+    renderer thread is their single consumer. Every `interval` seconds it
+    writes the pending lines in one call and redraws the status line:
+    % done, probes/sec, ETA, open ports and host states. The status line is
+    only drawn when `live` (default: the stream is a terminal); otherwise
+    just the batched lines are written. Hosts count as done on host_done()
+    when `host_events` is set, otherwise after `ports_per_host` probes.
+    """
+
+    def __init__(self, total=0, ports_per_host=None, host_events=False, interval=DEFAULT_REFRESH_INTERVAL,
+                 stream=None, live=None):
+        self.total = total
+        self.ports_per_host = ports_per_host
+        self.host_events = host_events
+        self.interval = interval
+        self.stream = stream or sys.stdout
+        isatty = getattr(self.stream, 'isatty', None)
+        self.live = (isatty is not None and isatty()) if live is None else live
+        self.probes = deque()
+        self.advanced = deque()
+        self.finished_hosts = deque()
+        self.lines = deque()
+        self.done = 0
+        self.open = 0
+        self.hosts_done = 0
+        self.active = {}
+        self.rate = None
+        self.started = None
+        self.last_render = None
+        self.last_done = 0
+        self.status_shown = False
+        self.stopped = threading.Event()
+        self.thread = None
+
+    # -- producers (any thread) ----------------------------------------
+
+    def probe_done(self, target, port=None):
+        """One probe of `target` finished; usable as a HostScheduler on_probe_done"""
+        self.probes.append(target)
+
+    def advance(self, count):
+        """`count` probes finished without per-probe events (e.g. in a worker process)"""
+        self.advanced.append(count)
+
+    def host_done(self, target):
+        self.finished_hosts.append(target)
+
+    def finding(self, text):
+        """Output line for an open port; counted and printed with the next batch"""
+        self.lines.append((True, text))
+
+    def message(self, text):
+        self.lines.append((False, text))
+
+    # -- renderer ------------------------------------------------------
+
+    def start(self):
+        self.started = self.last_render = time.monotonic()
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def finish(self):
+        """Stop the renderer, write what is pending and clear the status line"""
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        self._render(final=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.finish()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self._render()
+
+    def _drain(self):
+        # A host's probes are queued before its host_done, so taking the count
+        # first guarantees no probe of a finished host is still unread
+        finished = len(self.finished_hosts)
+        probes, active = self.probes, self.active
+        retire_at = None if self.host_events else self.ports_per_host
+        while probes:
+            target = probes.popleft()
+            count = active.get(target, 0) + 1
+            if count == retire_at:
+                del active[target]
+                self.hosts_done += 1
+            else:
+                active[target] = count
+            self.done += 1
+        while self.advanced:
+            self.done += self.advanced.popleft()
+        for _ in range(finished):
+            active.pop(self.finished_hosts.popleft(), None)
+            self.hosts_done += 1
+        lines = []
+        while self.lines:
+            is_finding, text = self.lines.popleft()
+            self.open += is_finding
+            lines.append(text)
+        return lines
+
+    def _render(self, final=False):
+        lines = self._drain()
+        now = time.monotonic()
+        elapsed = now - self.last_render
+        if elapsed > 0 and not final:
+            current = (self.done - self.last_done) / elapsed
+            self.rate = current if self.rate is None else \
+                RATE_SMOOTHING * current + (1 - RATE_SMOOTHING) * self.rate
+            self.last_done, self.last_render = self.done, now
+
+        output = []
+        if self.status_shown:
+            output.append('\r\033[K')
+        if lines:
+            output.append('\n'.join(lines) + '\n')
+        self.status_shown = self.live and not final
+        if self.status_shown:
+            output.append(self.status_line())
+        if output:
+            self.stream.write(''.join(output))
+            self.stream.flush()
+
+    def status_line(self):
+        """'⏳ 42.0% | 1,234/2,938 probes | 812/s | ETA 0:02 | 3 open | hosts: 1 done, 2 active'"""
+        parts = []
+        if self.total:
+            parts.append(f"{min(100.0, 100.0 * self.done / self.total):5.1f}%")
+            parts.append(f"{self.done:,}/{self.total:,} probes")
+        else:
+            parts.append(f"{self.done:,} probes")
+        rate = self.rate or 0.0
+        parts.append(f"{rate:,.0f}/s")
+        if self.total and rate > 0:
+            parts.append(f"ETA {format_duration(max(0, self.total - self.done) / rate)}")
+        parts.append(f"{self.open} open")
+        hosts = f"hosts: {self.hosts_done:,} done, {len(self.active):,} active"
+        if 0 < len(self.active) <= MAX_NAMED_HOSTS and self.ports_per_host:
+            hosts += " (" + ", ".join(f"{target} {100 * count // self.ports_per_host}%"
+                                      for target, count in list(self.active.items())) + ")"
+        parts.append(hosts)
+        line = "⏳ " + " | ".join(parts)
+        width = shutil.get_terminal_size().columns - 2  # The hourglass is two columns wide
+        return line[:width] if width > 0 else line
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Service Probes
+Probe/match database used by the banner stage to identify services and their
+product/version from live responses, in the spirit of nmap's service probes
+but without shelling out to nmap.
+For authorized security testing only.
+"""
+
+import re
+import socket
+from collections import namedtuple
+
+Fingerprint = namedtuple('Fingerprint', ['service', 'product', 'version', 'banner'])
+
+# How long the NULL probe waits for a greeting on ports not known to speak first
+SHORT_NULL_WAIT = 0.5
+
+# Server-first protocols only need the connection itself (the NULL probe)
+NULL_PROBE_PORTS = [21, 22, 23, 25, 110, 143, 220, 465, 587, 2222, 3306, 5900, 5901, 6667]
+
+# (name, payload, ports); probes for a port are tried in this order on one connection
+PROBES = [
+    ('NULL', b'', NULL_PROBE_PORTS),
+    ('GetRequest', b'GET / HTTP/1.0\r\n\r\n',
+     [80, 81, 3000, 5000, 5984, 8000, 8008, 8080, 8081, 8443, 8888, 9200]),
+    ('RedisInfo', b'*1\r\n$4\r\nINFO\r\n', [6379]),
+    ('PostgresSSL', b'\x00\x00\x00\x08\x04\xd2\x16\x2f', [5432]),
+    ('RDPConnect', b'\x03\x00\x00\x13\x0e\xe0\x00\x00\x00\x00\x00\x01\x00\x08\x00\x03\x00\x00\x00', [3389]),
+]
+
+# Probes tried, in order, on ports no probe claims
+FALLBACK_PROBES = ['NULL', 'GetRequest']
+
+# (probe, service, literal prefix, pattern, product, version)
+# The literal prefix is what the index keys on; the pattern only runs when the
+# response starts with it. product/version may reference groups as $1..$9.
+MATCHES = [
+    # SSH
+    ('NULL', 'SSH', b'SSH-', rb'^SSH-[\d.]+-OpenSSH[_-]([\w.]+)', 'OpenSSH', '$1'),
+    ('NULL', 'SSH', b'SSH-', rb'^SSH-[\d.]+-dropbear[_-]?([\w.]*)', 'Dropbear sshd', '$1'),
+    ('NULL', 'SSH', b'SSH-', rb'^SSH-[\d.]+-([^\s\r\n]+)', '$1', ''),
+    # FTP
+    ('NULL', 'FTP', b'220', rb'^220[- ]\(vsFTPd ([\w.]+)\)', 'vsftpd', '$1'),
+    ('NULL', 'FTP', b'220', rb'^220[- ]ProFTPD ([\w.]+)', 'ProFTPD', '$1'),
+    ('NULL', 'FTP', b'220', rb'^220[- ]FileZilla Server(?: version)? ?([\w.]*)', 'FileZilla ftpd', '$1'),
+    ('NULL', 'FTP', b'220', rb'^220[- ][^\r\n]*Pure-FTPd', 'Pure-FTPd', ''),
+    ('NULL', 'FTP', b'220', rb'^220[- ][^\r\n]*Microsoft FTP Service', 'Microsoft ftpd', ''),
+    ('NULL', 'FTP', b'220', rb'^220[- ][^\r\n]*FTP', '', ''),
+    # SMTP
+    ('NULL', 'SMTP', b'220', rb'^220[- ][^\r\n]*ESMTP Postfix', 'Postfix smtpd', ''),
+    ('NULL', 'SMTP', b'220', rb'^220[- ][^\r\n]*ESMTP Exim ([\w.]+)', 'Exim smtpd', '$1'),
+    ('NULL', 'SMTP', b'220', rb'^220[- ][^\r\n]*ESMTP Sendmail ([\w.]+)', 'Sendmail', '$1'),
+    ('NULL', 'SMTP', b'220', rb'^220[- ][^\r\n]*Microsoft ESMTP MAIL Service', 'Microsoft Exchange smtpd', ''),
+    ('NULL', 'SMTP', b'220', rb'^220[- ][^\r\n]*SMTP', '', ''),
+    # POP3 / IMAP
+    ('NULL', 'POP3', b'+OK', rb'^\+OK Dovecot', 'Dovecot pop3d', ''),
+    ('NULL', 'POP3', b'+OK', rb'^\+OK', '', ''),
+    ('NULL', 'IMAP', b'* OK', rb'^\* OK (?:\[[^\]]*\] )?Dovecot', 'Dovecot imapd', ''),
+    ('NULL', 'IMAP', b'* OK', rb'^\* OK [^\r\n]*Cyrus IMAP v?([\w.-]+)', 'Cyrus imapd', '$1'),
+    ('NULL', 'IMAP', b'* OK', rb'^\* OK', '', ''),
+    # Misc server-first protocols
+    ('NULL', 'VNC', b'RFB ', rb'^RFB 0*(\d+)\.0*(\d+)\n', 'VNC', 'protocol $1.$2'),
+    ('NULL', 'Telnet', b'\xff', rb'^\xff[\xfb-\xfe]', '', ''),
+    ('NULL', 'IRC', b':', rb'^:[^ ]+ NOTICE ', '', ''),
+    ('NULL', 'MySQL', None, rb'^.\x00\x00\x00\x0a([\d.]+)-([\d.]+-)?MariaDB', 'MariaDB', '$1'),
+    ('NULL', 'MySQL', None, rb'^.\x00\x00\x00\x0a([\d.]+[\w.-]*)\x00', 'MySQL', '$1'),
+    ('NULL', 'MySQL', None, rb'^.\x00\x00\x00\xffj\x04Host .* is not allowed to connect', 'MySQL', ''),
+    # HTTP and HTTP-based services
+    ('GetRequest', 'Elasticsearch', b'HTTP/', rb'"number"\s*:\s*"([\w.-]+)"(?s:.*)You Know, for Search',
+     'Elasticsearch', '$1'),
+    ('GetRequest', 'CouchDB', b'HTTP/', rb'"couchdb"\s*:\s*"Welcome"\s*,\s*"version"\s*:\s*"([\w.]+)"',
+     'CouchDB', '$1'),
+    ('GetRequest', 'HTTP', b'HTTP/', rb'(?i)\r\nServer: nginx(?:/([\d.]+))?', 'nginx', '$1'),
+    ('GetRequest', 'HTTP', b'HTTP/', rb'(?i)\r\nServer: Apache(?:/([\d.]+))?', 'Apache httpd', '$1'),
+    ('GetRequest', 'HTTP', b'HTTP/', rb'(?i)\r\nServer: Microsoft-IIS/([\d.]+)', 'Microsoft IIS httpd', '$1'),
+    ('GetRequest', 'HTTP', b'HTTP/', rb'(?i)\r\nServer: lighttpd(?:/([\d.]+))?', 'lighttpd', '$1'),
+    ('GetRequest', 'HTTP', b'HTTP/', rb'(?i)\r\nServer: ([^\r\n/]+)(?:/([^\s\r\n]+))?', '$1', '$2'),
+    ('GetRequest', 'HTTP', b'HTTP/', rb'^HTTP/1\.[01] \d\d\d', '', ''),
+    # Binary protocols answering their own probe
+    ('RedisInfo', 'Redis', b'$', rb'redis_version:([\w.]+)', 'Redis key-value store', '$1'),
+    ('RedisInfo', 'Redis', b'-', rb'^-(?:NOAUTH|DENIED|ERR operation not permitted)', 'Redis key-value store', ''),
+    ('PostgresSSL', 'PostgreSQL', b'S', rb'^S$', 'PostgreSQL DB', ''),
+    ('PostgresSSL', 'PostgreSQL', b'N', rb'^N$', 'PostgreSQL DB', ''),
+    ('RDPConnect', 'RDP', b'\x03\x00', rb'^\x03\x00\x00[\x0b\x13]\x0e\xd0', 'Microsoft Terminal Services', ''),
+]
+
+_GROUP_REF = re.compile(r'\$(\d)')
+
+
+class Matcher:
+    """One compiled response pattern"""
+
+    __slots__ = ('service', 'prefix', 'pattern', 'product', 'version')
+
+    def __init__(self, service, prefix, pattern, product, version):
+        self.service = service
+        self.prefix = prefix
+        self.pattern = re.compile(pattern)
+        self.product = product
+        self.version = version
+
+    def match(self, response):
+        if self.prefix is not None and not response.startswith(self.prefix):
+            return None
+        m = self.pattern.search(response)
+        if not m:
+            return None
+        return self.service, self._expand(self.product, m), self._expand(self.version, m)
+
+    @staticmethod
+    def _expand(template, m):
+        if '$' not in template:
+            return template or None
+        value = _GROUP_REF.sub(lambda ref: (m.group(int(ref.group(1))) or b'').decode('utf-8', errors='ignore'),
+                               template)
+        return value.strip() or None
+
+
+class ProbeDatabase:
+    """Probes and matchers, compiled and indexed once.
+
+    Probes are indexed by port; each probe's matchers are indexed by the first
+    byte of their literal prefix, so a response is only run against the few
+    patterns that can possibly match it.
+    """
+
+    def __init__(self, probes=PROBES, matches=MATCHES, fallback=FALLBACK_PROBES):
+        self.payloads = {name: payload for name, payload, _ in probes}
+        self.by_port = {}
+        for name, _, ports in probes:
+            for port in ports:
+                self.by_port.setdefault(port, []).append(name)
+        self.fallback = list(fallback)
+
+        self.prefixed = {}
+        self.unanchored = {}
+        for probe, service, prefix, pattern, product, version in matches:
+            matcher = Matcher(service, prefix, pattern, product, version)
+            if prefix:
+                self.prefixed.setdefault((probe, prefix[:1]), []).append(matcher)
+            else:
+                self.unanchored.setdefault(probe, []).append(matcher)
+
+    def probes_for(self, port):
+        """Probe names to try on `port`, in order"""
+        return self.by_port.get(port, self.fallback)
+
+    def match(self, probe, response):
+        """Identify a response to `probe`; NULL matchers double as a fallback"""
+        probes = (probe,) if probe == 'NULL' else (probe, 'NULL')
+        for name in probes:
+            for matcher in self.prefixed.get((name, response[:1]), ()):
+                result = matcher.match(response)
+                if result:
+                    return result
+            for matcher in self.unanchored.get(name, ()):
+                result = matcher.match(response)
+                if result:
+                    return result
+        return None
+
+    def fingerprint(self, sock, port, timeout):
+        """Run the port's probes on a connected socket and identify the reply"""
+        probes = self.probes_for(port)
+        for probe in probes:
+            payload = self.payloads[probe]
+            if payload:
+                sock.sendall(payload)
+            wait = timeout if payload or port in self.by_port else min(timeout, SHORT_NULL_WAIT)
+            sock.settimeout(wait)
+            try:
+                response = sock.recv(4096)
+            except socket.timeout:
+                continue
+            if not response:
+                return None
+            identified = self.match(probe, response)
+            service, product, version = identified if identified else (None, None, None)
+            return Fingerprint(service, product, version, banner_text(response))
+        return None
+
+
+def banner_text(response):
+    """Printable one-line banner: the Server header for HTTP, else the first line"""
+    text = response.decode('utf-8', errors='ignore')
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+    if text.startswith('HTTP/'):
+        server_lines = [line for line in lines if line.lower().startswith('server:')]
+        if server_lines:
+            return server_lines[0][:200]
+    printable = ''.join(c for c in (lines[0] if lines else '') if c.isprintable())
+    return printable[:200] or None
+
+
+_database = None
+
+
+def get_database():
+    """The process-wide probe database, compiled on first use"""
+    global _database
+    if _database is None:
+        _database = ProbeDatabase()
+    return _database
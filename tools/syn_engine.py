@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+SYN Scan Engine
+Half-open TCP scanning for the O'Azis and MILKO port scanners (root only):
+one sender thread sends SYNs crafted with scapy at the governed rate, one receiver
+thread reads SYN-ACK and RST replies from raw sockets behind a kernel BPF
+filter. No connection is ever completed: the kernel answers each SYN-ACK
+with a RST, so neither side keeps connection state for a probe.
+For authorized security testing only.
+"""
+
+import ctypes
+import heapq
+import random
+import select
+import socket
+import struct
+import sys
+import threading
+import time
+import zlib
+
+try:
+    from scapy.layers.inet import IP, TCP
+    from scapy.layers.inet6 import IPv6
+except ImportError:  # scapy is only needed for the SYN engine
+    IP = TCP = IPv6 = None
+
+from scan_engine import HostScheduler, HostTimeouts, socket_family
+
+DEFAULT_SYN_WINDOW = 5000
+DEFAULT_SYN_RETRIES = 1
+RECEIVE_BUFFER = 4 << 20
+SNAP_LENGTH = 128          # Bytes of each reply the filter passes up: IP + TCP headers
+SOURCE_CACHE_SIZE = 4096   # Targets whose route source address is remembered
+
+SO_ATTACH_FILTER = getattr(socket, 'SO_ATTACH_FILTER', 26)
+
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_ACK = 0x10
+
+# Classic BPF opcodes used by reply_filter()
+BPF_LD_H_ABS = 0x28
+BPF_LD_B_ABS = 0x30
+BPF_LD_H_IND = 0x48
+BPF_LD_B_IND = 0x50
+BPF_LDX_B_MSH = 0xb1
+BPF_JEQ_K = 0x15
+BPF_JSET_K = 0x45
+BPF_RET_K = 0x06
+
+
+def syn_available():
+    """None if SYN scans can run here, otherwise the reason they cannot"""
+    if not sys.platform.startswith('linux'):
+        return "SYN scans need Linux raw sockets and socket filters"
+    if IP is None:
+        return "SYN scans need scapy (pip install scapy)"
+    try:
+        socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP).close()
+    except PermissionError:
+        return "SYN scans need root (or CAP_NET_RAW)"
+    except OSError as e:
+        return f"cannot open a raw socket: {e}"
+    return None
+
+
+def reply_filter(source_port, family):
+    """Classic BPF program passing only SYN or RST segments sent to `source_port`.
+
+    IPv4 raw sockets see the IP header, so the TCP header is found through
+    the header length (ldx 4*([0]&0xf)); IPv6 raw sockets start at TCP.
+    """
+    if family == socket.AF_INET6:
+        program = [
+            (BPF_LD_H_ABS, 0, 0, 2),                    # A = destination port
+            (BPF_JEQ_K, 0, 3, source_port),
+            (BPF_LD_B_ABS, 0, 0, 13),                   # A = flags
+            (BPF_JSET_K, 0, 1, TCP_SYN | TCP_RST),
+            (BPF_RET_K, 0, 0, SNAP_LENGTH),
+            (BPF_RET_K, 0, 0, 0),
+        ]
+    else:
+        program = [
+            (BPF_LDX_B_MSH, 0, 0, 0),                   # X = IP header length
+            (BPF_LD_H_IND, 0, 0, 2),                    # A = destination port
+            (BPF_JEQ_K, 0, 3, source_port),
+            (BPF_LD_B_IND, 0, 0, 13),                   # A = flags
+            (BPF_JSET_K, 0, 1, TCP_SYN | TCP_RST),
+            (BPF_RET_K, 0, 0, SNAP_LENGTH),
+            (BPF_RET_K, 0, 0, 0),
+        ]
+    return b''.join(struct.pack('HBBI', *instruction) for instruction in program), len(program)
+
+
+def internet_checksum(data):
+    """RFC 1071 ones' complement sum of `data`"""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'>{len(data) // 2}H', data))
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return ~total & 0xffff
+
+
+def attach_filter(sock, program):
+    """SO_ATTACH_FILTER a (bytecode, length) program; the kernel copies it"""
+    code, length = program
+    buffer = ctypes.create_string_buffer(code)
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, struct.pack('HL', length, ctypes.addressof(buffer)))
+
+
+class Probe:
+    __slots__ = ('target', 'port', 'attempt', 'started', 'sent')
+
+    def __init__(self, target, port, now):
+        self.target = target
+        self.port = port
+        self.attempt = 1
+        self.started = now
+        self.sent = now
+
+
+class SynScanEngine:
+    """Half-open SYN scanner: one sender thread, one receiver thread.
+
+    The sender takes (target, port) jobs from an iterator or a HostScheduler,
+    keeps at most `window` probes outstanding, paces every SYN through
+    `governor` and resends unanswered ones up to `retries` times after the
+    host's timeout from `timeouts`. The receiver matches SYN-ACK (open) and
+    RST (closed) replies to outstanding probes by address, port and the
+    acknowledged sequence number, a per-probe cookie, so stray or spoofed
+    segments are ignored. Open ports are reported through
+    on_open(target, port), like the connect engines, and every finished
+    probe through on_probe_done (or the scheduler's release()). With
+    `metrics`, probe times are recorded as connect times by outcome.
+    """
+
+    def __init__(self, on_open, timeout=1.0, retries=DEFAULT_SYN_RETRIES, window=DEFAULT_SYN_WINDOW,
+                 timeouts=None, governor=None, on_probe_done=None, metrics=None):
+        self.on_open = on_open
+        self.metrics = metrics
+        self.on_probe_done = on_probe_done
+        self.timeout = timeout
+        self.timeouts = timeouts or HostTimeouts(timeout, adaptive=False)
+        self.retries = max(0, retries)
+        self.window = max(1, window)
+        self.governor = governor if governor and governor.enabled else None
+        self.probes_sent = 0
+        self.cookie_key = random.getrandbits(32)
+        self.outstanding = {}
+        self.deadlines = []
+        self.condition = threading.Condition()
+        self.sources = {}
+        self.templates = {}
+        self.senders = {}
+        self.scheduler = None
+        self.done = threading.Event()
+
+    def cookie(self, target, port):
+        """Initial sequence number of the probe to (target, port)"""
+        return (zlib.crc32(f"{target}/{port}".encode(), self.cookie_key)) & 0xffffffff
+
+    def source_address(self, target):
+        """Address the routing table would send from to reach `target`"""
+        source = self.sources.get(target)
+        if source is None:
+            with socket.socket(socket_family(target), socket.SOCK_DGRAM) as probe:
+                probe.connect((target, 9))  # No packet is sent for a UDP connect()
+                source = probe.getsockname()[0]
+            if len(self.sources) >= SOURCE_CACHE_SIZE:
+                self.sources.clear()
+            self.sources[target] = source
+        return source
+
+    def template(self, family, source):
+        """(packet, TCP offset, packed source) crafted by scapy once per family and source address"""
+        key = (family, source)
+        template = self.templates.get(key)
+        if template is None:
+            segment = TCP(sport=self.source_port, dport=0, flags='S', window=1024, options=[('MSS', 1460)])
+            if family == socket.AF_INET6:
+                # IPv6 raw sockets add the IP header themselves
+                template = (bytes(IPv6(src=source, dst='::1') / segment)[40:], 0, socket.inet_pton(family, source))
+            else:
+                template = (bytes(IP(src=source, dst='127.0.0.1') / segment), 20, socket.inet_pton(family, source))
+            self.templates[key] = template
+        return template
+
+    def craft(self, target, port):
+        """SYN for the raw send socket of `target`'s family.
+
+        Building every packet in scapy costs most of a millisecond, so each
+        probe copies its family's template and only writes the destination,
+        port, sequence cookie and TCP checksum (the kernel fills in the IPv4
+        header checksum).
+        """
+        family = socket_family(target)
+        template, offset, source = self.template(family, self.source_address(target))
+        destination = socket.inet_pton(family, target)
+        packet = bytearray(template)
+        if family == socket.AF_INET:
+            packet[16:20] = destination
+        struct.pack_into('>HI', packet, offset + 2, port, self.cookie(target, port))
+        packet[offset + 16:offset + 18] = b'\x00\x00'
+        length = len(packet) - offset
+        if family == socket.AF_INET6:
+            pseudo = source + destination + struct.pack('>I3xB', length, socket.IPPROTO_TCP)
+        else:
+            pseudo = source + destination + struct.pack('>xBH', socket.IPPROTO_TCP, length)
+        struct.pack_into('>H', packet, offset + 16, internet_checksum(pseudo + bytes(packet[offset:])))
+        return bytes(packet)
+
+    def send(self, probe):
+        if self.governor:
+            self.governor.wait(probe.target)
+        packet = self.craft(probe.target, probe.port)
+        sender = self.senders[socket_family(probe.target)]
+        try:
+            sender.sendto(packet, (probe.target, 0))
+        except OSError:
+            pass  # Unroutable or a full send buffer: the probe times out like a lost SYN
+        self.probes_sent += 1
+        probe.sent = time.monotonic()
+        with self.condition:
+            heapq.heappush(self.deadlines, (probe.sent + self.timeouts.get(probe.target),
+                                            self.probes_sent, probe, probe.attempt))
+
+    def finish(self, target, port, outcome):
+        """Close the outstanding probe to (target, port); ignored if it already finished"""
+        now = time.monotonic()
+        with self.condition:
+            probe = self.outstanding.pop((target, port), None)
+            if probe is None:
+                return
+            self.condition.notify()
+        if outcome != 'timeout' and probe.attempt == 1:
+            self.timeouts.observe(target, now - probe.sent)
+        if self.metrics:
+            self.metrics.connect(outcome, now - probe.started)
+        if self.scheduler:
+            self.scheduler.release(target, port)
+        elif self.on_probe_done:
+            self.on_probe_done(target, port)
+        if outcome == 'open':
+            self.on_open(target, port)
+
+    def expire(self):
+        """Resend or time out probes whose deadline has passed"""
+        now = time.monotonic()
+        resend, expired = [], []
+        with self.condition:
+            while self.deadlines and self.deadlines[0][0] <= now:
+                _, _, probe, attempt = heapq.heappop(self.deadlines)
+                if self.outstanding.get((probe.target, probe.port)) is not probe or probe.attempt != attempt:
+                    continue  # Answered, or already resent
+                if probe.attempt <= self.retries:
+                    probe.attempt += 1
+                    resend.append(probe)
+                else:
+                    expired.append(probe)
+        for probe in expired:
+            self.finish(probe.target, probe.port, 'timeout')
+        for probe in resend:
+            self.send(probe)
+
+    def _sender(self, jobs):
+        next_job = self.scheduler.try_acquire if self.scheduler else lambda: next(jobs)
+        exhausted = False
+        while True:
+            self.expire()
+            if not exhausted and len(self.outstanding) < self.window:
+                try:
+                    job = next_job()
+                except StopIteration:
+                    exhausted = True
+                    job = None
+                if job is not None:
+                    target, port = job
+                    probe = Probe(target, port, time.monotonic())
+                    with self.condition:
+                        self.outstanding[job] = probe
+                    self.send(probe)
+                    continue
+            with self.condition:
+                if exhausted and not self.outstanding:
+                    return
+                wait = self.deadlines[0][0] - time.monotonic() if self.deadlines else 0.05
+                # Woken early by finish() when a reply frees window or per-host room
+                self.condition.wait(min(max(wait, 0.001), 0.05))
+
+    def _receiver(self, listeners):
+        while not self.done.is_set():
+            readable, _, _ = select.select(listeners, [], [], 0.05)
+            for sock in readable:
+                while True:
+                    try:
+                        data, address = sock.recvfrom(SNAP_LENGTH)
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    self.classify(sock.family, data, address)
+
+    def classify(self, family, data, address):
+        """Match one filtered reply to its probe: SYN-ACK is open, RST is closed"""
+        if family == socket.AF_INET:
+            header = (data[0] & 0x0f) * 4
+            target, segment = socket.inet_ntop(socket.AF_INET, data[12:16]), data[header:]
+        else:
+            target, segment = address[0], data
+        if len(segment) < 14:
+            return
+        port, _, _, ack = struct.unpack_from('>HHII', segment)
+        flags = segment[13]
+        if ack != (self.cookie(target, port) + 1) & 0xffffffff:
+            return
+        if flags & (TCP_SYN | TCP_ACK) == TCP_SYN | TCP_ACK:
+            self.finish(target, port, 'open')
+        elif flags & TCP_RST:
+            self.finish(target, port, 'refused')
+
+    def open_sockets(self):
+        """Raw send sockets and BPF-filtered listeners for both families, plus the port reservation"""
+        # A bound, never-listening TCP socket keeps the source port ours and
+        # makes the kernel answer every SYN-ACK with a RST
+        try:
+            reservation = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
+            reservation.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 0)
+            reservation.bind(('::', 0))
+        except OSError:
+            reservation = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            reservation.bind(('0.0.0.0', 0))
+        self.source_port = reservation.getsockname()[1]
+        sockets, listeners = [reservation], []
+        for family, protocol in ((socket.AF_INET, socket.IPPROTO_RAW), (socket.AF_INET6, socket.IPPROTO_TCP)):
+            try:
+                sender = socket.socket(family, socket.SOCK_RAW, protocol)
+                listener = socket.socket(family, socket.SOCK_RAW, socket.IPPROTO_TCP)
+            except OSError:
+                if family == socket.AF_INET:
+                    raise
+                continue  # No IPv6 on this host
+            attach_filter(listener, reply_filter(self.source_port, family))
+            listener.setblocking(False)
+            try:
+                listener.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+            except OSError:
+                pass
+            self.senders[family] = sender
+            sockets += [sender, listener]
+            listeners.append(listener)
+        return sockets, listeners
+
+    def run(self, jobs):
+        """Scan every (target, port) pair yielded by `jobs` or handed out by a HostScheduler"""
+        self.scheduler = jobs if isinstance(jobs, HostScheduler) else None
+        sockets, listeners = self.open_sockets()
+        self.done.clear()
+        receiver = threading.Thread(target=self._receiver, args=(listeners,))
+        receiver.daemon = True
+        receiver.start()
+        try:
+            self._sender(iter(jobs) if self.scheduler is None else None)
+        finally:
+            self.done.set()
+            receiver.join()
+            for sock in sockets:
+                sock.close()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Target Resolver
+Resolution stage for the O'Azis and MILKO scanners: the whole target list is
+resolved concurrently before scanning starts, every name expands to all of
+its A and AAAA records, and answers are cached for their DNS TTL.
+For authorized security testing only.
+"""
+
+import ipaddress
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import dns.exception
+    import dns.resolver
+except ImportError:  # dnspython is optional; without it TTLs are not visible
+    dns = None
+
+DEFAULT_RESOLVER_WORKERS = 64
+DEFAULT_TTL = 300.0        # Cache lifetime when the record TTL is unknown
+NEGATIVE_TTL = 30.0        # Cache lifetime of failed lookups
+
+
+class TargetResolver:
+    """Concurrent A/AAAA resolver with a TTL-respecting cache.
+
+    With dnspython installed, records are queried directly and cached for
+    the smallest TTL of the answer. Names the DNS servers cannot answer
+    (localhost, hosts-file entries, servers down) and every name without
+    dnspython go through getaddrinfo(), whose answers live for
+    `default_ttl`. Failures are cached for `negative_ttl`.
+    One instance is meant to be shared for the whole session (get_resolver()),
+    so per-scan `metrics` are passed to each call instead of the constructor.
+    """
+
+    def __init__(self, workers=DEFAULT_RESOLVER_WORKERS, default_ttl=DEFAULT_TTL,
+                 negative_ttl=NEGATIVE_TTL, ipv6=True):
+        self.workers = max(1, workers)
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.ipv6 = ipv6
+        self.cache = {}
+        self.lock = threading.Lock()
+        self.resolver = dns.resolver.Resolver() if dns else None
+
+    def lookup(self, name, metrics=None):
+        """All addresses of `name` (IPv4 first); raises socket.gaierror if it does not resolve"""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.cache.get(name)
+        if entry and entry[0] > now:
+            addresses = entry[1]
+            if metrics:
+                metrics.inc('dns_cache_hits_total')
+        else:
+            try:
+                addresses, ttl = self._query(name)
+            except socket.gaierror:
+                addresses, ttl = (), self.negative_ttl
+            if metrics:
+                metrics.observe('dns_seconds', time.monotonic() - now, result='resolved' if addresses else 'failed')
+            with self.lock:
+                self.cache[name] = (now + ttl, addresses)
+        if not addresses:
+            raise socket.gaierror(socket.EAI_NONAME, f"Could not resolve {name}")
+        return list(addresses)
+
+    def resolve_all(self, names, metrics=None):
+        """Resolve every name concurrently; returns {name: [addresses] or None}, in input order"""
+        names = list(dict.fromkeys(names))
+        results = {}
+
+        def lookup_or_none(name):
+            try:
+                return self.lookup(name, metrics)
+            except socket.gaierror:
+                return None
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, max(1, len(names)))) as executor:
+            for name, addresses in zip(names, executor.map(lookup_or_none, names)):
+                results[name] = addresses
+        return results
+
+    def cached(self):
+        """Number of live cache entries"""
+        now = time.monotonic()
+        with self.lock:
+            return sum(1 for expires, _ in self.cache.values() if expires > now)
+
+    def _query(self, name):
+        """(addresses, ttl) for one name"""
+        try:
+            return (str(ipaddress.ip_address(name)),), float('inf')
+        except ValueError:
+            pass
+        try:
+            if self.resolver:
+                return self._query_dns(name)
+            return self._query_system(name)
+        except (UnicodeError, ValueError) as e:
+            # Names IDNA cannot encode (empty labels such as 'a..b', labels over 63 characters)
+            raise socket.gaierror(socket.EAI_NONAME, f"Invalid name {name!r}: {e}")
+
+    def _query_system(self, name):
+        """getaddrinfo(), so /etc/hosts and nsswitch apply; TTLs are not visible"""
+        family = socket.AF_UNSPEC if self.ipv6 else socket.AF_INET
+        infos = socket.getaddrinfo(name, None, family, socket.SOCK_STREAM)
+        addresses = [info[4][0] for info in infos if info[0] in (socket.AF_INET, socket.AF_INET6)]
+        return self._ordered(addresses), self.default_ttl
+
+    def _query_dns(self, name):
+        addresses, ttls = [], []
+        for record_type in ('A', 'AAAA') if self.ipv6 else ('A',):
+            try:
+                answer = self.resolver.resolve(name, record_type)
+            except dns.exception.DNSException:
+                continue  # NXDOMAIN, no records of this type, timeouts, unusable names...
+            addresses.extend(record.to_text() for record in answer)
+            ttls.append(answer.rrset.ttl)
+        if not addresses:
+            # Not in DNS or DNS unreachable: the system resolver may still know it
+            return self._query_system(name)
+        return self._ordered(addresses), float(min(ttls))
+
+    @staticmethod
+    def _ordered(addresses):
+        """Deduplicated, IPv4 before IPv6, otherwise in answer order"""
+        unique = list(dict.fromkeys(addresses))
+        return tuple(sorted(unique, key=lambda address: ':' in address))
+
+
+_resolver = None
+
+
+def get_resolver():
+    """The session-wide resolver, so the cache survives between scans"""
+    global _resolver
+    if _resolver is None:
+        _resolver = TargetResolver()
+    return _resolver
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Target Spec
+Parses scan target specifications - single IPs, hostnames, CIDR blocks, dash
+ranges, exclusions and target files, IPv4 and IPv6 - and yields the targets
+lazily, so a /16 or a 100k-line asset export is never held in memory.
+For authorized security testing only.
+"""
+
+import bisect
+import ipaddress
+import os
+import queue
+import re
+import threading
+from itertools import islice
+
+HOSTNAME_CHARS = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.-_")
+DEFAULT_RESOLVE_CHUNK = 256
+PREFETCH_CHUNKS = 4        # Resolved chunks a TargetStream keeps ready ahead of the engines
+_SEPARATORS = re.compile(r'[\s,]+')
+
+
+def split_entries(text):
+    """Split a line of spec text into its entries"""
+    return [part for part in _SEPARATORS.split(text.strip()) if part]
+
+
+def merge_intervals(intervals):
+    """Sort and merge inclusive (start, end) integer intervals"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(intervals, removed):
+    """Merged `intervals` minus merged `removed`"""
+    result = []
+    j = 0
+    for start, end in intervals:
+        while j < len(removed) and removed[j][1] < start:
+            j += 1
+        k = j
+        while start <= end and k < len(removed) and removed[k][0] <= end:
+            cut_start, cut_end = removed[k]
+            if cut_start > start:
+                result.append((start, cut_start - 1))
+            start = max(start, cut_end + 1)
+            k += 1
+        if start <= end:
+            result.append((start, end))
+    return result
+
+
+def in_intervals(intervals, value):
+    i = bisect.bisect_right(intervals, (value, float('inf'))) - 1
+    return i >= 0 and intervals[i][0] <= value <= intervals[i][1]
+
+
+def parse_address_block(text):
+    """IP, CIDR or dash range -> (version, start, end) as integers; None for anything else.
+
+    Dash ranges take a full end address (10.0.0.1-10.0.0.50) or, for IPv4, just
+    the last octet (10.0.0.1-50). Raises ValueError for malformed blocks.
+    """
+    if '/' in text:
+        network = ipaddress.ip_network(text, strict=False)
+        return network.version, int(network.network_address), int(network.broadcast_address)
+    if '-' in text:
+        first, _, last = text.partition('-')
+        try:
+            start = ipaddress.ip_address(first)
+        except ValueError:
+            return None  # Hostnames may contain dashes
+        if last.isdigit() and start.version == 4:
+            end = ipaddress.ip_address(f"{first.rsplit('.', 1)[0]}.{last}")
+        else:
+            end = ipaddress.ip_address(last)
+        if end.version != start.version or int(end) < int(start):
+            raise ValueError(f"Invalid range: {text}")
+        return start.version, int(start), int(end)
+    try:
+        address = ipaddress.ip_address(text)
+    except ValueError:
+        return None
+    return address.version, int(address), int(address)
+
+
+def is_hostname(text):
+    return 0 < len(text) <= 255 and all(c in HOSTNAME_CHARS for c in text) and not text.startswith('-')
+
+
+def format_address(version, value):
+    return str(ipaddress.IPv4Address(value) if version == 4 else ipaddress.IPv6Address(value))
+
+
+class TargetSpec:
+    """A set of scan targets described by spec entries.
+
+    Entries are separated by commas or whitespace:
+      10.0.0.5  host.example.com  10.0.0.0/24  10.0.0.1-50  2001:db8::/120
+      !10.0.0.7 or !10.0.0.0/28   exclusion, applies to every other entry
+      @targets.txt (or an existing file path)   one or more entries per line,
+                                                '#' starts a comment
+    Inline address blocks are merged, so overlaps are scanned once. Iterating
+    yields address strings and unresolved hostnames; iter_addresses() also
+    resolves the hostnames in concurrent batches.
+    """
+
+    def __init__(self, entries=(), exclude=()):
+        self.entries = []
+        self.blocks = {4: [], 6: []}
+        self.excluded = {4: [], 6: []}
+        self.hostnames = []
+        self.excluded_hostnames = set()
+        self.files = []
+        for entry in entries:
+            self.add(entry)
+        for entry in exclude:
+            if entry.startswith('@'):
+                # An exclusion file lists plain entries, one or more per line
+                if not os.path.isfile(entry[1:]):
+                    raise ValueError(f"Exclusion file not found: {entry[1:]}")
+                for line_entry in self._file_entries(entry[1:]):
+                    self.add('!' + line_entry.lstrip('!'))
+            else:
+                self.add(entry if entry.startswith('!') else '!' + entry)
+        self._normalize()
+
+    @classmethod
+    def parse(cls, spec, exclude=None):
+        """Build a spec from a string or an iterable of strings; raises ValueError"""
+        if isinstance(spec, str):
+            spec = [spec]
+        entries = [part for text in spec for part in split_entries(text)]
+        if isinstance(exclude, str):
+            exclude = split_entries(exclude)
+        spec = cls(entries, exclude or ())
+        if not spec.entries or not (spec.hostnames or spec.files or spec.blocks[4] or spec.blocks[6]):
+            raise ValueError("No targets specified")
+        return spec
+
+    def add(self, entry):
+        """Add one entry; raises ValueError if it is not a valid target"""
+        entry = entry.strip()
+        if not entry:
+            return
+        if entry.startswith('!'):
+            block = parse_address_block(entry[1:])
+            if block:
+                self.excluded[block[0]].append(block[1:])
+            elif is_hostname(entry[1:]):
+                self.excluded_hostnames.add(entry[1:].lower())
+            else:
+                raise ValueError(f"Invalid exclusion: {entry}")
+        elif entry.startswith('@') or ('/' in entry and os.path.isfile(entry)):
+            path = entry[1:] if entry.startswith('@') else entry
+            if not os.path.isfile(path):
+                raise ValueError(f"Target file not found: {path}")
+            self.files.append(path)
+            # Exclusions inside files apply to the whole scan, so collect them up front
+            for line_entry in self._file_entries(path):
+                if line_entry.startswith('!'):
+                    self.add(line_entry)
+        else:
+            block = parse_address_block(entry)
+            if block:
+                self.blocks[block[0]].append(block[1:])
+            elif is_hostname(entry):
+                self.hostnames.append(entry)
+            else:
+                raise ValueError(f"Invalid target: {entry}")
+        self.entries.append(entry)
+
+    def _normalize(self):
+        for version in (4, 6):
+            self.excluded[version] = merge_intervals(self.excluded[version])
+            self.blocks[version] = subtract_intervals(merge_intervals(self.blocks[version]), self.excluded[version])
+        self.hostnames = [name for name in dict.fromkeys(self.hostnames)
+                          if name.lower() not in self.excluded_hostnames]
+
+    @staticmethod
+    def _file_entries(path):
+        with open(path) as f:
+            for line in f:
+                yield from split_entries(line.split('#', 1)[0])
+
+    def __iter__(self):
+        for version in (4, 6):
+            for start, end in self.blocks[version]:
+                for value in range(start, end + 1):
+                    yield format_address(version, value)
+        yield from self.hostnames
+        for path in self.files:
+            for entry in self._file_entries(path):
+                if entry.startswith('!'):
+                    continue
+                block = parse_address_block(entry)
+                if block:
+                    version, start, end = block
+                    for value in range(start, end + 1):
+                        if not in_intervals(self.excluded[version], value):
+                            yield format_address(version, value)
+                elif is_hostname(entry) and entry.lower() not in self.excluded_hostnames:
+                    yield entry
+
+    def iter_addresses(self, resolver, chunk_size=DEFAULT_RESOLVE_CHUNK, on_unresolved=None, metrics=None):
+        """Yield (address, hostname or None) with hostnames resolved concurrently in chunks.
+
+        Addresses a hostname resolves to are dropped if excluded or already
+        covered by an address block of the spec. `on_unresolved(name)` is
+        called for names that do not resolve; lookups are timed into `metrics`.
+        """
+        entries = iter(self)
+        seen = set()
+        while True:
+            chunk = list(islice(entries, chunk_size))
+            if not chunk:
+                return
+            names = [entry for entry in chunk if not self.is_address(entry)]
+            answers = resolver.resolve_all(names, metrics) if names else {}
+            for entry in chunk:
+                if entry not in answers:
+                    yield entry, None
+                    continue
+                if not answers[entry]:
+                    if on_unresolved:
+                        on_unresolved(entry)
+                    continue
+                for address in answers[entry]:
+                    if address in seen or self.contains(address) or self.is_excluded(address):
+                        continue
+                    seen.add(address)
+                    yield address, entry
+
+    @staticmethod
+    def is_address(text):
+        try:
+            ipaddress.ip_address(text)
+            return True
+        except ValueError:
+            return False
+
+    def contains(self, address):
+        """Whether `address` falls in one of the spec's inline address blocks"""
+        ip = ipaddress.ip_address(address)
+        return in_intervals(self.blocks[ip.version], int(ip))
+
+    def is_excluded(self, address):
+        ip = ipaddress.ip_address(address)
+        return in_intervals(self.excluded[ip.version], int(ip))
+
+    def count(self):
+        """Number of targets, counting each hostname once (before resolution)"""
+        total = sum(end - start + 1 for version in (4, 6) for start, end in self.blocks[version])
+        total += len(self.hostnames)
+        for path in self.files:
+            for entry in self._file_entries(path):
+                if entry.startswith('!'):
+                    continue
+                block = parse_address_block(entry)
+                total += block[2] - block[1] + 1 if block else 1
+        return total
+
+    def key(self):
+        """Order-independent identity of the spec, for checkpoints and history"""
+        return sorted(dict.fromkeys(self.entries))
+
+    def __str__(self):
+        return ' '.join(self.entries)
+
+    def __repr__(self):
+        return f"TargetSpec('{self}')"
+
+
+class TargetStream:
+    """Re-iterable stream of the addresses a TargetSpec stands for.
+
+    Each pass walks the spec again, so engines can run several phases over
+    the same targets without a materialized list. Specs with hostnames or
+    target files are resolved on a background thread that stays up to
+    PREFETCH_CHUNKS chunks ahead of the consumer, keeping DNS latency off the
+    scan loop. Hostnames of resolved addresses are remembered for labels.
+    """
+
+    def __init__(self, spec, resolver, chunk_size=DEFAULT_RESOLVE_CHUNK, on_unresolved=None, metrics=None):
+        self.spec = spec
+        self.metrics = metrics
+        self.resolver = resolver
+        self.chunk_size = chunk_size
+        self.on_unresolved = on_unresolved
+        self.names = {}
+        self.unresolved = set()
+        self.last_count = 0
+
+    def __iter__(self):
+        count = 0
+        for address, name in self._addresses():
+            if name:
+                self.names[address] = name
+            count += 1
+            yield address
+        self.last_count = count
+
+    def _addresses(self):
+        addresses = self.spec.iter_addresses(self.resolver, self.chunk_size, self.report_unresolved, self.metrics)
+        if not (self.spec.hostnames or self.spec.files):
+            yield from addresses
+            return
+        ready = queue.Queue(maxsize=self.chunk_size * PREFETCH_CHUNKS)
+        stopped = threading.Event()
+        done = object()
+
+        def put(item):
+            while not stopped.is_set():
+                try:
+                    ready.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for item in addresses:
+                    if not put(item):
+                        return
+            except Exception as e:  # Re-raised in the consuming thread
+                put(e)
+                return
+            put(done)
+
+        producer = threading.Thread(target=produce)
+        producer.daemon = True
+        producer.start()
+        try:
+            while True:
+                item = ready.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stopped.set()
+
+    def report_unresolved(self, name):
+        """Pass a name that did not resolve to `on_unresolved`, once per stream"""
+        if name not in self.unresolved:
+            self.unresolved.add(name)
+            if self.on_unresolved:
+                self.on_unresolved(name)
+
+    def first(self):
+        """The first address, or None if nothing resolves"""
+        return next(iter(self), None)
+
+    def label(self, address):
+        """The hostname an address came from, or the address itself"""
+        return self.names.get(address, address)
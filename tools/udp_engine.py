@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+UDP Scan Engine
+Asynchronous UDP scanning for the O'Azis and MILKO port scanners: protocol
+payloads go out from one non-blocking socket per group of hosts, replies and
+ICMP errors are matched back to their probes on the event loop, and
+unanswered probes are retransmitted a limited number of times.
+For authorized security testing only.
+"""
+
+import asyncio
+import errno
+import socket
+import struct
+import sys
+import time
+
+from scan_engine import AsyncConnectEngine, socket_family
+from udp_probes import ANY_SOURCE_PORTS, answers, identify, payload_for
+
+DEFAULT_UDP_CONCURRENCY = 500
+DEFAULT_UDP_PER_HOST_LIMIT = 32
+DEFAULT_UDP_RETRIES = 2
+HOSTS_PER_SOCKET = 256
+RECEIVE_BUFFER = 1 << 20
+
+# Linux queues ICMP errors for unconnected sockets on the socket's error queue
+# once IP_RECVERR / IPV6_RECVERR is set; the constants are missing from older
+# Pythons, so fall back to the Linux values
+IP_RECVERR = getattr(socket, 'IP_RECVERR', 11)
+IPV6_RECVERR = getattr(socket, 'IPV6_RECVERR', 25)
+MSG_ERRQUEUE = getattr(socket, 'MSG_ERRQUEUE', 0x2000)
+RECVERR_CMSGS = {(socket.IPPROTO_IP, IP_RECVERR), (socket.IPPROTO_IPV6, IPV6_RECVERR)}
+RECVERR_SUPPORTED = sys.platform.startswith('linux')
+
+# sock_extended_err.ee_origin values of errors reported by ICMP
+SO_EE_ORIGIN_ICMP = 2
+SO_EE_ORIGIN_ICMP6 = 3
+
+# Probe outcomes (named as for connect metrics) and the port state each means
+UDP_STATES = {
+    'open': 'open',              # The service replied
+    'refused': 'closed',         # ICMP port unreachable
+    'error': 'filtered',         # Other ICMP unreachable, or the send failed
+    'timeout': 'open|filtered',  # No answer after every retransmission
+}
+
+
+def enable_recverr(sock, family):
+    """Ask for ICMP errors on the error queue; False where unsupported (non-Linux)"""
+    if not RECVERR_SUPPORTED:
+        return False
+    level, option = (socket.IPPROTO_IPV6, IPV6_RECVERR) if family == socket.AF_INET6 else (socket.IPPROTO_IP, IP_RECVERR)
+    try:
+        sock.setsockopt(level, option, 1)
+        return True
+    except OSError:
+        return False
+
+
+def settle(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+class UDPSocketGroup:
+    """One non-blocking UDP socket carrying the probes of up to HOSTS_PER_SOCKET hosts.
+
+    `pending` maps (address, port) to the future of the probe awaiting an
+    answer; the reader callback settles it with ('open', data) for a reply,
+    ('refused', None) for an ICMP port unreachable or ('error', None) for any
+    other ICMP unreachable.
+    """
+
+    def __init__(self, loop, family):
+        self.loop = loop
+        self.family = family
+        self.sock = socket.socket(family, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        try:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+        except OSError:
+            pass
+        self.recverr = enable_recverr(self.sock, family)
+        self.hosts = set()
+        self.in_flight = 0
+        self.pending = {}
+        self.writable = []
+        self.fd = self.sock.fileno()
+        loop.add_reader(self.fd, self._readable)
+
+    async def send(self, payload, address):
+        """sendto() that waits out a full send buffer; returns 0 or the errno of a failed send"""
+        failures = 0
+        while True:
+            try:
+                self.sock.sendto(payload, address)
+                return 0
+            except (BlockingIOError, InterruptedError):
+                await self._wait_writable()
+            except OSError as e:
+                # An ICMP error from an earlier probe can surface on the next
+                # send; it is reported through the error queue, so send again
+                failures += 1
+                if failures > 1:
+                    return e.errno or -1
+
+    async def _wait_writable(self):
+        waiter = self.loop.create_future()
+        if not self.writable:
+            self.loop.add_writer(self.fd, self._wake_writers)
+        self.writable.append(waiter)
+        await waiter
+
+    def _wake_writers(self):
+        self.loop.remove_writer(self.fd)
+        waiters, self.writable = self.writable, []
+        for waiter in waiters:
+            settle(waiter, None)
+
+    def _readable(self):
+        """Drain replies, then (on Linux) the ICMP errors queued for the socket"""
+        while True:
+            try:
+                data, address = self.sock.recvfrom(65535)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                continue  # A pending ICMP error; the details are on the error queue
+            self._reply(address[0], address[1], data)
+        if self.recverr:
+            self._read_errors()
+
+    def _reply(self, host, port, data):
+        answer = self.pending.get((host, port))
+        if answer is not None:
+            settle(answer, ('open', data))
+            return
+        # e.g. TFTP answers from a new transfer port: credit a probe whose protocol it speaks
+        for probed in ANY_SOURCE_PORTS:
+            answer = self.pending.get((host, probed))
+            if answer is not None and answers(probed, data):
+                settle(answer, ('open', data))
+                return
+
+    def _read_errors(self):
+        while True:
+            try:
+                _, ancdata, _, address = self.sock.recvmsg(1, 512, MSG_ERRQUEUE)
+            except OSError:
+                return  # Queue drained
+            for level, kind, data in ancdata:
+                if (level, kind) not in RECVERR_CMSGS or len(data) < 5:
+                    continue
+                ee_errno, origin = struct.unpack_from('=IB', data)
+                if origin not in (SO_EE_ORIGIN_ICMP, SO_EE_ORIGIN_ICMP6) or not address:
+                    continue
+                answer = self.pending.get((address[0], address[1]))
+                if answer is not None:
+                    settle(answer, ('refused' if ee_errno == errno.ECONNREFUSED else 'error', None))
+
+    def close(self):
+        self.loop.remove_reader(self.fd)
+        if self.writable:
+            self._wake_writers()
+        self.sock.close()
+
+
+class UDPScanEngine(AsyncConnectEngine):
+    """UDP scanner on a single asyncio event loop, driven like AsyncConnectEngine.
+
+    A fixed pool of coroutines takes (target, port) jobs, from an iterator or
+    a HostScheduler, and sends each port its protocol payload (udp_probes),
+    or an empty datagram. Probes share one socket per group of up to
+    `hosts_per_socket` hosts and per address family; replies and ICMP errors
+    are matched back to the waiting probe by (address, port). An unanswered
+    probe is sent again up to `retries` times. The first attempt waits the
+    host's timeout from `timeouts`, which learns from first-attempt answers
+    only; each retransmission doubles the wait, up to the timeout ceiling,
+    since a learned RTT may come from fast ICMP errors rather than from the
+    slower service replies.
+
+    `on_open(target, port, fingerprint)` reports replying ports and
+    `on_unanswered(target, port)` ports still silent after every attempt
+    (open|filtered). ICMP port unreachable ends a probe as closed at once.
+    ICMP errors are read from the Linux error queue (IP_RECVERR); elsewhere
+    closed ports cannot be told from unanswered ones.
+    """
+
+    def __init__(self, on_open, timeout=1.0, retries=DEFAULT_UDP_RETRIES, concurrency=DEFAULT_UDP_CONCURRENCY,
+                 timeouts=None, governor=None, on_probe_done=None, on_unanswered=None, metrics=None,
+                 hosts_per_socket=HOSTS_PER_SOCKET):
+        super().__init__(on_open, timeout, concurrency, timeouts, governor, on_probe_done, metrics)
+        # Probes share sockets, so in-flight work is not bounded by the file descriptor limit
+        self.concurrency = max(1, concurrency)
+        self.retries = max(0, retries)
+        self.on_unanswered = on_unanswered
+        self.hosts_per_socket = max(1, hosts_per_socket)
+        self.groups = {}
+        self.filling = {}
+        self.states = dict.fromkeys(UDP_STATES.values(), 0)
+
+    def _group(self, loop, target):
+        """The socket group carrying `target`'s probes, opening a new one when the current is full"""
+        group = self.groups.get(target)
+        if group is None:
+            family = socket_family(target)
+            group = self.filling.get(family)
+            if group is None or len(group.hosts) >= self.hosts_per_socket:
+                if group is not None and not group.in_flight:
+                    self._close(group)
+                group = self.filling[family] = UDPSocketGroup(loop, family)
+            group.hosts.add(target)
+            self.groups[target] = group
+        group.in_flight += 1
+        return group
+
+    def _release(self, group):
+        group.in_flight -= 1
+        if not group.in_flight and self.filling.get(group.family) is not group:
+            self._close(group)
+
+    def _close(self, group):
+        """Close a retired group; its hosts get a fresh group if they are probed again"""
+        for host in group.hosts:
+            if self.groups.get(host) is group:
+                del self.groups[host]
+        group.close()
+
+    async def probe(self, target, port):
+        """Send the port's payload until it is answered or the retransmissions run out"""
+        loop = asyncio.get_running_loop()
+        group = self._group(loop, target)
+        address = (target, port)
+        payload = payload_for(port)
+        started = time.monotonic()
+        outcome, data = 'timeout', None
+        try:
+            for attempt in range(self.retries + 1):
+                if self.governor:
+                    await self.governor.wait_async(target)
+                self.probes_sent += 1
+                answer = loop.create_future()
+                group.pending[address] = answer
+                sent = time.monotonic()
+                if await group.send(payload, address):
+                    outcome = 'error'
+                    break
+                first_wait = self.timeouts.get(target)
+                wait = min(first_wait * 2 ** attempt, max(first_wait, self.timeouts.ceiling))
+                timer = loop.call_later(wait, settle, answer, ('timeout', None))
+                try:
+                    outcome, data = await answer
+                finally:
+                    timer.cancel()
+                if outcome != 'timeout':
+                    if attempt == 0:
+                        # Karn's rule: answers to retransmissions are ambiguous RTT samples
+                        self.timeouts.observe(target, time.monotonic() - sent)
+                    break
+        finally:
+            group.pending.pop(address, None)
+            self._release(group)
+        if self.metrics:
+            self.metrics.connect(outcome, time.monotonic() - started)
+        self.states[UDP_STATES[outcome]] += 1
+        if outcome == 'open':
+            self.on_open(target, port, identify(port, data))
+        elif outcome == 'timeout' and self.on_unanswered:
+            self.on_unanswered(target, port)
+
+    async def run_async(self, jobs):
+        try:
+            await super().run_async(jobs)
+        finally:
+            for group in set(self.groups.values()) | set(self.filling.values()):
+                group.close()
+            self.groups = {}
+            self.filling = {}
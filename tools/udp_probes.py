@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+UDP Probes
+Protocol-correct payloads for the UDP scan engine and parsers that recognise
+the replies. Most UDP services stay silent on an empty datagram, so a port is
+only seen as open when it is sent something its service answers.
+For authorized security testing only.
+"""
+
+import re
+import struct
+from collections import namedtuple
+
+from service_probes import Fingerprint
+
+# `payload` is sent as-is; `parse(data)` returns (product, version, banner) for
+# a reply of the expected protocol, or None
+UDPProbe = namedtuple('UDPProbe', ['service', 'payload', 'parse'])
+
+# Transaction id used by the DNS, mDNS, NetBIOS and SNMP probes ("PY")
+PROBE_ID = 0x5059
+
+DNS_TXT = 16
+DNS_PTR = 12
+DNS_CHAOS = 3
+DNS_QU_IN = 0x8001  # IN class with the mDNS "unicast response" bit
+
+SYSDESCR_OID = bytes([0x2b, 6, 1, 2, 1, 1, 1, 0])  # 1.3.6.1.2.1.1.1.0
+
+# Ports worth probing over UDP: those with a payload below, plus services that
+# answer nothing but can still be told closed by an ICMP port unreachable
+UDP_COMMON_PORTS = [53, 67, 69, 111, 123, 137, 138, 161, 162, 500, 514, 520, 623, 1434, 1900,
+                    4500, 5060, 5353, 11211]
+
+DNS_PRODUCTS = [
+    (rb'^dnsmasq-([\w.]+)', 'dnsmasq', '$1'),
+    (rb'^unbound ([\w.]+)', 'Unbound', '$1'),
+    (rb'^PowerDNS (?:Recursor|Authoritative Server) ([\w.]+)', 'PowerDNS', '$1'),
+    (rb'^Knot DNS ([\w.]+)', 'Knot DNS', '$1'),
+    (rb'^Microsoft DNS ([\w.]+)', 'Microsoft DNS', '$1'),
+    (rb'^(\d+\.\d+[\w.-]*)', 'ISC BIND', '$1'),
+]
+DNS_PRODUCTS = [(re.compile(pattern), product, version) for pattern, product, version in DNS_PRODUCTS]
+
+HEADER_PRODUCT = re.compile(rb'(?im)^(?:server|user-agent):[ \t]*([^\r\n/ ]+)(?:/([^\s\r\n]+))?')
+
+
+def printable(data, limit=100):
+    """Reply bytes as a one-line banner"""
+    text = data[:limit].decode('utf-8', errors='replace')
+    return ''.join(c if c.isprintable() else '.' for c in text).strip() or None
+
+
+def expand(template, match):
+    """'$1' -> the first group of `match`"""
+    text = re.sub(rb'\$(\d)', lambda m: match.group(int(m.group(1))) or b'', template.encode())
+    return text.decode('utf-8', errors='replace') or None
+
+
+# -- DNS and mDNS -------------------------------------------------------
+
+def dns_query(name, qtype, qclass=1, flags=0x0100):
+    """A single-question DNS query (recursion desired by default)"""
+    labels = b''.join(bytes([len(label)]) + label.encode() for label in name.split('.') if label)
+    return struct.pack('>HHHHHH', PROBE_ID, flags, 1, 0, 0, 0) + labels + b'\x00' + struct.pack('>HH', qtype, qclass)
+
+
+def skip_name(data, offset):
+    """Offset just past the (possibly compressed) name starting at `offset`"""
+    while offset < len(data):
+        length = data[offset]
+        if length == 0:
+            return offset + 1
+        if length & 0xc0 == 0xc0:
+            return offset + 2
+        offset += length + 1
+    raise ValueError("truncated name")
+
+
+def parse_dns(data):
+    """Any response to our id is DNS; the first TXT answer (version.bind) names the product"""
+    if len(data) < 12:
+        return None
+    ident, flags, questions, answers = struct.unpack_from('>HHHH', data)
+    if ident != PROBE_ID or not flags & 0x8000:
+        return None
+    try:
+        offset = 12
+        for _ in range(questions):
+            offset = skip_name(data, offset) + 4
+        for _ in range(answers):
+            offset = skip_name(data, offset)
+            rtype, _, _, length = struct.unpack_from('>HHIH', data, offset)
+            offset += 10
+            if rtype == DNS_TXT and length:
+                text = data[offset + 1:offset + 1 + data[offset]]
+                for pattern, product, version in DNS_PRODUCTS:
+                    match = pattern.match(text)
+                    if match:
+                        return expand(product, match), expand(version, match), printable(text)
+                return None, None, printable(text)
+            offset += length
+    except (ValueError, struct.error, IndexError):
+        pass
+    return None, None, None
+
+
+# -- NTP ----------------------------------------------------------------
+
+# LI 0, version 4, mode 3 (client); all other fields zero
+NTP_REQUEST = b'\x23' + b'\x00' * 47
+
+
+def parse_ntp(data):
+    """Mode 4 (server) replies; the banner carries stratum and reference id"""
+    if len(data) < 48 or data[0] & 0x07 != 4:
+        return None
+    version, stratum = (data[0] >> 3) & 0x07, data[1]
+    refid = data[12:16]
+    if stratum <= 1:
+        reference = refid.rstrip(b'\x00').decode('ascii', errors='replace')
+    else:
+        reference = '.'.join(str(b) for b in refid)
+    return 'NTP', f"v{version}", f"stratum {stratum}, refid {reference}"
+
+
+# -- SNMP ---------------------------------------------------------------
+
+def ber(tag, content):
+    """One BER TLV"""
+    length = len(content)
+    if length < 0x80:
+        encoded = bytes([length])
+    else:
+        encoded_length = length.to_bytes((length.bit_length() + 7) // 8, 'big')
+        encoded = bytes([0x80 | len(encoded_length)]) + encoded_length
+    return bytes([tag]) + encoded + content
+
+
+def ber_int(value):
+    return ber(0x02, value.to_bytes(max(1, (value.bit_length() + 8) // 8), 'big', signed=True))
+
+
+# SNMPv2c GetRequest for sysDescr.0 with the community "public"
+SNMP_GET = ber(0x30, ber_int(1) + ber(0x04, b'public') + ber(0xa0,
+    ber_int(PROBE_ID) + ber_int(0) + ber_int(0) +
+    ber(0x30, ber(0x30, ber(0x06, SYSDESCR_OID) + b'\x05\x00'))))
+
+
+def parse_snmp(data):
+    """A GetResponse PDU; the sysDescr value, when present, is the banner"""
+    if len(data) < 2 or data[0] != 0x30 or b'\xa2' not in data[:32]:
+        return None
+    offset = data.find(SYSDESCR_OID)
+    if offset < 0:
+        return None, None, None
+    offset += len(SYSDESCR_OID)
+    if offset + 2 > len(data) or data[offset] != 0x04:
+        return None, None, None
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        size = length & 0x7f
+        length = int.from_bytes(data[offset:offset + size], 'big')
+        offset += size
+    description = data[offset:offset + length].split(b'\r')[0].split(b'\n')[0]
+    return None, None, printable(description)
+
+
+# -- TFTP ---------------------------------------------------------------
+
+# Read request for a file that should not exist: servers answer with an ERROR
+TFTP_READ = b'\x00\x01payner-probe.txt\x00octet\x00'
+
+
+def parse_tftp(data):
+    """DATA (3) or ERROR (5) packets; servers answer from a fresh transfer port"""
+    if len(data) < 4 or data[0] != 0 or data[1] not in (3, 5):
+        return None
+    if data[1] == 5:
+        return None, None, printable(data[4:].split(b'\x00')[0])
+    return None, None, None
+
+
+# -- NetBIOS name service -----------------------------------------------
+
+# NBSTAT query for the wildcard name "*"
+NBNS_STATUS = (struct.pack('>HHHHHH', PROBE_ID, 0, 1, 0, 0, 0) +
+               b'\x20CKAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA\x00\x00\x21\x00\x01')
+
+
+def parse_nbns(data):
+    """Node status response; the first registered name is the banner"""
+    if len(data) < 12 or struct.unpack_from('>H', data)[0] != PROBE_ID or not data[2] & 0x80:
+        return None
+    # Answer name (34 bytes), type, class, TTL and length precede the name count
+    if len(data) >= 57 + 18 and data[56]:
+        name = data[57:72].decode('ascii', errors='replace').strip()
+        return None, None, name or None
+    return None, None, None
+
+
+# -- SSDP and SIP (HTTP-style text protocols) ------------------------------
+
+SSDP_SEARCH = (b'M-SEARCH * HTTP/1.1\r\nHOST: 239.255.255.250:1900\r\n'
+               b'MAN: "ssdp:discover"\r\nMX: 1\r\nST: ssdp:all\r\n\r\n')
+
+SIP_OPTIONS = (b'OPTIONS sip:nm SIP/2.0\r\n'
+               b'Via: SIP/2.0/UDP nm;branch=z9hG4bK-payner;rport\r\n'
+               b'Max-Forwards: 70\r\n'
+               b'From: <sip:nm@nm>;tag=payner\r\n'
+               b'To: <sip:nm2@nm2>\r\n'
+               b'Call-ID: 50235059@nm\r\n'
+               b'CSeq: 42 OPTIONS\r\n'
+               b'Contact: <sip:nm@nm>\r\n'
+               b'Accept: application/sdp\r\n'
+               b'Content-Length: 0\r\n\r\n')
+
+
+def text_protocol(prefix):
+    """Parser for replies starting with `prefix`; Server/User-Agent names the product"""
+    def parse(data):
+        if not data.startswith(prefix):
+            return None
+        match = HEADER_PRODUCT.search(data)
+        product, version = (expand('$1', match), expand('$2', match)) if match else (None, None)
+        return product, version, printable(data.split(b'\r\n')[0])
+    return parse
+
+
+UDP_PROBES = {
+    53: UDPProbe('DNS', dns_query('version.bind', DNS_TXT, DNS_CHAOS), parse_dns),
+    69: UDPProbe('TFTP', TFTP_READ, parse_tftp),
+    123: UDPProbe('NTP', NTP_REQUEST, parse_ntp),
+    137: UDPProbe('NetBIOS', NBNS_STATUS, parse_nbns),
+    161: UDPProbe('SNMP', SNMP_GET, parse_snmp),
+    1900: UDPProbe('SSDP', SSDP_SEARCH, text_protocol(b'HTTP/1.1 200')),
+    5060: UDPProbe('SIP', SIP_OPTIONS, text_protocol(b'SIP/2.0 ')),
+    5353: UDPProbe('mDNS', dns_query('_services._dns-sd._udp.local', DNS_PTR, DNS_QU_IN, flags=0), parse_dns),
+}
+
+# Services that answer from another source port than the one probed
+ANY_SOURCE_PORTS = (69,)
+
+
+def payload_for(port):
+    """Datagram to send to `port`: its protocol probe, or empty"""
+    probe = UDP_PROBES.get(port)
+    return probe.payload if probe else b''
+
+
+def answers(port, data):
+    """Whether `data` is a reply of the protocol probed on `port`"""
+    probe = UDP_PROBES.get(port)
+    return probe is not None and probe.parse(data) is not None
+
+
+def identify(port, data):
+    """Fingerprint of a UDP reply; service is None when the port has no probe or the reply is foreign"""
+    probe = UDP_PROBES.get(port)
+    parsed = probe.parse(data) if probe else None
+    if parsed is None:
+        return Fingerprint(None, None, None, printable(data))
+    product, version, banner = parsed
+    return Fingerprint(probe.service, product, version, banner or printable(data))